@@ -11,6 +11,7 @@ from apps.api.app.routes.metrics_aspects import router as metrics_aspects_router
 from apps.api.app.routes.ops import router as ops_router
 from apps.api.app.routes.pipeline import router as pipeline_router
 from apps.api.app.routes.options import router as options_router
+from jobs.pipeline_jobs import EMBEDDED_WORKER
 
 
 
@@ -37,6 +38,12 @@ def root():
 @app.on_event("startup")
 def startup():
     Base.metadata.create_all(bind=engine)
+    # Claims pipeline_jobs; loads the sentiment model in the background so the first run doesn't wait for it
+    if EMBEDDED_WORKER:
+        # Imported here: it pulls in torch / transformers, which the API itself doesn't need
+        from jobs.worker import get_worker
+
+        get_worker().start()
 
 app.include_router(health_router)
 app.include_router(config_router)
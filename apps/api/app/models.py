@@ -1,6 +1,6 @@
 import uuid
 from sqlalchemy import (
-    String, Text, Integer, DateTime, UniqueConstraint, Index, ForeignKey
+    String, Text, Integer, BigInteger, DateTime, UniqueConstraint, Index, ForeignKey, LargeBinary, text
 )
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column
@@ -30,8 +30,54 @@ class ReviewRaw(Base):
     __table_args__ = (
         UniqueConstraint("source", "source_review_id", name="uq_reviews_raw_source_id"),
         Index("ix_reviews_raw_vertical_created", "vertical", "created_at"),
+        # payload archival walks old rows by ingest time
+        Index("ix_reviews_raw_ingested", "ingested_at"),
     )
 
+
+class ReviewRawPayload(Base):
+    """
+    Compressed source payload of a raw review (ingest --payload-mode compressed),
+    kept out of reviews_raw so scans of the hot table stay small.
+    """
+    __tablename__ = "reviews_raw_payloads"
+
+    raw_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("reviews_raw.id"), primary_key=True)
+
+    codec: Mapped[str] = mapped_column(String(16), nullable=False, default="zlib")
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+class ReviewRawSignature(Base):
+    """
+    SimHash signature of a raw review's text (jobs/ingest/dedup.py), written at ingest.
+    The four 16-bit bands are the LSH buckets near-duplicate lookups probe;
+    canonical_raw_id points at the cluster representative (itself if none).
+    """
+    __tablename__ = "reviews_raw_signatures"
+
+    raw_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("reviews_raw.id"), primary_key=True)
+
+    vertical: Mapped[str] = mapped_column(String(64), nullable=False)
+    simhash: Mapped[int] = mapped_column(BigInteger, nullable=False)  # signed view of the 64-bit hash
+
+    band0: Mapped[int] = mapped_column(Integer, nullable=False)
+    band1: Mapped[int] = mapped_column(Integer, nullable=False)
+    band2: Mapped[int] = mapped_column(Integer, nullable=False)
+    band3: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    canonical_raw_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+
+    __table_args__ = (
+        # Lookups only probe cluster representatives; partial indexes keep the buckets small
+        Index("ix_reviews_raw_signatures_band0", "vertical", "band0", postgresql_where=text("raw_id = canonical_raw_id")),
+        Index("ix_reviews_raw_signatures_band1", "vertical", "band1", postgresql_where=text("raw_id = canonical_raw_id")),
+        Index("ix_reviews_raw_signatures_band2", "vertical", "band2", postgresql_where=text("raw_id = canonical_raw_id")),
+        Index("ix_reviews_raw_signatures_band3", "vertical", "band3", postgresql_where=text("raw_id = canonical_raw_id")),
+        Index("ix_reviews_raw_signatures_canonical", "canonical_raw_id"),
+    )
+
+
 class ReviewEnriched(Base):
     __tablename__ = "reviews_enriched"
 
@@ -58,4 +104,203 @@ class ReviewEnriched(Base):
         UniqueConstraint("source", "source_review_id", name="uq_reviews_enriched_source_id"),
         Index("ix_reviews_enriched_vertical_created", "vertical", "created_at"),
         Index("ix_reviews_enriched_sentiment", "overall_sentiment"),
+        Index("ix_reviews_enriched_raw_id", "raw_id"),
+        # keyset walk of the re-analysis planner
+        Index("ix_reviews_enriched_created_raw", "created_at", "raw_id"),
     )
+
+
+class ExtractionCacheEntry(Base):
+    """
+    Content-addressed cache of raw LLM extractions.
+    cache_key = sha256(normalized text + vertical + model + prompt_version + allowed aspects).
+    """
+    __tablename__ = "extraction_cache"
+
+    cache_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    vertical: Mapped[str] = mapped_column(String(64), nullable=False)
+    model_version: Mapped[str] = mapped_column(String(64), nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    extraction: Mapped[dict] = mapped_column(JSONB, nullable=False)
+
+    created_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_hit_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_extraction_cache_last_hit", "last_hit_at"),
+    )
+
+
+class AnalysisFailure(Base):
+    """
+    Dead-letter table for raws whose extraction failed.
+    The analyzer skips these until they are retried with --retry-failed.
+    """
+    __tablename__ = "reviews_analysis_failures"
+
+    raw_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("reviews_raw.id"), primary_key=True)
+
+    error: Mapped[str] = mapped_column(Text, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+
+    first_failed_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_failed_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    model_version: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    prompt_version: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+
+
+class AnalysisLease(Base):
+    """
+    Short-lived claim on a raw review by one analyzer worker.
+    Expired leases are ignored and taken over by the next claim.
+    """
+    __tablename__ = "reviews_analysis_leases"
+
+    raw_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("reviews_raw.id"), primary_key=True)
+
+    worker_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    leased_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+    leased_until: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_reviews_analysis_leases_until", "leased_until"),
+    )
+
+
+class PipelineRun(Base):
+    """
+    One analyzer run: parameters, totals and per-stage timings (RunMetrics summary).
+    Updated after every chunk while running, so live runs show up too.
+    """
+    __tablename__ = "pipeline_runs"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    kind: Mapped[str] = mapped_column(String(32), nullable=False, default="analyze")
+    status: Mapped[str] = mapped_column(String(16), nullable=False)  # running/succeeded/failed
+    worker_id: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+
+    started_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+    finished_at: Mapped[Optional["DateTime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    model_version: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    prompt_version: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+
+    params: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    totals: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    metrics: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_pipeline_runs_started", "started_at"),
+    )
+
+
+class PipelineJob(Base):
+    """
+    Durable queue of /pipeline/run requests (jobs/pipeline_jobs.py).
+    Any API process enqueues; pipeline workers claim, heartbeat and finish them.
+    """
+    __tablename__ = "pipeline_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    kind: Mapped[str] = mapped_column(String(32), nullable=False, default="pipeline")
+    vertical: Mapped[str] = mapped_column(String(64), nullable=False)
+    params: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    # sha256 of kind + params; identical queued requests share one job
+    dedup_key: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    state: Mapped[str] = mapped_column(String(16), nullable=False)  # queued/running/succeeded/failed/cancelled
+    worker_id: Mapped[Optional[str]] = mapped_column(String(128), nullable=True)
+
+    created_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+    started_at: Mapped[Optional["DateTime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+    heartbeat_at: Mapped[Optional["DateTime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional["DateTime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+    cancel_requested_at: Mapped[Optional["DateTime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    return_code: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_pipeline_jobs_state_created", "state", "created_at"),
+        Index("ix_pipeline_jobs_created", "created_at"),
+        Index("uq_pipeline_jobs_queued_dedup", "dedup_key", unique=True, postgresql_where=text("state = 'queued'")),
+    )
+
+
+class PipelineJobLog(Base):
+    """
+    Output of a pipeline job, appended by its worker in chunks, so every API
+    instance can serve the log whichever host ran the job.
+    start_offset/end_offset: byte range of `data` (UTF-8) within the whole log.
+    """
+    __tablename__ = "pipeline_job_logs"
+
+    job_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("pipeline_jobs.id", ondelete="CASCADE"), primary_key=True
+    )
+    start_offset: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    end_offset: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    data: Mapped[str] = mapped_column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("ix_pipeline_job_logs_job_end", "job_id", "end_offset"),
+    )
+
+
+class IngestWatermark(Base):
+    """
+    Per source/app/locale ingest position.
+    - latest_created_at + recent_ids: what incremental runs already have, so they
+      stop paging at the first page with nothing new
+    - backfill_token: continuation token where the last backfill stopped
+    """
+    __tablename__ = "ingest_watermarks"
+
+    source: Mapped[str] = mapped_column(String(64), primary_key=True)
+    app_id: Mapped[str] = mapped_column(String(256), primary_key=True)
+    country: Mapped[str] = mapped_column(String(16), primary_key=True)
+    lang: Mapped[str] = mapped_column(String(16), primary_key=True)
+
+    latest_created_at: Mapped[Optional["DateTime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+    recent_ids: Mapped[list] = mapped_column(JSONB, nullable=False, default=list)
+
+    backfill_token: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    backfill_done_at: Mapped[Optional["DateTime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    updated_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class ReanalysisCursor(Base):
+    """
+    Persisted position of a re-analysis plan (jobs/analyze/reanalyze.py).
+    The plan walks reviews_enriched in (created_at, raw_id) order; the cursor is
+    the last key handled, so an interrupted plan resumes where it stopped.
+    """
+    __tablename__ = "reanalysis_cursors"
+
+    plan_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+
+    model_version: Mapped[str] = mapped_column(String(64), nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String(64), nullable=False)
+    filters: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+
+    status: Mapped[str] = mapped_column(String(16), nullable=False)  # running/done
+
+    last_created_at: Mapped[Optional["DateTime"]] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_raw_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True), nullable=True)
+
+    planned: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    processed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    started_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), nullable=False)
+    finished_at: Mapped[Optional["DateTime"]] = mapped_column(DateTime(timezone=True), nullable=True)
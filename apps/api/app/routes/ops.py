@@ -1,11 +1,13 @@
+import uuid
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
-from fastapi import APIRouter
-from sqlalchemy import func, text
+from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy import select, text
 
 from apps.api.app.db import SessionLocal
-from apps.api.app.models import ReviewRaw, ReviewEnriched
+from apps.api.app.models import PipelineRun, ReanalysisCursor
+from jobs.pipeline_stats import backlog_stats, throughput_stats
 
 router = APIRouter()
 
@@ -29,56 +31,115 @@ def ops_stats() -> Dict[str, Any]:
     Pipeline observability:
     - totals (raw/enriched)
     - backlog (raw not yet enriched)
-    - freshness (max ingested_at / analyzed_at)
+    - dead-lettered (unenriched raw whose extraction failed; skipped until retried)
+    - leased (raw currently claimed by an analyzer worker)
+    - analyzable_backlog (unenriched raw neither dead-lettered nor leased: what
+      the analyzer can pick up now)
+    - freshness (max ingested_at / analyzed_at, oldest ingested_at still waiting)
     - per-vertical breakdown
+    - near-duplicates (signed raws linked to another cluster representative) and
+      dedup_ratio = duplicates / signed
+    - throughput (analyzed reviews/s of recent runs, LLM latency); the scheduler
+      sizes its runs from the same numbers (jobs/pipeline_stats.py)
     """
     with SessionLocal() as db:
-        raw_total = int(db.query(func.count(ReviewRaw.id)).scalar() or 0)
-        enriched_total = int(db.query(func.count(ReviewEnriched.id)).scalar() or 0)
-
-        # backlog: raw rows that don't have an enriched row yet
-        backlog = (
-            db.query(func.count(ReviewRaw.id))
-            .outerjoin(ReviewEnriched, ReviewEnriched.raw_id == ReviewRaw.id)
-            .filter(ReviewEnriched.raw_id.is_(None))
-            .scalar()
-        )
-        backlog_total = int(backlog or 0)
-
-        last_ingested_at = db.query(func.max(ReviewRaw.ingested_at)).scalar()
-        last_analyzed_at = db.query(func.max(ReviewEnriched.analyzed_at)).scalar()
-
-        # per-vertical breakdown
-        raw_by_vertical = db.query(ReviewRaw.vertical, func.count(ReviewRaw.id)).group_by(ReviewRaw.vertical).all()
-        enriched_by_vertical = db.query(ReviewEnriched.vertical, func.count(ReviewEnriched.id)).group_by(ReviewEnriched.vertical).all()
-
-        raw_map = {r[0]: int(r[1]) for r in raw_by_vertical if r[0]}
-        enriched_map = {r[0]: int(r[1]) for r in enriched_by_vertical if r[0]}
-
-        # backlog by vertical
-        backlog_by_vertical = (
-            db.query(ReviewRaw.vertical, func.count(ReviewRaw.id))
-            .outerjoin(ReviewEnriched, ReviewEnriched.raw_id == ReviewRaw.id)
-            .filter(ReviewEnriched.raw_id.is_(None))
-            .group_by(ReviewRaw.vertical)
-            .all()
-        )
-        backlog_map = {r[0]: int(r[1]) for r in backlog_by_vertical if r[0]}
+        stats = backlog_stats(db)
+        throughput = throughput_stats(db)
 
     return {
         "time_utc": datetime.now(timezone.utc).isoformat(),
-        "totals": {
-            "raw": raw_total,
-            "enriched": enriched_total,
-            "unenriched_backlog": backlog_total,
-        },
-        "freshness": {
-            "last_ingested_at": last_ingested_at.isoformat() if last_ingested_at else None,
-            "last_analyzed_at": last_analyzed_at.isoformat() if last_analyzed_at else None,
-        },
-        "by_vertical": {
-            "raw": raw_map,
-            "enriched": enriched_map,
-            "backlog": backlog_map,
-        },
+        **stats,
+        "throughput": throughput,
     }
+
+
+def _bottleneck(metrics: Dict[str, Any]) -> Optional[str]:
+    stages = (metrics or {}).get("stages") or {}
+    if not stages:
+        return None
+    return max(stages, key=lambda name: stages[name].get("total_s", 0.0))
+
+
+def _run_item(run: PipelineRun, full: bool = False) -> Dict[str, Any]:
+    metrics = run.metrics or {}
+    item = {
+        "id": str(run.id),
+        "kind": run.kind,
+        "status": run.status,
+        "worker_id": run.worker_id,
+        "started_at": run.started_at.isoformat(),
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "model_version": run.model_version,
+        "prompt_version": run.prompt_version,
+        "totals": run.totals,
+        "elapsed_s": metrics.get("elapsed_s"),
+        "bottleneck": _bottleneck(metrics),
+        "stage_total_s": {name: st.get("total_s") for name, st in (metrics.get("stages") or {}).items()},
+        "error": run.error,
+    }
+    if full:
+        item["params"] = run.params
+        item["metrics"] = metrics
+    return item
+
+
+@router.get("/ops/runs")
+def ops_runs(
+    limit: int = Query(20, ge=1, le=200),
+    kind: Optional[str] = None,
+    status: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Recent pipeline runs, newest first, with per-stage wall time and the slowest
+    stage ("bottleneck"). Full histograms / counters are on /ops/runs/{run_id}.
+    """
+    stmt = select(PipelineRun).order_by(PipelineRun.started_at.desc()).limit(limit)
+    if kind:
+        stmt = stmt.where(PipelineRun.kind == kind)
+    if status:
+        stmt = stmt.where(PipelineRun.status == status)
+    with SessionLocal() as db:
+        runs = db.execute(stmt).scalars().all()
+        items = [_run_item(r) for r in runs]
+    return {"count": len(items), "items": items}
+
+
+@router.get("/ops/runs/{run_id}")
+def ops_run(run_id: uuid.UUID) -> Dict[str, Any]:
+    """
+    One run with its parameters and full metrics: per-stage count / avg / p50 / p95 /
+    histogram, review latency, counters, LLM and cache stats.
+    """
+    with SessionLocal() as db:
+        run = db.get(PipelineRun, run_id)
+        if run is None:
+            raise HTTPException(status_code=404, detail="Run not found")
+        return _run_item(run, full=True)
+
+
+@router.get("/ops/reanalysis")
+def ops_reanalysis() -> Dict[str, Any]:
+    """
+    Re-analysis plans (jobs/analyze/reanalyze.py) and how far each one got.
+    """
+    with SessionLocal() as db:
+        plans = db.execute(select(ReanalysisCursor).order_by(ReanalysisCursor.updated_at.desc())).scalars().all()
+        items = [
+            {
+                "plan_id": c.plan_id,
+                "model_version": c.model_version,
+                "prompt_version": c.prompt_version,
+                "filters": c.filters,
+                "status": c.status,
+                "planned": c.planned,
+                "processed": c.processed,
+                "failed": c.failed,
+                "progress": round(c.processed / c.planned, 4) if c.planned else 1.0,
+                "cursor_created_at": c.last_created_at.isoformat() if c.last_created_at else None,
+                "started_at": c.started_at.isoformat(),
+                "updated_at": c.updated_at.isoformat(),
+                "finished_at": c.finished_at.isoformat() if c.finished_at else None,
+            }
+            for c in plans
+        ]
+    return {"count": len(items), "items": items}
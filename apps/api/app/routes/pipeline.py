@@ -1,40 +1,22 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
-from datetime import datetime, timezone
-from pathlib import Path
-from typing import Literal, Optional, Dict
-import subprocess
-import sys
+from datetime import datetime
+from typing import Iterator, Literal, Optional, List
+import time
 import uuid
-import threading
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from sqlalchemy import select
 
-router = APIRouter()
-
-# Where we write logs
-LOG_DIR = Path(".pipeline_runs")
-LOG_DIR.mkdir(exist_ok=True)
-
-JobState = Literal["queued", "running", "succeeded", "failed"]
-
-
-@dataclass
-class Job:
-    id: str
-    state: JobState
-    created_at: str
-    started_at: Optional[str] = None
-    finished_at: Optional[str] = None
-    return_code: Optional[int] = None
-    error: Optional[str] = None
-    log_file: Optional[str] = None
+from apps.api.app.db import SessionLocal
+from apps.api.app.models import PipelineJob
+from jobs.pipeline_jobs import EMBEDDED_WORKER, FINISHED_STATES, cancel_job, enqueue_job, read_log, tail_log
 
+router = APIRouter()
 
-_JOBS: Dict[str, Job] = {}
-_LOCK = threading.Lock()
+JobState = Literal["queued", "running", "succeeded", "failed", "cancelled"]
 
 
 class RunPipelineReq(BaseModel):
@@ -42,127 +24,202 @@ class RunPipelineReq(BaseModel):
     pages: int = Field(default=2, ge=1, le=50)
     count: int = Field(default=200, ge=1, le=5000)
     batch: int = Field(default=50, ge=1, le=500)
+    mode: Literal["batch", "stream"] = Field(
+        default="batch",
+        description="batch: ingest, then analyze; stream: analyze pages while later ones are fetched",
+    )
 
 
 class RunPipelineResp(BaseModel):
     job_id: str
+    deduplicated: bool = False
 
 
 class JobResp(BaseModel):
     id: str
     state: JobState
+    vertical: Optional[str] = None
+    params: dict = Field(default_factory=dict)
+    worker_id: Optional[str] = None
     created_at: str
     started_at: Optional[str] = None
     finished_at: Optional[str] = None
+    cancel_requested: bool = False
     return_code: Optional[int] = None
     error: Optional[str] = None
     log_tail: str = ""
 
 
-def _utc_now() -> str:
-    return datetime.now(timezone.utc).isoformat()
-
-
-def _tail(path: Path, n: int = 200) -> str:
-    try:
-        lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
-        return "\n".join(lines[-n:])
-    except Exception:
-        return ""
-
-
-def _run_and_log(cmd: list[str], log_path: Path) -> int:
-    with log_path.open("a", encoding="utf-8") as f:
-        f.write("\n$ " + " ".join(cmd) + "\n")
-        f.flush()
-        p = subprocess.Popen(cmd, stdout=f, stderr=subprocess.STDOUT)
-        return p.wait()
-
-
-def _pipeline_worker(job_id: str, req: RunPipelineReq) -> None:
-    log_path = LOG_DIR / f"{job_id}.log"
+class JobLogResp(BaseModel):
+    job_id: str
+    state: JobState
+    offset: int = Field(description="Byte offset to send next time")
+    size: int = Field(description="Log size in bytes when read")
+    data: str = ""
+    finished: bool = Field(default=False, description="Job is done and everything was read")
+
+
+def _iso(dt: Optional[datetime]) -> Optional[str]:
+    return dt.isoformat() if dt else None
+
+
+def _job_resp(db, job: PipelineJob, with_log: bool = True) -> JobResp:
+    return JobResp(
+        id=str(job.id),
+        state=job.state,
+        vertical=job.vertical,
+        params=job.params or {},
+        worker_id=job.worker_id,
+        created_at=job.created_at.isoformat(),
+        started_at=_iso(job.started_at),
+        finished_at=_iso(job.finished_at),
+        cancel_requested=job.cancel_requested_at is not None,
+        return_code=job.return_code,
+        error=job.error,
+        log_tail=tail_log(db, job.id, n=200) if with_log else "",
+    )
 
-    with _LOCK:
-        job = _JOBS[job_id]
-        job.state = "running"
-        job.started_at = _utc_now()
-        job.log_file = str(log_path)
 
+def _parse_job_id(job_id: str) -> uuid.UUID:
     try:
-        # 1) ingest (google play)
-        rc1 = _run_and_log(
-            [
-                sys.executable,
-                "-m",
-                "jobs.ingest.run_ingest",
-                "--vertical",
-                req.vertical,
-                "--pages",
-                str(req.pages),
-                "--count",
-                str(req.count),
-            ],
-            log_path,
-        )
-        if rc1 != 0:
-            raise RuntimeError(f"Ingest failed (return code {rc1}). See log.")
-
-        # 2) analyze (ollama)
-        rc2 = _run_and_log(
-            [
-                sys.executable,
-                "-m",
-                "jobs.analyze.analyzer",
-                "--batch",
-                str(req.batch),
-            ],
-            log_path,
-        )
-        if rc2 != 0:
-            raise RuntimeError(f"Analyze failed (return code {rc2}). See log.")
-
-        with _LOCK:
-            job = _JOBS[job_id]
-            job.state = "succeeded"
-            job.finished_at = _utc_now()
-            job.return_code = 0
-
-    except Exception as e:
-        with _LOCK:
-            job = _JOBS[job_id]
-            job.state = "failed"
-            job.finished_at = _utc_now()
-            job.return_code = 1
-            job.error = str(e)
+        return uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Job not found")
 
 
 @router.post("/pipeline/run", response_model=RunPipelineResp)
-def run_pipeline(req: RunPipelineReq, bg: BackgroundTasks) -> RunPipelineResp:
-    job_id = uuid.uuid4().hex
-    job = Job(
-        id=job_id,
-        state="queued",
-        created_at=_utc_now(),
-    )
-    with _LOCK:
-        _JOBS[job_id] = job
-
-    bg.add_task(_pipeline_worker, job_id, req)
-    return RunPipelineResp(job_id=job_id)
+def run_pipeline(req: RunPipelineReq) -> RunPipelineResp:
+    """
+    Queue ingest + analyze in pipeline_jobs; a pipeline worker (jobs/worker.py)
+    picks it up. An identical request that is still queued returns that job.
+    """
+    with SessionLocal() as db:
+        job_id, created = enqueue_job(db, "pipeline", req.model_dump())
+
+    if EMBEDDED_WORKER:
+        from jobs.worker import get_worker
+
+        get_worker().wake()
+    return RunPipelineResp(job_id=str(job_id), deduplicated=not created)
+
+
+@router.get("/pipeline/jobs", response_model=List[JobResp])
+def list_jobs(
+    limit: int = Query(default=20, ge=1, le=200),
+    state: Optional[JobState] = Query(default=None),
+    vertical: Optional[str] = Query(default=None),
+) -> List[JobResp]:
+    """
+    Most recent jobs first (without log tails).
+    """
+    stmt = select(PipelineJob).order_by(PipelineJob.created_at.desc()).limit(limit)
+    if state:
+        stmt = stmt.where(PipelineJob.state == state)
+    if vertical:
+        stmt = stmt.where(PipelineJob.vertical == vertical)
+    with SessionLocal() as db:
+        return [_job_resp(db, job, with_log=False) for job in db.execute(stmt).scalars().all()]
 
 
 @router.get("/pipeline/jobs/{job_id}", response_model=JobResp)
 def get_job(job_id: str) -> JobResp:
-    with _LOCK:
-        job = _JOBS.get(job_id)
+    with SessionLocal() as db:
+        job = db.get(PipelineJob, _parse_job_id(job_id))
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return _job_resp(db, job)
+
+
+@router.get("/pipeline/jobs/{job_id}/log", response_model=JobLogResp)
+def get_job_log(
+    job_id: str,
+    offset: Optional[int] = Query(default=None, ge=0, description="Bytes already seen; omit to start near the end"),
+    max_bytes: int = Query(default=64_000, ge=1, le=1_000_000),
+) -> JobLogResp:
+    """
+    Incremental log read: returns only the bytes after `offset` (at most
+    `max_bytes`) and the offset to send next, so a poll costs the same however
+    long the log is.
+    """
+    with SessionLocal() as db:
+        job = db.get(PipelineJob, _parse_job_id(job_id))
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        state = job.state
+        chunk, next_offset, size = read_log(db, job.id, offset, max_bytes)
+    return JobLogResp(
+        job_id=job_id,
+        state=state,
+        offset=next_offset,
+        size=size,
+        data=chunk.decode("utf-8", errors="replace"),
+        finished=state in FINISHED_STATES and next_offset >= size,
+    )
 
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
 
-    log_tail = ""
-    if job.log_file:
-        log_tail = _tail(Path(job.log_file), n=200)
+def _sse(event: str, data: str, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines += [f"data: {line}" for line in data.split("\n")]
+    return "\n".join(lines) + "\n\n"
+
+
+def _stream_log(job_id: uuid.UUID, offset: int, poll_s: float, state_every_s: float) -> Iterator[str]:
+    state = None
+    checked_at = 0.0
+    while True:
+        now = time.monotonic()
+        with SessionLocal() as db:
+            if state is None or now - checked_at >= state_every_s:
+                job = db.get(PipelineJob, job_id)
+                state = job.state if job else "failed"
+                checked_at = now
+            chunk, offset, size = read_log(db, job_id, offset, 64_000)
+
+        if chunk:
+            yield _sse("log", chunk.decode("utf-8", errors="replace"), offset)
+            continue
+        if state in FINISHED_STATES and offset >= size:
+            yield _sse("end", state, offset)
+            return
+        # Comment line: keeps proxies from timing out an idle stream
+        yield ": keep-alive\n\n"
+        time.sleep(poll_s)
+
+
+@router.get("/pipeline/jobs/{job_id}/log/stream")
+def stream_job_log(
+    job_id: str,
+    offset: int = Query(default=0, ge=0),
+    last_event_id: Optional[str] = Header(default=None),
+) -> StreamingResponse:
+    """
+    Server-Sent Events: "log" events carry new log text (event id = byte offset
+    after it), then one "end" event with the final state. EventSource reconnects
+    resume from Last-Event-ID.
+    """
+    job_uuid = _parse_job_id(job_id)
+    with SessionLocal() as db:
+        if not db.get(PipelineJob, job_uuid):
+            raise HTTPException(status_code=404, detail="Job not found")
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+    return StreamingResponse(
+        _stream_log(job_uuid, offset, poll_s=0.5, state_every_s=2.0),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
-    payload = asdict(job)
-    payload["log_tail"] = log_tail
-    return JobResp(**payload)
+@router.post("/pipeline/jobs/{job_id}/cancel", response_model=JobResp)
+def cancel_pipeline_job(job_id: str) -> JobResp:
+    """
+    Queued jobs are cancelled right away; running ones stop at their next
+    checkpoint (after the current analyzer chunk / ingest stage).
+    """
+    with SessionLocal() as db:
+        job = cancel_job(db, _parse_job_id(job_id))
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return _job_resp(db, job, with_log=False)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer
 from sqlalchemy import select
 from apps.api.app.db import get_db
 from apps.api.app.models import ReviewRaw
@@ -14,7 +14,14 @@ def list_raw_reviews(
     offset: int = Query(0, ge=0),
     db: Session = Depends(get_db),
 ):
-    stmt = select(ReviewRaw).order_by(ReviewRaw.created_at.desc()).limit(limit).offset(offset)
+    # raw_payload is never returned here; don't drag it out of the table
+    stmt = (
+        select(ReviewRaw)
+        .options(defer(ReviewRaw.raw_payload))
+        .order_by(ReviewRaw.created_at.desc())
+        .limit(limit)
+        .offset(offset)
+    )
     if vertical:
         stmt = stmt.where(ReviewRaw.vertical == vertical)
     rows = db.execute(stmt).scalars().all()
@@ -0,0 +1,5 @@
+import OpsPage from "../../components/pages/OpsPage";
+
+export default function Page() {
+  return <OpsPage />;
+}
@@ -5,9 +5,9 @@ import Link from "next/link";
 import { usePathname } from "next/navigation";
 
 import { Button } from "./ui"; // adjust if your Button is in a different path
-import { runPipeline, getPipelineJob } from "../lib/api"; // adjust path if needed
+import { runPipeline, getPipelineJob, getPipelineJobLog } from "../lib/api"; // adjust path if needed
 
-type JobState = "queued" | "running" | "succeeded" | "failed";
+type JobState = "queued" | "running" | "succeeded" | "failed" | "cancelled";
 
 export default function NavTabs() {
   const pathname = usePathname();
@@ -16,6 +16,7 @@ export default function NavTabs() {
     { label: "Overview", href: "/overview" },
     { label: "Stakeholders", href: "/stakeholders" },
     { label: "Reviews", href: "/reviews" },
+    { label: "Ops", href: "/ops" },
   ];
 
   const [jobId, setJobId] = useState<string>("");
@@ -41,20 +42,31 @@ export default function NavTabs() {
       const r = await runPipeline({ vertical: "food", pages: 2, count: 200, batch: 50 });
       setJobId(r.job_id);
 
+      // Incremental log reads: each poll returns only the output since `offset`
+      let offset = 0;
+      let lastLine = "";
       if (pollRef.current) window.clearInterval(pollRef.current);
       pollRef.current = window.setInterval(async () => {
         try {
-          const j = await getPipelineJob(r.job_id);
-          setJobState(j.state);
+          const l = await getPipelineJobLog(r.job_id, offset);
+          offset = l.offset;
+          setJobState(l.state);
+          const lines = l.data.split("\n").filter((line) => line.trim());
+          if (lines.length) lastLine = lines[lines.length - 1];
+          if (!l.finished) {
+            if (lastLine) setJobMsg(lastLine);
+            return;
+          }
 
-          if (j.state === "succeeded") {
-            setRunning(false);
+          setRunning(false);
+          if (pollRef.current) window.clearInterval(pollRef.current);
+          if (l.state === "succeeded") {
             setJobMsg("Pipeline completed.");
-            if (pollRef.current) window.clearInterval(pollRef.current);
-          } else if (j.state === "failed") {
-            setRunning(false);
+          } else if (l.state === "failed") {
+            const j = await getPipelineJob(r.job_id);
             setJobMsg(j.error || "Pipeline failed.");
-            if (pollRef.current) window.clearInterval(pollRef.current);
+          } else if (l.state === "cancelled") {
+            setJobMsg("Pipeline cancelled.");
           }
         } catch (e: any) {
           setRunning(false);
@@ -77,6 +89,8 @@ export default function NavTabs() {
       ? "Done"
       : jobState === "failed"
       ? "Failed"
+      : jobState === "cancelled"
+      ? "Cancelled"
       : "";
 
   return (
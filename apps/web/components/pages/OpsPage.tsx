@@ -0,0 +1,195 @@
+"use client";
+
+import React, { useEffect, useState } from "react";
+import { getOpsRun, getOpsRuns, OpsRun, OpsRunDetail } from "../../lib/api";
+import { Card, SectionTitle, Button, Select, th, td } from "../ui";
+
+function fmtSeconds(s: number | null | undefined) {
+  if (s === null || s === undefined) return "—";
+  return s >= 60 ? `${(s / 60).toFixed(1)} min` : `${s.toFixed(1)} s`;
+}
+
+function StageBars({ stages, bottleneck }: { stages: Record<string, number>; bottleneck: string | null }) {
+  const entries = Object.entries(stages).sort((a, b) => b[1] - a[1]);
+  const max = entries.length ? entries[0][1] || 1 : 1;
+  if (!entries.length) return <span style={{ fontSize: 12, color: "var(--muted)" }}>No stages yet</span>;
+  return (
+    <div style={{ display: "flex", flexDirection: "column", gap: 4, minWidth: 260 }}>
+      {entries.map(([name, total]) => (
+        <div key={name} style={{ display: "grid", gridTemplateColumns: "140px 1fr 64px", gap: 8, alignItems: "center" }}>
+          <span style={{ fontSize: 12, fontWeight: name === bottleneck ? 900 : 700 }}>{name}</span>
+          <div style={{ height: 6, borderRadius: 999, background: "rgba(0,0,0,0.06)" }}>
+            <div
+              style={{
+                width: `${Math.max(2, (100 * total) / max)}%`,
+                height: "100%",
+                borderRadius: 999,
+                background: name === bottleneck ? "var(--brand-red)" : "var(--muted)",
+              }}
+            />
+          </div>
+          <span style={{ fontSize: 12, color: "var(--muted)", textAlign: "right" }}>{fmtSeconds(total)}</span>
+        </div>
+      ))}
+    </div>
+  );
+}
+
+function RunDetail({ runId }: { runId: string }) {
+  const [run, setRun] = useState<OpsRunDetail | null>(null);
+  const [err, setErr] = useState<string>("");
+
+  useEffect(() => {
+    getOpsRun(runId)
+      .then(setRun)
+      .catch((e: any) => setErr(e?.message ?? String(e)));
+  }, [runId]);
+
+  if (err) return <div style={{ fontSize: 12, color: "var(--brand-red)" }}>{err}</div>;
+  if (!run) return <div style={{ fontSize: 12, color: "var(--muted)" }}>Loading…</div>;
+
+  const stages = Object.entries(run.metrics?.stages ?? {}).sort((a, b) => b[1].total_s - a[1].total_s);
+  const llm = run.metrics?.llm;
+  return (
+    <div style={{ marginTop: 8, display: "flex", flexDirection: "column", gap: 8 }}>
+      <table style={{ width: "100%", borderCollapse: "collapse" }}>
+        <thead>
+          <tr>
+            <th style={th}>Stage</th>
+            <th style={th}>Count</th>
+            <th style={th}>Total</th>
+            <th style={th}>p50 ms</th>
+            <th style={th}>p95 ms</th>
+            <th style={th}>Max ms</th>
+          </tr>
+        </thead>
+        <tbody>
+          {stages.map(([name, st]) => (
+            <tr key={name}>
+              <td style={td}>{name}</td>
+              <td style={td}>{st.count}</td>
+              <td style={td}>{fmtSeconds(st.total_s)}</td>
+              <td style={td}>{st.p50_ms}</td>
+              <td style={td}>{st.p95_ms}</td>
+              <td style={td}>{st.max_ms}</td>
+            </tr>
+          ))}
+        </tbody>
+      </table>
+      {llm ? (
+        <div style={{ fontSize: 12, color: "var(--muted)" }}>
+          LLM calls {llm.extractions} · avg {llm.avg_latency_ms} ms · p95 {llm.p95_latency_ms} ms · retries{" "}
+          {llm.retries}
+        </div>
+      ) : null}
+    </div>
+  );
+}
+
+export default function OpsPage() {
+  const [limit, setLimit] = useState<number>(20);
+  const [runs, setRuns] = useState<OpsRun[]>([]);
+  const [loading, setLoading] = useState<boolean>(false);
+  const [err, setErr] = useState<string>("");
+  const [opened, setOpened] = useState<Record<string, boolean>>({});
+
+  async function load() {
+    setLoading(true);
+    setErr("");
+    try {
+      const r = await getOpsRuns(limit);
+      setRuns(r.items ?? []);
+    } catch (e: any) {
+      setErr(e?.message ?? String(e));
+    } finally {
+      setLoading(false);
+    }
+  }
+
+  useEffect(() => {
+    load();
+  }, [limit]);
+
+  return (
+    <div style={{ display: "flex", flexDirection: "column", gap: 16 }}>
+      <div style={{ display: "flex", justifyContent: "space-between", gap: 12, flexWrap: "wrap", alignItems: "flex-end" }}>
+        <div style={{ display: "flex", flexDirection: "column", gap: 4 }}>
+          <div style={{ fontSize: 22, fontWeight: 900, letterSpacing: -0.2 }}>Ops</div>
+          <div style={{ fontSize: 12, color: "var(--muted)" }}>
+            Recent analyzer runs with wall time per stage; the slowest stage is the bottleneck.
+          </div>
+        </div>
+
+        <div style={{ display: "flex", gap: 10, alignItems: "center", flexWrap: "wrap" }}>
+          <Select
+            label="Runs"
+            value={String(limit)}
+            onChange={(v) => setLimit(Number(v))}
+            options={[10, 20, 50, 100].map((n) => ({ label: `${n}`, value: n }))}
+          />
+          <Button variant="secondary" onClick={load}>
+            Refresh
+          </Button>
+        </div>
+      </div>
+
+      <Card>
+        <SectionTitle title={`Runs (${runs.length})`} subtitle="Expand a run for per-stage percentiles and LLM stats." />
+        {loading ? <div style={{ fontSize: 12, color: "var(--muted)", fontWeight: 900 }}>Loading…</div> : null}
+        {err ? <div style={{ fontSize: 12, color: "var(--brand-red)", fontWeight: 900 }}>{err}</div> : null}
+
+        <div style={{ overflowX: "auto" }}>
+          <table style={{ width: "100%", borderCollapse: "collapse" }}>
+            <thead>
+              <tr>
+                <th style={th}>Started</th>
+                <th style={th}>Kind</th>
+                <th style={th}>Status</th>
+                <th style={th}>Analyzed</th>
+                <th style={th}>Elapsed</th>
+                <th style={th}>Bottleneck</th>
+                <th style={th}>Stages</th>
+              </tr>
+            </thead>
+            <tbody>
+              {runs.map((r) => (
+                <tr key={r.id}>
+                  <td style={td}>
+                    <details
+                      onToggle={(e) => {
+                        const isOpen = e.currentTarget.open;
+                        setOpened((o) => ({ ...o, [r.id]: isOpen }));
+                      }}
+                    >
+                      <summary style={{ cursor: "pointer", fontWeight: 800 }}>
+                        {new Date(r.started_at).toLocaleString()}
+                      </summary>
+                      {opened[r.id] ? <RunDetail runId={r.id} /> : null}
+                    </details>
+                  </td>
+                  <td style={td}>{r.kind}</td>
+                  <td style={td}>
+                    <span
+                      style={{ fontWeight: 900, color: r.status === "failed" ? "var(--brand-red)" : "var(--text)" }}
+                      title={r.error ?? undefined}
+                    >
+                      {r.status}
+                    </span>
+                  </td>
+                  <td style={td}>{r.totals?.analyzed ?? 0}</td>
+                  <td style={td}>{fmtSeconds(r.elapsed_s)}</td>
+                  <td style={td}>
+                    <span style={{ fontWeight: 900 }}>{r.bottleneck ?? "—"}</span>
+                  </td>
+                  <td style={td}>
+                    <StageBars stages={r.stage_total_s ?? {}} bottleneck={r.bottleneck} />
+                  </td>
+                </tr>
+              ))}
+            </tbody>
+          </table>
+        </div>
+      </Card>
+    </div>
+  );
+}
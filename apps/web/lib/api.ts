@@ -56,6 +56,7 @@ export async function runPipeline(params?: {
   pages?: number;
   count?: number;
   batch?: number;
+  mode?: "batch" | "stream";
 }) {
   const res = await fetch(`${API_BASE}/pipeline/run`, {
     method: "POST",
@@ -63,23 +64,55 @@ export async function runPipeline(params?: {
     body: JSON.stringify(params ?? {}),
   });
   if (!res.ok) throw new Error(await res.text());
-  return res.json() as Promise<{ job_id: string }>;
+  return res.json() as Promise<{ job_id: string; deduplicated: boolean }>;
 }
 
+export type PipelineJob = {
+  id: string;
+  state: "queued" | "running" | "succeeded" | "failed" | "cancelled";
+  vertical?: string | null;
+  params: Record<string, unknown>;
+  worker_id?: string | null;
+  created_at: string;
+  started_at?: string | null;
+  finished_at?: string | null;
+  cancel_requested: boolean;
+  return_code?: number | null;
+  error?: string | null;
+  log_tail: string;
+};
+
 export async function getPipelineJob(jobId: string) {
   const res = await fetch(`${API_BASE}/pipeline/jobs/${jobId}`);
   if (!res.ok) throw new Error(await res.text());
-  return res.json() as Promise<{
-    id: string;
-    state: "queued" | "running" | "succeeded" | "failed";
-    created_at: string;
-    started_at?: string | null;
-    finished_at?: string | null;
-    return_code?: number | null;
-    error?: string | null;
-    log_tail: string;
-  }>;
+  return res.json() as Promise<PipelineJob>;
+}
+
+export function getPipelineJobs(limit = 20) {
+  return getJSON<PipelineJob[]>(`/pipeline/jobs?limit=${limit}`);
+}
+
+export async function cancelPipelineJob(jobId: string) {
+  const res = await fetch(`${API_BASE}/pipeline/jobs/${jobId}/cancel`, { method: "POST" });
+  if (!res.ok) throw new Error(await res.text());
+  return res.json() as Promise<PipelineJob>;
+}
+
+export type PipelineJobLog = {
+  job_id: string;
+  state: PipelineJob["state"];
+  offset: number;
+  size: number;
+  data: string;
+  finished: boolean;
+};
+
+// Pass back the returned offset to get only new output; omit it to start near the end
+export function getPipelineJobLog(jobId: string, offset?: number) {
+  const q = offset === undefined ? "" : `?offset=${offset}`;
+  return getJSON<PipelineJobLog>(`/pipeline/jobs/${jobId}/log${q}`);
 }
+
 export async function getAspectOptions(vertical: string, days: number) {
   const base = process.env.NEXT_PUBLIC_API_BASE ?? "http://127.0.0.1:8000";
   const url = new URL(`${base}/options/aspects`);
@@ -89,3 +122,41 @@ export async function getAspectOptions(vertical: string, days: number) {
   if (!r.ok) throw new Error(`getAspectOptions failed: ${r.status}`);
   return r.json();
 }
+
+export type OpsRun = {
+  id: string;
+  kind: string;
+  status: "running" | "succeeded" | "failed";
+  worker_id: string | null;
+  started_at: string;
+  finished_at: string | null;
+  model_version: string | null;
+  prompt_version: string | null;
+  totals: Record<string, number>;
+  elapsed_s: number | null;
+  bottleneck: string | null;
+  stage_total_s: Record<string, number>;
+  error: string | null;
+};
+
+export type OpsRunStage = {
+  count: number;
+  total_s: number;
+  avg_ms: number;
+  p50_ms: number;
+  p95_ms: number;
+  max_ms: number;
+};
+
+export type OpsRunDetail = OpsRun & {
+  params: Record<string, any>;
+  metrics: { stages?: Record<string, OpsRunStage>; llm?: Record<string, number>; [k: string]: any };
+};
+
+export function getOpsRuns(limit = 20) {
+  return getJSON<{ count: number; items: OpsRun[] }>(`/ops/runs?limit=${limit}`);
+}
+
+export function getOpsRun(runId: string) {
+  return getJSON<OpsRunDetail>(`/ops/runs/${encodeURIComponent(runId)}`);
+}
@@ -1,15 +1,33 @@
-from datetime import datetime, timezone
+import copy
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
 
 import yaml
-from sqlalchemy import or_, select
+from sqlalchemy import and_, delete, literal_column, or_, select, update
 from sqlalchemy.dialects.postgresql import insert
 
 from apps.api.app.db import SessionLocal, engine
-from apps.api.app.models import Base, ReviewEnriched, ReviewRaw
-from jobs.analyze.extraction_ollama import call_ollama_json, render_prompt
-from jobs.analyze.sentiment_hf import SentimentClassifier
+from apps.api.app.models import (
+    AnalysisFailure,
+    AnalysisLease,
+    Base,
+    PipelineRun,
+    ReviewEnriched,
+    ReviewRaw,
+    ReviewRawSignature,
+)
+from jobs.analyze.context import VerticalContext, build_vertical_contexts
+from jobs.analyze.extraction_cache import ExtractionCache, cache_key
+from jobs.analyze.extraction_ollama import OLLAMA_BASE_URL, OllamaClient, packed_extraction_schema
+from jobs.analyze.metrics import RunMetrics
+from jobs.analyze.routing import ROUTING_MODES, TIER_LLM, TIERS, RouteDecision, Router, format_tier_report
+from jobs.analyze.sentiment_hf import BACKENDS as SENTIMENT_BACKENDS, SentimentClassifier
 
 
 def load_vertical_config() -> Dict[str, Any]:
@@ -17,50 +35,174 @@ def load_vertical_config() -> Dict[str, Any]:
     return yaml.safe_load(path.read_text(encoding="utf-8"))
 
 
-def build_aspect_to_stakeholder(cfg: Dict[str, Any], vertical_key: str) -> Dict[str, str]:
-    aspect_to_team: Dict[str, str] = {}
+class RawItem(NamedTuple):
+    """
+    Projection of reviews_raw with only what analysis needs (no raw_payload).
+    Attribute names match ReviewRaw so either can flow through the analyzer.
+    """
+    id: uuid.UUID
+    source: str
+    source_review_id: str
+    vertical: str
+    created_at: datetime
+    original_text: str
+    rating: Optional[int]
 
-    global_stakeholders = cfg.get("global_stakeholders", {})
-    for team, aspects in global_stakeholders.items():
-        for a in aspects:
-            aspect_to_team[a] = team
 
-    v = cfg["verticals"][vertical_key]
-    stakeholders = v.get("stakeholders", {})
-    for team, aspects in stakeholders.items():
-        for a in aspects:
-            aspect_to_team[a] = team
+# Name prefix of the extraction threads (the pipeline worker routes their output to the job log)
+THREAD_NAME_PREFIX = "ollama"
 
-    return aspect_to_team
+_RAW_ITEM_COLUMNS = (
+    ReviewRaw.id,
+    ReviewRaw.source,
+    ReviewRaw.source_review_id,
+    ReviewRaw.vertical,
+    ReviewRaw.created_at,
+    ReviewRaw.original_text,
+    ReviewRaw.rating,
+)
 
 
-def select_raws(db, limit: int = 50, force: bool = False) -> List[ReviewRaw]:
+def _backlog_stmt(
+    force: bool = False,
+    retry_failed: bool = False,
+    failed_before: Optional[datetime] = None,
+    now: Optional[datetime] = None,
+    source: Optional[str] = None,
+    raw_ids: Optional[List[uuid.UUID]] = None,
+):
     """
+    Anti-join over reviews_raw (LEFT JOIN ... IS NULL, backed by the raw_id indexes):
     - Default: only raws that do not exist in enriched (by raw_id)
     - Force: take latest raws regardless (will upsert into enriched)
+    - Dead-lettered raws (reviews_analysis_failures) are always skipped, unless
+      retry_failed, which takes only those (that last failed before `failed_before`)
+    - When `now` is given, raws under an unexpired lease are skipped
+    - When `source` is given, only raws from that source
+    - When `raw_ids` is given, only those raws
     """
-    if force:
-        stmt = select(ReviewRaw).order_by(ReviewRaw.created_at.desc()).limit(limit)
-        return db.execute(stmt).scalars().all()
+    stmt = select(*_RAW_ITEM_COLUMNS)
+    if source is not None:
+        stmt = stmt.where(ReviewRaw.source == source)
+    if raw_ids is not None:
+        stmt = stmt.where(ReviewRaw.id.in_(raw_ids))
+
+    if not force:
+        stmt = stmt.outerjoin(ReviewEnriched, ReviewEnriched.raw_id == ReviewRaw.id).where(
+            ReviewEnriched.raw_id.is_(None)
+        )
+
+    if retry_failed:
+        on = AnalysisFailure.raw_id == ReviewRaw.id
+        if failed_before is not None:
+            on = and_(on, AnalysisFailure.last_failed_at < failed_before)
+        stmt = stmt.join(AnalysisFailure, on)
+    else:
+        stmt = stmt.outerjoin(AnalysisFailure, AnalysisFailure.raw_id == ReviewRaw.id).where(
+            AnalysisFailure.raw_id.is_(None)
+        )
+
+    if now is not None:
+        stmt = stmt.outerjoin(
+            AnalysisLease,
+            and_(AnalysisLease.raw_id == ReviewRaw.id, AnalysisLease.leased_until > now),
+        ).where(AnalysisLease.raw_id.is_(None))
+
+    return stmt.order_by(ReviewRaw.created_at.desc())
+
 
-    subq = select(ReviewEnriched.raw_id)
+def select_raws(
+    db,
+    limit: int = 50,
+    force: bool = False,
+    retry_failed: bool = False,
+    failed_before: Optional[datetime] = None,
+    source: Optional[str] = None,
+) -> List[RawItem]:
+    """
+    Read-only view of the next backlog rows (no lease taken). See _backlog_stmt.
+    """
+    stmt = _backlog_stmt(
+        force=force, retry_failed=retry_failed, failed_before=failed_before, source=source
+    ).limit(limit)
+    return [RawItem(*row) for row in db.execute(stmt).all()]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_raws(
+    db,
+    worker_id: str,
+    limit: int = 50,
+    lease_seconds: int = 900,
+    force: bool = False,
+    retry_failed: bool = False,
+    failed_before: Optional[datetime] = None,
+    source: Optional[str] = None,
+    raw_ids: Optional[List[uuid.UUID]] = None,
+) -> List[RawItem]:
+    """
+    Claim up to `limit` backlog raws (only among `raw_ids`, if given) for this
+    worker and commit the claim.
+
+    Candidates are locked with FOR UPDATE SKIP LOCKED so concurrent workers pass
+    over each other's rows, then leased in reviews_analysis_leases. The lease
+    upsert only takes over expired leases, so a row another worker leased between
+    our snapshot and our lock is dropped instead of analyzed twice.
+    Leases expire on their own if a worker dies mid-chunk.
+    """
+    now = datetime.now(timezone.utc)
     stmt = (
-        select(ReviewRaw)
-        .where(~ReviewRaw.id.in_(subq))
-        .order_by(ReviewRaw.created_at.desc())
+        _backlog_stmt(
+            force=force,
+            retry_failed=retry_failed,
+            failed_before=failed_before,
+            now=now,
+            source=source,
+            raw_ids=raw_ids,
+        )
         .limit(limit)
+        .with_for_update(of=ReviewRaw, skip_locked=True)
     )
-    return db.execute(stmt).scalars().all()
+    candidates = [RawItem(*row) for row in db.execute(stmt).all()]
+    if not candidates:
+        db.commit()
+        return []
 
+    until = now + timedelta(seconds=lease_seconds)
+    lease = insert(AnalysisLease).values(
+        [{"raw_id": r.id, "worker_id": worker_id, "leased_at": now, "leased_until": until} for r in candidates]
+    )
+    lease = lease.on_conflict_do_update(
+        index_elements=["raw_id"],
+        set_={
+            "worker_id": lease.excluded.worker_id,
+            "leased_at": lease.excluded.leased_at,
+            "leased_until": lease.excluded.leased_until,
+        },
+        where=AnalysisLease.leased_until <= now,
+    ).returning(AnalysisLease.raw_id)
+    acquired = set(db.execute(lease).scalars().all())
+    db.commit()
 
-def upsert_enriched(db, row: Dict[str, Any], force: bool = False) -> bool:
-    """
-    Upsert into reviews_enriched using (source, source_review_id) as the conflict key.
+    return [r for r in candidates if r.id in acquired]
+
+
+def release_leases(db, raw_ids: List[uuid.UUID], worker_id: str) -> None:
+    if not raw_ids:
+        return
+    db.execute(
+        delete(AnalysisLease).where(
+            AnalysisLease.raw_id.in_(raw_ids),
+            AnalysisLease.worker_id == worker_id,
+        )
+    )
 
-    - If force=False: update only when model_version or prompt_version differs.
-    - If force=True: always overwrite the enrichment fields on conflict.
-    """
-    stmt = insert(ReviewEnriched).values(**row)
+
+def _upsert_enriched_stmt(rows: List[Dict[str, Any]], force: bool):
+    stmt = insert(ReviewEnriched).values(rows)
 
     set_updates = {
         "raw_id": stmt.excluded.raw_id,
@@ -89,111 +231,176 @@ def upsert_enriched(db, row: Dict[str, Any], force: bool = False) -> bool:
             ),
         )
 
-    res = db.execute(upsert_stmt)
-    return res.rowcount == 1
+    # xmax = 0 only for freshly inserted tuples; rows skipped by the WHERE are not returned
+    return upsert_stmt.returning(literal_column("(xmax = 0)").label("inserted"))
 
 
-def main(
-    model: str = "mistral:7b-instruct",
-    batch_size: int = 25,
-    force: bool = False,
-    prompt_version: str = "v1",
-) -> None:
-    Base.metadata.create_all(bind=engine)
-    cfg = load_vertical_config()
-    sentiment = SentimentClassifier()
-    template_path = Path("jobs/analyze/prompts/extraction.jinja")
+def upsert_enriched(db, row: Dict[str, Any], force: bool = False) -> bool:
+    """
+    Upsert into reviews_enriched using (source, source_review_id) as the conflict key.
 
-    inserted_or_updated = 0
+    - If force=False: update only when model_version or prompt_version differs.
+    - If force=True: always overwrite the enrichment fields on conflict.
+    """
+    inserted, updated = upsert_enriched_many(db, [row], force=force)
+    return inserted + updated == 1
 
-    with SessionLocal() as db:
-        raws = select_raws(db, limit=batch_size, force=force)
 
-        for r in raws:
-            vertical_key = r.vertical
+def upsert_enriched_many(db, rows: List[Dict[str, Any]], force: bool = False) -> Tuple[int, int]:
+    """
+    Multi-row version of upsert_enriched: one INSERT ... ON CONFLICT DO UPDATE
+    for the whole list, same force / version-difference semantics.
+    Returns (inserted, updated).
+    """
+    if not rows:
+        return 0, 0
+
+    # Postgres rejects a statement that touches the same conflict key twice; last row wins
+    by_key: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for row in rows:
+        by_key[(row["source"], row["source_review_id"])] = row
+
+    flags = db.execute(_upsert_enriched_stmt(list(by_key.values()), force)).scalars().all()
+    inserted = sum(1 for f in flags if f)
+    return inserted, len(flags) - inserted
+
+
+class EnrichedWriter:
+    """
+    Buffers enriched rows and writes them as multi-row upserts of `flush_size`.
+    Keeps running inserted/updated counts across flushes.
+    """
+
+    def __init__(self, db, force: bool = False, flush_size: int = 500, metrics: Optional[RunMetrics] = None):
+        self.db = db
+        self.metrics = metrics
+        self.force = force
+        self.flush_size = max(1, flush_size)
+        self.inserted = 0
+        self.updated = 0
+        self._buf: List[Dict[str, Any]] = []
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self._buf.append(row)
+        if len(self._buf) >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buf:
+            return
+        t0 = time.perf_counter()
+        inserted, updated = upsert_enriched_many(self.db, self._buf, force=self.force)
+        if self.metrics is not None:
+            self.metrics.observe("upsert_enriched", time.perf_counter() - t0)
+            # Rows actually written: repeated keys collapse, unchanged versions are skipped
+            self.metrics.count("rows_upserted", inserted + updated)
+        self.inserted += inserted
+        self.updated += updated
+        self._buf = []
 
-            allowed = list(cfg.get("global_aspects", []))
-            allowed.extend(cfg["verticals"].get(vertical_key, {}).get("aspects", []))
-            allowed = sorted(set(allowed))
 
-            aspect_to_team = build_aspect_to_stakeholder(cfg, vertical_key)
+def apply_guardrail(extraction: Dict[str, Any], allowed_set: FrozenSet[str]) -> List[Dict[str, Any]]:
+    """
+    Keep only aspects from the allowed list; everything else is moved to
+    unmapped_issues. Mutates `extraction` and returns the kept aspects.
+    """
+    mentioned = extraction.get("mentioned_aspects", []) or []
+
+    kept: List[Dict[str, Any]] = []
+    moved_to_unmapped: List[Dict[str, Any]] = []
 
-            prompt = render_prompt(
-                template_path,
+    for m in mentioned:
+        asp = (m.get("aspect") or "").strip()
+        if asp in allowed_set:
+            kept.append(m)
+        else:
+            moved_to_unmapped.append(
                 {
-                    "vertical_key": vertical_key,
-                    "allowed_aspects": allowed,
-                    "aspect_to_stakeholder": aspect_to_team,
-                    "text": r.original_text,
-                },
+                    "issue": f"non_whitelisted_aspect:{asp}" if asp else "non_whitelisted_aspect:missing",
+                    "evidence": (m.get("evidence") or "").strip(),
+                    "confidence": float(m.get("confidence") or 0.0),
+                }
             )
 
-            print(f"Analyzing raw_id={r.id} vertical={r.vertical} chars={len(r.original_text)}")
+    extraction["mentioned_aspects"] = kept
 
-            extraction = call_ollama_json(model=model, prompt=prompt)
+    existing_unmapped = extraction.get("unmapped_issues", []) or []
+    extraction["unmapped_issues"] = existing_unmapped + moved_to_unmapped
+    return kept
 
-            # Overall sentiment from original text
-            overall_pred = sentiment.predict_labels([r.original_text])[0]
-            overall_sentiment = overall_pred["label"]
 
-            mentioned = extraction.get("mentioned_aspects", []) or []
+def enrich_batch(
+    items: List[Tuple[RawItem, Dict[str, Any], VerticalContext]],
+    sentiment: SentimentClassifier,
+    model: str,
+    prompt_version: str,
+    metrics: Optional[RunMetrics] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Turn (raw, extraction, vertical context) triples into reviews_enriched rows:
+    guardrail on aspects, overall + per-aspect sentiment, stakeholder flags.
 
-            # Guardrail: only keep aspects from allowed list
-            allowed_set = set(allowed)
-            kept: List[Dict[str, Any]] = []
-            moved_to_unmapped: List[Dict[str, Any]] = []
+    Sentiment runs once for the whole batch: overall texts and evidence snippets
+    of every review go through a single length-bucketed inference call and the
+    labels are scattered back to their review / aspect.
+    """
+    texts: List[str] = []
+    # per review: (index of overall text, [(aspect dict, index of evidence text or None)])
+    slots: List[Tuple[int, List[Tuple[Dict[str, Any], Optional[int]]]]] = []
 
-            for m in mentioned:
-                asp = (m.get("aspect") or "").strip()
-                if asp in allowed_set:
-                    kept.append(m)
-                else:
-                    moved_to_unmapped.append(
-                        {
-                            "issue": f"non_whitelisted_aspect:{asp}" if asp else "non_whitelisted_aspect:missing",
-                            "evidence": (m.get("evidence") or "").strip(),
-                            "confidence": float(m.get("confidence") or 0.0),
-                        }
-                    )
-
-            mentioned = kept
-            extraction["mentioned_aspects"] = mentioned
-
-            existing_unmapped = extraction.get("unmapped_issues", []) or []
-            extraction["unmapped_issues"] = existing_unmapped + moved_to_unmapped
-
-            # Per-aspect sentiment using evidence text
-            evidence_texts = [
-                m.get("evidence", "")[:500]
-                for m in mentioned
-                if (m.get("evidence") or "").strip()
-            ]
-            e_preds = sentiment.predict_labels(evidence_texts)
-
-            ei = 0
-            for m in mentioned:
-                ev = (m.get("evidence") or "").strip()
-                if not ev:
-                    m["sentiment"] = "Neutral"
-                    m["sentiment_confidence"] = 0.0
-                    continue
-                m["sentiment"] = e_preds[ei]["label"]
-                m["sentiment_confidence"] = e_preds[ei]["confidence"]
-                ei += 1
-
-            extraction["mentioned_aspects"] = mentioned
-
-            # Stakeholder sentiment flags
-            flags: Dict[str, Dict[str, int]] = {}
-            for m in mentioned:
-                team = m.get("stakeholder") or "product"
-                sent = m.get("sentiment") or "Neutral"
-                flags.setdefault(team, {"Positive": 0, "Neutral": 0, "Negative": 0})
-                if sent not in flags[team]:
-                    sent = "Neutral"
-                flags[team][sent] += 1
-
-            enriched_row: Dict[str, Any] = {
+    rejected = 0
+    for r, extraction, ctx in items:
+        proposed = len(extraction.get("mentioned_aspects") or [])
+        mentioned = apply_guardrail(extraction, ctx.allowed_set)
+        rejected += proposed - len(mentioned)
+
+        overall_idx = len(texts)
+        texts.append(r.original_text)
+
+        aspect_slots: List[Tuple[Dict[str, Any], Optional[int]]] = []
+        for m in mentioned:
+            ev = (m.get("evidence") or "").strip()
+            if not ev:
+                aspect_slots.append((m, None))
+                continue
+            aspect_slots.append((m, len(texts)))
+            texts.append(m.get("evidence", "")[:500])
+
+        slots.append((overall_idx, aspect_slots))
+
+    t0 = time.perf_counter()
+    preds = sentiment.predict_labels_bucketed(texts)
+    if metrics is not None:
+        metrics.observe("predict_labels", time.perf_counter() - t0)
+        metrics.count("sentiment_texts", len(texts))
+        metrics.count("sentiment_chars", sum(len(t) for t in texts))
+        metrics.count("guardrail_rejections", rejected)
+
+    rows: List[Dict[str, Any]] = []
+    for (r, extraction, _), (overall_idx, aspect_slots) in zip(items, slots):
+        overall_sentiment = preds[overall_idx]["label"]
+
+        # Per-aspect sentiment using evidence text
+        for m, ei in aspect_slots:
+            if ei is None:
+                m["sentiment"] = "Neutral"
+                m["sentiment_confidence"] = 0.0
+                continue
+            m["sentiment"] = preds[ei]["label"]
+            m["sentiment_confidence"] = preds[ei]["confidence"]
+
+        # Stakeholder sentiment flags
+        flags: Dict[str, Dict[str, int]] = {}
+        for m in extraction["mentioned_aspects"]:
+            team = m.get("stakeholder") or "product"
+            sent = m.get("sentiment") or "Neutral"
+            flags.setdefault(team, {"Positive": 0, "Neutral": 0, "Negative": 0})
+            if sent not in flags[team]:
+                sent = "Neutral"
+            flags[team][sent] += 1
+
+        rows.append(
+            {
                 "raw_id": r.id,
                 "source": r.source,
                 "source_review_id": r.source_review_id,
@@ -206,17 +413,596 @@ def main(
                 "model_version": model,
                 "prompt_version": prompt_version,
             }
+        )
+
+    return rows
+
 
-            if upsert_enriched(db, enriched_row, force=force):
-                inserted_or_updated += 1
+LLM_ROUTE = RouteDecision(TIER_LLM, "needs_llm")
 
+# Per-review bookkeeping in aspects_json that must not leak into a reused extraction
+_EXTRACTION_META_KEYS = ("routing", "dedup")
+
+
+def load_duplicate_extractions(
+    db,
+    raw_ids: List[uuid.UUID],
+    model: str,
+    prompt_version: str,
+) -> Dict[uuid.UUID, Tuple[uuid.UUID, Dict[str, Any]]]:
+    """
+    raw_id -> (canonical raw_id, canonical's extraction) for raws that are
+    near-duplicates (reviews_raw_signatures) of a review already enriched with the
+    same model + prompt_version.
+    """
+    if not raw_ids:
+        return {}
+    rows = db.execute(
+        select(ReviewRawSignature.raw_id, ReviewRawSignature.canonical_raw_id, ReviewEnriched.aspects_json)
+        .join(ReviewEnriched, ReviewEnriched.raw_id == ReviewRawSignature.canonical_raw_id)
+        .where(
+            ReviewRawSignature.raw_id.in_(raw_ids),
+            ReviewRawSignature.canonical_raw_id != ReviewRawSignature.raw_id,
+            ReviewEnriched.model_version == model,
+            ReviewEnriched.prompt_version == prompt_version,
+        )
+    ).all()
+    out = {}
+    for raw_id, canonical_id, aspects_json in rows:
+        extraction = {k: v for k, v in (aspects_json or {}).items() if k not in _EXTRACTION_META_KEYS}
+        out[raw_id] = (canonical_id, extraction)
+    return out
+
+
+def record_failure(db, raw_id, error: str, model: str, prompt_version: str) -> None:
+    """
+    Dead-letter a raw review whose extraction failed. Repeated failures bump `attempts`.
+    """
+    now = datetime.now(timezone.utc)
+    stmt = insert(AnalysisFailure).values(
+        raw_id=raw_id,
+        error=error[:4000],
+        attempts=1,
+        first_failed_at=now,
+        last_failed_at=now,
+        model_version=model,
+        prompt_version=prompt_version,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["raw_id"],
+        set_={
+            "error": stmt.excluded.error,
+            "attempts": AnalysisFailure.attempts + 1,
+            "last_failed_at": stmt.excluded.last_failed_at,
+            "model_version": stmt.excluded.model_version,
+            "prompt_version": stmt.excluded.prompt_version,
+        },
+    )
+    db.execute(stmt)
+
+
+def start_run(
+    worker_id: str,
+    model: str,
+    prompt_version: str,
+    params: Dict[str, Any],
+    kind: str = "analyze",
+) -> uuid.UUID:
+    """
+    Open a pipeline_runs row (status=running) in its own transaction.
+    """
+    run_id = uuid.uuid4()
+    with SessionLocal() as db:
+        db.add(
+            PipelineRun(
+                id=run_id,
+                kind=kind,
+                status="running",
+                worker_id=worker_id,
+                started_at=datetime.now(timezone.utc),
+                model_version=model,
+                prompt_version=prompt_version,
+                params=params,
+                totals={},
+                metrics={},
+            )
+        )
+        db.commit()
+    return run_id
+
+
+def update_run(
+    run_id: uuid.UUID,
+    totals: Dict[str, Any],
+    metrics: Dict[str, Any],
+    status: str = "running",
+    error: Optional[str] = None,
+) -> None:
+    """
+    Store the latest totals / metrics of a run; any status but "running" also closes it.
+    """
+    values: Dict[str, Any] = {"status": status, "totals": totals, "metrics": metrics}
+    if status != "running":
+        values["finished_at"] = datetime.now(timezone.utc)
+        values["error"] = error[:4000] if error else None
+    with SessionLocal() as db:
+        db.execute(update(PipelineRun).where(PipelineRun.id == run_id).values(**values))
         db.commit()
 
+
+def analyze_chunk(
+    db,
+    raws: List[RawItem],
+    *,
+    pool: ThreadPoolExecutor,
+    client: OllamaClient,
+    contexts: Dict[str, VerticalContext],
+    sentiment: SentimentClassifier,
+    cache: ExtractionCache,
+    model: str,
+    prompt_version: str,
+    force: bool = False,
+    sentiment_batch: int = 32,
+    write_batch: int = 500,
+    use_schema: bool = True,
+    pack_size: int = 1,
+    pack_max_chars: int = 100,
+    router: Optional[Router] = None,
+    metrics: Optional[RunMetrics] = None,
+    reuse_duplicates: bool = False,
+    dead_letter: bool = True,
+) -> Dict[str, Any]:
+    """
+    Analyze one chunk of raws inside the caller's session (the caller commits).
+
+    Extractions that fail with a content error (invalid JSON after retry, bad
+    payload) are dead-lettered in reviews_analysis_failures, or with
+    dead_letter=False only counted, and the rest of the chunk carries on.
+    Transport errors (Ollama down, timeouts) still propagate so a broken model
+    server doesn't dead-letter the whole backlog.
+
+    With pack_size > 1, uncached reviews of at most `pack_max_chars` are packed
+    up to `pack_size` per request (same vertical). Items missing or malformed in
+    the packed answer, or a pack that fails entirely, fall back to single calls.
+
+    With a `router`, trivial (and optionally lexicon-only) reviews skip the LLM;
+    every review then carries its decision in aspects_json["routing"].
+
+    With `reuse_duplicates`, near-duplicates of an already enriched review (see
+    jobs/ingest/dedup.py) reuse its extraction instead of calling the LLM and
+    record the link in aspects_json["dedup"]; sentiment still runs on their own text.
+
+    Stage timings and per-review latency go to `metrics` when given.
+    """
+    metrics = metrics if metrics is not None else RunMetrics()
+    chunk_t0 = time.perf_counter()
+    writer = EnrichedWriter(db, force=force, flush_size=write_batch, metrics=metrics)
+
+    ready: List[Tuple[RawItem, Dict[str, Any], VerticalContext]] = []
+    succeeded_ids: List[Any] = []
+    failed = 0
+    packed_calls = 0
+    tiers = {t: 0 for t in TIERS}
+    routing = router is not None and router.enabled
+
+    reusable: Dict[uuid.UUID, Tuple[uuid.UUID, Dict[str, Any]]] = {}
+    if reuse_duplicates:
+        with metrics.stage("duplicate_lookup"):
+            reusable = load_duplicate_extractions(db, [r.id for r in raws], model, prompt_version)
+    reused = 0
+
+    # One LLM extraction per distinct cache key; duplicates in the chunk share it
+    jobs: Dict[str, Tuple[VerticalContext, str, List[RawItem]]] = {}
+    for r in raws:
+        ctx = contexts[r.vertical]
+
+        if routing:
+            decision = router.route(ctx, r.original_text, r.rating)
+            tiers[decision.tier] += 1
+            if decision.extraction is not None:
+                extraction = copy.deepcopy(decision.extraction)
+                extraction["routing"] = decision.record()
+                ready.append((r, extraction, ctx))
+                continue
+        else:
+            tiers[TIER_LLM] += 1
+
+        if r.id in reusable:
+            canonical_id, extraction = reusable[r.id]
+            extraction = copy.deepcopy(extraction)
+            extraction["dedup"] = {"canonical_raw_id": str(canonical_id)}
+            if routing:
+                extraction["routing"] = LLM_ROUTE.record()
+            ready.append((r, extraction, ctx))
+            reused += 1
+            continue
+
+        key = cache_key(r.original_text, r.vertical, model, prompt_version, ctx.allowed_aspects)
+        if key in jobs:
+            jobs[key][2].append(r)
+        else:
+            jobs[key] = (ctx, r.original_text, [r])
+
+    with metrics.stage("cache_lookup"):
+        cached = cache.get_many(db, list(jobs))
+
+    def _flush() -> None:
+        rows = enrich_batch(ready, sentiment, model, prompt_version, metrics=metrics)
+        done_at = time.perf_counter()
+        for enriched_row in rows:
+            writer.add(enriched_row)
+            metrics.observe_review(done_at - chunk_t0)
+        succeeded_ids.extend(r.id for r, _, _ in ready)
+        ready.clear()
+
+    def _timed_call(fn, *args):
+        # Runs on the extraction threads
+        with metrics.stage("call_ollama_json"):
+            return fn(*args)
+
+    def _accept(key: str, extraction: Dict[str, Any], store: bool = True) -> None:
+        ctx, _, consumers = jobs[key]
+        if store:
+            cache.put(key, ctx.vertical_key, model, prompt_version, extraction)
+        for r in consumers:
+            # enrich_batch mutates the extraction; each review gets its own copy
+            item = copy.deepcopy(extraction)
+            if routing:
+                item["routing"] = LLM_ROUTE.record()
+            ready.append((r, item, ctx))
+
+    # pending future -> ("single" | "pack", cache keys it covers, pack ids)
+    pending: Dict[Future, Tuple[str, List[str], List[str]]] = {}
+
+    def _submit_single(key: str) -> None:
+        ctx, text_, consumers = jobs[key]
+        r = consumers[0]
+        print(f"Analyzing raw_id={r.id} vertical={r.vertical} chars={len(text_)}")
+        schema = ctx.output_schema if use_schema else None
+        with metrics.stage("render_prompt"):
+            prompt = ctx.render(text_)
+        metrics.count("prompt_chars", len(prompt))
+        fut = pool.submit(_timed_call, client.extract_json, model, prompt, schema)
+        pending[fut] = ("single", [key], [])
+
+    def _submit_pack(keys: List[str]) -> None:
+        ctx = jobs[keys[0]][0]
+        with metrics.stage("render_prompt"):
+            prompt, ids = ctx.render_packed([jobs[k][1] for k in keys])
+        metrics.count("prompt_chars", len(prompt))
+        print(f"Analyzing pack of {len(keys)} vertical={ctx.vertical_key}")
+        schema = packed_extraction_schema(ctx.allowed_aspects, ids) if use_schema else None
+        fut = pool.submit(_timed_call, client.extract_packed, model, prompt, ids, schema)
+        pending[fut] = ("pack", keys, ids)
+
+    try:
+        to_extract: List[str] = []
+        for key in jobs:
+            if key in cached:
+                _accept(key, cached[key], store=False)
+            else:
+                to_extract.append(key)
+
+        # Packing: short reviews of the same vertical share one request
+        packable: Dict[str, List[str]] = {}
+        for key in to_extract:
+            ctx, text_, _ = jobs[key]
+            if pack_size > 1 and ctx.packed_template is not None and len(text_) <= pack_max_chars:
+                packable.setdefault(ctx.vertical_key, []).append(key)
+            else:
+                _submit_single(key)
+
+        for keys in packable.values():
+            for i in range(0, len(keys), pack_size):
+                group = keys[i : i + pack_size]
+                if len(group) == 1:
+                    _submit_single(group[0])
+                else:
+                    _submit_pack(group)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                kind, keys, ids = pending.pop(fut)
+
+                if kind == "pack":
+                    packed_calls += 1
+                    try:
+                        results = fut.result()
+                    except (RuntimeError, ValueError) as e:
+                        print(f"Pack of {len(keys)} failed, falling back to single calls: {e}")
+                        results = {}
+                    for key, item_id in zip(keys, ids):
+                        if item_id in results:
+                            _accept(key, results[item_id])
+                        else:
+                            _submit_single(key)
+                else:
+                    key = keys[0]
+                    try:
+                        extraction = fut.result()
+                        if not isinstance(extraction, dict):
+                            raise ValueError(f"extraction is {type(extraction).__name__}, expected object")
+                    except (RuntimeError, ValueError) as e:
+                        for r in jobs[key][2]:
+                            print(f"Failed raw_id={r.id}: {e}")
+                            if dead_letter:
+                                record_failure(db, r.id, str(e), model, prompt_version)
+                            failed += 1
+                        continue
+                    _accept(key, extraction)
+
+                if len(ready) >= max(1, sentiment_batch):
+                    _flush()
+
+        if ready:
+            _flush()
+        writer.flush()
+    except BaseException:
+        # Don't keep paying for queued LLM calls nobody will consume
+        for fut in pending:
+            fut.cancel()
+        raise
+
+    if succeeded_ids:
+        # Explicit retries that now succeed leave the dead-letter table
+        db.execute(delete(AnalysisFailure).where(AnalysisFailure.raw_id.in_(succeeded_ids)))
+
+    return {
+        "analyzed": len(raws),
+        "inserted": writer.inserted,
+        "updated": writer.updated,
+        "failed": failed,
+        "packed_calls": packed_calls,
+        "reused": reused,
+        "tiers": tiers,
+    }
+
+
+def main(
+    model: str = "mistral:7b-instruct",
+    batch_size: int = 25,
+    force: bool = False,
+    prompt_version: str = "v1",
+    concurrency: int = 1,
+    sentiment_batch: int = 32,
+    use_cache: bool = True,
+    cache_max_entries: Optional[int] = 200_000,
+    cache_max_age_days: Optional[int] = 90,
+    write_batch: int = 500,
+    until_empty: bool = False,
+    max_chunks: Optional[int] = None,
+    retry_failed: bool = False,
+    worker_id: Optional[str] = None,
+    lease_seconds: int = 900,
+    sentiment_backend: str = "torch",
+    sentiment_threads: Optional[int] = None,
+    use_schema: bool = True,
+    pack_size: int = 1,
+    pack_max_chars: int = 100,
+    routing: str = "off",
+    source: Optional[str] = None,
+    ollama_base_url: Optional[str] = None,
+    sentiment: Optional[SentimentClassifier] = None,
+    reuse_duplicates: bool = False,
+    cfg: Optional[Dict[str, Any]] = None,
+    raw_id_batches: Optional[Iterable[List[uuid.UUID]]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Dict[str, Any]:
+    """
+    Analyze raw reviews in chunks of `batch_size`, committing after each chunk.
+
+    Extraction calls go through a thread pool capped at `concurrency` in-flight
+    requests. The main thread consumes results as they complete and does the
+    sentiment inference + upsert, so those overlap with the remaining LLM calls.
+    Match `concurrency` to what the Ollama server can serve (OLLAMA_NUM_PARALLEL).
+
+    Completed extractions are buffered and sent to the sentiment model
+    `sentiment_batch` reviews at a time.
+
+    Before calling Ollama, extractions are looked up in the persistent
+    extraction cache (normalized text + vertical + model + prompt_version +
+    allowed aspects), so duplicates and --force reruns skip the LLM.
+
+    Enriched rows are written through EnrichedWriter as multi-row upserts of
+    `write_batch` rows.
+
+    pack_size > 1 packs short reviews into shared LLM requests (see analyze_chunk).
+    routing="trivial" | "lexicon" skips the LLM for reviews the Router can settle.
+    reuse_duplicates reuses the extraction of an enriched near-duplicate (see analyze_chunk).
+
+    - Default: a single chunk (same as the old one-batch run).
+    - until_empty: keep taking chunks until the backlog is drained (or max_chunks).
+    - retry_failed: only take dead-lettered raws; they are skipped otherwise.
+    Failed reviews never abort the run; see analyze_chunk.
+
+    Chunks are claimed with leases (claim_raws), so several analyzer processes
+    can share the backlog without duplicating LLM work.
+
+    - source: only analyze raws from that source.
+    - ollama_base_url / sentiment: override the Ollama server and reuse an already
+      loaded classifier (the benchmark harness uses both).
+    - cfg: an already loaded verticals.yml (jobs.worker keeps one per process).
+    - raw_id_batches: streaming mode; each chunk is claimed among the next batch of
+      ids instead of from the backlog, until the iterable is exhausted (see
+      jobs/stream_pipeline.py). Time spent waiting for a batch is the wait_for_raws stage.
+    - should_stop: checked after every chunk; the run ends early (still "succeeded")
+      once it returns True (pipeline job cancellation).
+    Returns the run summary (also printed), including stage timings.
+    """
+    Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables; make sure the anti-join indexes exist too
+    for index in ReviewEnriched.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    worker_id = worker_id or default_worker_id()
+    cfg = cfg if cfg is not None else load_vertical_config()
+    contexts = build_vertical_contexts(cfg)
+    if sentiment is None:
+        sentiment = SentimentClassifier(backend=sentiment_backend, num_threads=sentiment_threads)
+    client = OllamaClient(base_url=ollama_base_url or OLLAMA_BASE_URL, pool_size=max(1, concurrency))
+    router = Router(contexts, cfg, mode=routing)
+
+    cache = ExtractionCache(
+        enabled=use_cache,
+        max_entries=cache_max_entries,
+        max_age_days=cache_max_age_days,
+    )
+
+    run_started = datetime.now(timezone.utc)
+    totals = {"analyzed": 0, "inserted": 0, "updated": 0, "failed": 0, "packed_calls": 0, "reused": 0}
+    tier_totals = {t: 0 for t in TIERS}
+    chunks = 0
+    metrics = RunMetrics()
+    run_id = start_run(
+        worker_id,
+        model,
+        prompt_version,
+        params={
+            "batch_size": batch_size,
+            "force": force,
+            "concurrency": concurrency,
+            "sentiment_batch": sentiment_batch,
+            "sentiment_backend": sentiment_backend,
+            "use_cache": use_cache,
+            "write_batch": write_batch,
+            "until_empty": until_empty,
+            "retry_failed": retry_failed,
+            "use_schema": use_schema,
+            "pack_size": pack_size,
+            "routing": routing,
+            "source": source,
+            "reuse_duplicates": reuse_duplicates,
+            "stream": raw_id_batches is not None,
+        },
+    )
+
+    def _run_totals() -> Dict[str, Any]:
+        return {**totals, "chunks": chunks, "tiers": tier_totals}
+
+    def _run_metrics() -> Dict[str, Any]:
+        return {**metrics.summary(), "llm": client.metrics.snapshot(), "cache": cache.stats()}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix=THREAD_NAME_PREFIX) as pool:
+            id_batches = iter(raw_id_batches) if raw_id_batches is not None else None
+            while True:
+                batch_ids: Optional[List[uuid.UUID]] = None
+                if id_batches is not None:
+                    with metrics.stage("wait_for_raws"):
+                        batch_ids = next(id_batches, None)
+                    if batch_ids is None:
+                        break
+
+                with SessionLocal() as db:
+                    with metrics.stage("select_raws"):
+                        raws = claim_raws(
+                            db,
+                            worker_id,
+                            limit=batch_size if batch_ids is None else len(batch_ids),
+                            lease_seconds=lease_seconds,
+                            force=force,
+                            retry_failed=retry_failed,
+                            failed_before=run_started,
+                            source=source,
+                            raw_ids=batch_ids,
+                        )
+                    if not raws:
+                        if batch_ids is not None:
+                            # Already enriched / leased elsewhere; wait for the next batch
+                            continue
+                        break
+                    metrics.count("raws_claimed", len(raws))
+
+                    raw_ids = [r.id for r in raws]
+                    try:
+                        stats = analyze_chunk(
+                            db,
+                            raws,
+                            pool=pool,
+                            client=client,
+                            contexts=contexts,
+                            sentiment=sentiment,
+                            cache=cache,
+                            model=model,
+                            prompt_version=prompt_version,
+                            force=force,
+                            sentiment_batch=sentiment_batch,
+                            write_batch=write_batch,
+                            use_schema=use_schema,
+                            pack_size=pack_size,
+                            pack_max_chars=pack_max_chars,
+                            router=router,
+                            metrics=metrics,
+                            reuse_duplicates=reuse_duplicates,
+                        )
+                    except BaseException:
+                        # Hand the chunk back right away instead of waiting for lease expiry
+                        db.rollback()
+                        release_leases(db, raw_ids, worker_id)
+                        db.commit()
+                        raise
+
+                    # Leases go away in the same transaction as the results
+                    release_leases(db, raw_ids, worker_id)
+                    db.commit()
+
+                chunks += 1
+                for k in totals:
+                    totals[k] += stats[k]
+                for t in tier_totals:
+                    tier_totals[t] += stats["tiers"][t]
+                print(
+                    f"Chunk={chunks} Analyzed={stats['analyzed']} Inserted={stats['inserted']} "
+                    f"Updated={stats['updated']} Failed={stats['failed']}"
+                )
+                update_run(run_id, _run_totals(), _run_metrics())
+
+                if should_stop is not None and should_stop():
+                    print(f"Stopping after chunk {chunks}: stop requested")
+                    break
+                if id_batches is not None:
+                    continue
+                # force re-selects the latest raws every time, so it never drains
+                if not until_empty or force:
+                    break
+                if max_chunks is not None and chunks >= max_chunks:
+                    break
+
+        with SessionLocal() as db:
+            evicted = cache.evict(db)
+            db.commit()
+    except BaseException as e:
+        update_run(run_id, _run_totals(), _run_metrics(), status="failed", error=repr(e))
+        raise
+
+    run_metrics = _run_metrics()
+    run_metrics["cache"]["evicted"] = evicted
+    update_run(run_id, _run_totals(), run_metrics, status="succeeded")
+
+    cs = run_metrics["cache"]
+    om = run_metrics["llm"]
     print(
-        f"Analyzed={len(raws)} InsertedOrUpdated={inserted_or_updated} "
-        f"Force={force} PromptVersion={prompt_version}"
+        f"Run={run_id} Analyzed={totals['analyzed']} InsertedOrUpdated={totals['inserted'] + totals['updated']} "
+        f"Inserted={totals['inserted']} Updated={totals['updated']} Failed={totals['failed']} "
+        f"Chunks={chunks} Worker={worker_id} Force={force} PromptVersion={prompt_version} Concurrency={concurrency} "
+        f"CacheHits={cs['hits']} CacheMisses={cs['misses']} CacheEvicted={evicted} "
+        f"LLMCalls={om['extractions']} PackedCalls={totals['packed_calls']} DuplicatesReused={totals['reused']} LLMRetries={om['retries']} LLMSalvaged={om['salvaged']} "
+        f"LLMAvgMs={om['avg_latency_ms']} LLMP95Ms={om['p95_latency_ms']}"
+    )
+    if router.enabled:
+        print(f"Routing={routing} Tiers {format_tier_report(tier_totals)}")
+    print(
+        "Stages "
+        + " ".join(f"{name}={st['total_s']}s/{st['count']}" for name, st in run_metrics["stages"].items())
     )
 
+    return {
+        "run_id": str(run_id),
+        **_run_totals(),
+        "worker_id": worker_id,
+        "metrics": run_metrics,
+    }
+
 
 if __name__ == "__main__":
     import argparse
@@ -226,6 +1012,90 @@ if __name__ == "__main__":
     p.add_argument("--batch", type=int, default=25)
     p.add_argument("--force", action="store_true", help="Re-analyze and upsert even if enriched already exists")
     p.add_argument("--prompt-version", default="v1", help="Track prompt changes over time (e.g., v1, v2)")
+    p.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Max in-flight Ollama extraction requests (match OLLAMA_NUM_PARALLEL)",
+    )
+    p.add_argument(
+        "--sentiment-batch",
+        type=int,
+        default=32,
+        help="Reviews per batched sentiment inference pass",
+    )
+    p.add_argument("--no-cache", action="store_true", help="Disable the persistent extraction cache")
+    p.add_argument("--cache-max-entries", type=int, default=200_000, help="Evict least recently hit beyond this size")
+    p.add_argument("--cache-max-age-days", type=int, default=90, help="Evict entries not hit for this many days")
+    p.add_argument("--write-batch", type=int, default=500, help="Rows per multi-row reviews_enriched upsert")
+    p.add_argument(
+        "--until-empty",
+        action="store_true",
+        help="Backlog mode: keep analyzing --batch sized chunks (committing each) until nothing is left",
+    )
+    p.add_argument("--max-chunks", type=int, default=None, help="Stop --until-empty after this many chunks")
+    p.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Only re-analyze dead-lettered raws (reviews_analysis_failures)",
+    )
+    p.add_argument("--worker-id", default=None, help="Lease owner name (default: hostname:pid)")
+    p.add_argument("--lease-seconds", type=int, default=900, help="How long a claimed chunk stays reserved")
+    p.add_argument(
+        "--sentiment-backend",
+        choices=list(SENTIMENT_BACKENDS),
+        default="torch",
+        help="Sentiment inference backend (compare with python -m jobs.bench.sentiment_backends)",
+    )
+    p.add_argument("--sentiment-threads", type=int, default=None, help="Intra-op threads for cpu sentiment backends")
+    p.add_argument(
+        "--no-schema",
+        action="store_true",
+        help="Send format=json instead of the JSON schema (Ollama < 0.5 has no structured outputs)",
+    )
+    p.add_argument(
+        "--pack-size",
+        type=int,
+        default=1,
+        help="Pack up to N short reviews of the same vertical into one LLM request (1 = off)",
+    )
+    p.add_argument("--pack-max-chars", type=int, default=100, help="Only reviews up to this length are packed")
+    p.add_argument(
+        "--routing",
+        choices=list(ROUTING_MODES),
+        default="off",
+        help="Skip the LLM for trivial reviews (trivial) and lexicon-matched short reviews (lexicon)",
+    )
+    p.add_argument("--source", default=None, help="Only analyze raws from this source (e.g. google_play)")
+    p.add_argument(
+        "--reuse-duplicates",
+        action="store_true",
+        help="Reuse the extraction of an already enriched near-duplicate instead of calling the LLM",
+    )
     args = p.parse_args()
 
-    main(model=args.model, batch_size=args.batch, force=args.force, prompt_version=args.prompt_version)
+    main(
+        model=args.model,
+        batch_size=args.batch,
+        force=args.force,
+        prompt_version=args.prompt_version,
+        concurrency=args.concurrency,
+        sentiment_batch=args.sentiment_batch,
+        use_cache=not args.no_cache,
+        cache_max_entries=args.cache_max_entries,
+        cache_max_age_days=args.cache_max_age_days,
+        write_batch=args.write_batch,
+        until_empty=args.until_empty,
+        max_chunks=args.max_chunks,
+        retry_failed=args.retry_failed,
+        worker_id=args.worker_id,
+        lease_seconds=args.lease_seconds,
+        sentiment_backend=args.sentiment_backend,
+        sentiment_threads=args.sentiment_threads,
+        use_schema=not args.no_schema,
+        pack_size=args.pack_size,
+        pack_max_chars=args.pack_max_chars,
+        routing=args.routing,
+        source=args.source,
+        reuse_duplicates=args.reuse_duplicates,
+    )
@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from jinja2 import Template
+
+from jobs.analyze.extraction_ollama import extraction_schema
+
+DEFAULT_TEMPLATE_PATH = Path("jobs/analyze/prompts/extraction.jinja")
+DEFAULT_PACKED_TEMPLATE_PATH = Path("jobs/analyze/prompts/extraction_packed.jinja")
+
+
+def build_aspect_to_stakeholder(cfg: Dict[str, Any], vertical_key: str) -> Dict[str, str]:
+    aspect_to_team: Dict[str, str] = {}
+
+    global_stakeholders = cfg.get("global_stakeholders", {})
+    for team, aspects in global_stakeholders.items():
+        for a in aspects:
+            aspect_to_team[a] = team
+
+    v = cfg["verticals"][vertical_key]
+    stakeholders = v.get("stakeholders", {})
+    for team, aspects in stakeholders.items():
+        for a in aspects:
+            aspect_to_team[a] = team
+
+    return aspect_to_team
+
+
+@dataclass(frozen=True)
+class VerticalContext:
+    """
+    Everything the analyzer needs per vertical, built once per run:
+    compiled prompt template, allowed aspects (sorted + frozen), the
+    aspect -> stakeholder map and the structured-output schema for Ollama.
+    """
+    vertical_key: str
+    allowed_aspects: Tuple[str, ...]
+    allowed_set: FrozenSet[str]
+    aspect_to_stakeholder: Mapping[str, str]
+    template: Template
+    output_schema: Mapping[str, Any]
+    packed_template: Optional[Template] = None
+
+    def render(self, text: str) -> str:
+        return self.template.render(
+            vertical_key=self.vertical_key,
+            allowed_aspects=self.allowed_aspects,
+            aspect_to_stakeholder=dict(self.aspect_to_stakeholder),
+            text=text,
+        )
+
+    def render_packed(self, texts: List[str]) -> Tuple[str, List[str]]:
+        """
+        Render several reviews into one prompt. Returns (prompt, item ids);
+        ids are short ("r1", "r2", ...) to keep the prompt small.
+        """
+        if self.packed_template is None:
+            raise RuntimeError("packed template not loaded for this context")
+        ids = [f"r{i + 1}" for i in range(len(texts))]
+        prompt = self.packed_template.render(
+            vertical_key=self.vertical_key,
+            allowed_aspects=self.allowed_aspects,
+            aspect_to_stakeholder=dict(self.aspect_to_stakeholder),
+            items=[{"id": i, "text": t} for i, t in zip(ids, texts)],
+        )
+        return prompt, ids
+
+
+def build_vertical_context(
+    cfg: Dict[str, Any],
+    vertical_key: str,
+    template: Template,
+    packed_template: Optional[Template] = None,
+) -> VerticalContext:
+    allowed = list(cfg.get("global_aspects", []))
+    allowed.extend(cfg["verticals"].get(vertical_key, {}).get("aspects", []))
+    allowed_sorted = tuple(sorted(set(allowed)))
+
+    return VerticalContext(
+        vertical_key=vertical_key,
+        allowed_aspects=allowed_sorted,
+        allowed_set=frozenset(allowed_sorted),
+        aspect_to_stakeholder=MappingProxyType(build_aspect_to_stakeholder(cfg, vertical_key)),
+        template=template,
+        output_schema=extraction_schema(allowed_sorted),
+        packed_template=packed_template,
+    )
+
+
+def build_vertical_contexts(
+    cfg: Dict[str, Any],
+    template_path: Path = DEFAULT_TEMPLATE_PATH,
+    packed_template_path: Optional[Path] = DEFAULT_PACKED_TEMPLATE_PATH,
+) -> Dict[str, VerticalContext]:
+    """
+    Compile the extraction templates once and build a context for every
+    vertical in verticals.yml.
+    """
+    template = Template(template_path.read_text(encoding="utf-8"))
+    packed_template = None
+    if packed_template_path is not None and packed_template_path.exists():
+        packed_template = Template(packed_template_path.read_text(encoding="utf-8"))
+    return {
+        key: build_vertical_context(cfg, key, template, packed_template)
+        for key in (cfg.get("verticals") or {})
+    }
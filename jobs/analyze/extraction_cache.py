@@ -0,0 +1,175 @@
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from apps.api.app.db import SessionLocal
+from apps.api.app.models import ExtractionCacheEntry
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(s: str) -> str:
+    """
+    Collapse whitespace and casefold so "Very  bad service" and "very bad service\n"
+    share one cache entry.
+    """
+    return _WS.sub(" ", (s or "")).strip().casefold()
+
+
+def cache_key(
+    text_: str,
+    vertical: str,
+    model: str,
+    prompt_version: str,
+    allowed_aspects: Iterable[str],
+) -> str:
+    payload = json.dumps(
+        [normalize_text(text_), vertical, model, prompt_version, sorted(set(allowed_aspects))],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Postgres-backed cache of raw extractions (before the aspect guardrail).
+
+    - get_many: one round-trip per batch, then bumps hits/last_hit_at on the entries
+      found in a short transaction of its own
+    - put: upsert a fresh extraction in a one-row transaction of its own
+    - evict: drop entries not hit for `max_age_days`, then trim to `max_entries`
+      keeping the most recently hit ones; goes through the caller's session
+
+    Writes to shared entries stay out of the caller's chunk transaction, which is
+    open for all of the chunk's LLM calls: hot keys ("good", "ok") would stay
+    row-locked for minutes and concurrent analyzers would queue or deadlock on them.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_entries: Optional[int] = 200_000,
+        max_age_days: Optional[int] = 90,
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, db, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not self.enabled or not keys:
+            self.misses += len(keys)
+            return {}
+
+        uniq = list(dict.fromkeys(keys))
+        rows = db.execute(
+            select(ExtractionCacheEntry.cache_key, ExtractionCacheEntry.extraction)
+            .where(ExtractionCacheEntry.cache_key.in_(uniq))
+        ).all()
+        found = {k: e for k, e in rows}
+
+        if found:
+            self._record_hits(list(found))
+
+        for k in keys:
+            if k in found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def _record_hits(self, keys: List[str]) -> None:
+        """
+        Bump hit counters; rows locked right now are skipped, the counters only steer eviction.
+        """
+        locked = (
+            select(ExtractionCacheEntry.cache_key)
+            .where(ExtractionCacheEntry.cache_key.in_(keys))
+            .with_for_update(skip_locked=True)
+        )
+        with SessionLocal() as hits_db:
+            hits_db.execute(
+                update(ExtractionCacheEntry)
+                .where(ExtractionCacheEntry.cache_key.in_(locked.scalar_subquery()))
+                .values(
+                    hits=ExtractionCacheEntry.hits + 1,
+                    last_hit_at=datetime.now(timezone.utc),
+                )
+            )
+            hits_db.commit()
+
+    def put(
+        self,
+        key: str,
+        vertical: str,
+        model: str,
+        prompt_version: str,
+        extraction: Dict[str, Any],
+    ) -> None:
+        if not self.enabled:
+            return
+
+        now = datetime.now(timezone.utc)
+        stmt = insert(ExtractionCacheEntry).values(
+            cache_key=key,
+            vertical=vertical,
+            model_version=model,
+            prompt_version=prompt_version,
+            extraction=extraction,
+            created_at=now,
+            last_hit_at=now,
+            hits=0,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["cache_key"],
+            set_={"extraction": stmt.excluded.extraction, "last_hit_at": stmt.excluded.last_hit_at},
+        )
+        with SessionLocal() as put_db:
+            put_db.execute(stmt)
+            put_db.commit()
+
+    def evict(self, db) -> int:
+        if not self.enabled:
+            return 0
+
+        removed = 0
+        if self.max_age_days is not None:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=self.max_age_days)
+            res = db.execute(
+                text("DELETE FROM extraction_cache WHERE last_hit_at < :cutoff"),
+                {"cutoff": cutoff},
+            )
+            removed += res.rowcount or 0
+
+        if self.max_entries is not None:
+            res = db.execute(
+                text(
+                    """
+                    DELETE FROM extraction_cache
+                    WHERE cache_key IN (
+                      SELECT cache_key FROM extraction_cache
+                      ORDER BY last_hit_at DESC
+                      OFFSET :keep
+                    )
+                    """
+                ),
+                {"keep": self.max_entries},
+            )
+            removed += res.rowcount or 0
+
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -1,8 +1,15 @@
 import json
 import re
-from typing import Any, Dict
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from jobs.analyze.metrics import LatencyStats
 
 
 # If your Ollama is not on localhost:11434, set OLLAMA_BASE_URL in your shell/env
@@ -10,6 +17,24 @@ OLLAMA_BASE_URL = (
     __import__("os").environ.get("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
 )
 
+# Unparseable outputs are kept here, one file per failure
+BAD_OUTPUT_DIR = Path("ollama_bad_outputs")
+
+STRICT_SUFFIX = (
+    "\n\nSTRICT OUTPUT REQUIREMENT:\n"
+    "- Return ONLY valid JSON.\n"
+    "- No markdown, no code fences, no commentary.\n"
+    "- Escape quotes inside strings properly.\n"
+)
+
+
+class OllamaTransportError(requests.RequestException):
+    """
+    Ollama answered with something that isn't its JSON envelope (proxy error page,
+    truncated body). Not a ValueError, so callers treat it like any other transport
+    failure (retry the chunk) rather than a bad extraction to dead-letter.
+    """
+
 
 def _strip_code_fences(s: str) -> str:
     s = s.strip()
@@ -42,65 +67,343 @@ def _cleanup_common_json_issues(s: str) -> str:
     return s.strip()
 
 
-def call_ollama_json(model: str, prompt: str, timeout: int = 120) -> Dict[str, Any]:
+def _repair_truncated_json(s: str) -> str:
     """
-    Calls Ollama and returns a dict parsed from JSON.
+    Close what a truncated / cut-off JSON object left open: an unterminated
+    string, a dangling key or comma, and any open arrays/objects.
+    """
+    stack: List[str] = []
+    in_str = False
+    esc = False
+    for ch in s:
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    out = s + '"' if in_str else s
+    out = out.rstrip()
+    # "key": <nothing>  ->  drop the key; trailing comma -> drop it
+    out = re.sub(r',?\s*"[^"]*"\s*:\s*$', "", out)
+    out = re.sub(r",\s*$", "", out)
+    for opener in reversed(stack):
+        out += "}" if opener == "{" else "]"
+    return _cleanup_common_json_issues(out)
+
+
+def _parse_model_json(raw: str) -> Tuple[Dict[str, Any], bool]:
+    stripped = _strip_code_fences(raw)
+    candidates = [_cleanup_common_json_issues(_extract_json_object(stripped))]
+
+    i = stripped.find("{")
+    if i != -1:
+        candidates.append(_repair_truncated_json(stripped[i:]))
+
+    for n, text in enumerate(candidates):
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value, n > 0
+
+    raise ValueError("no JSON object could be parsed or salvaged from model output")
+
+
+def parse_model_json(raw: str) -> Dict[str, Any]:
+    """
+    Parse a model response into a JSON object without another LLM round-trip.
+    Tries the plain cleanup first, then a salvage pass for truncated output.
+    Raises ValueError when nothing usable comes out.
+    """
+    return _parse_model_json(raw)[0]
+
+
+def extraction_schema(allowed_aspects: Iterable[str]) -> Dict[str, Any]:
+    """
+    JSON schema for Ollama's structured outputs (`format`), mirroring the schema
+    in extraction.jinja with `aspect` constrained to the allowed list.
+    """
+    issue = {
+        "type": "object",
+        "properties": {
+            "issue": {"type": "string"},
+            "evidence": {"type": "string"},
+            "confidence": {"type": "number"},
+        },
+        "required": ["issue", "evidence", "confidence"],
+    }
+    return {
+        "type": "object",
+        "properties": {
+            "overall_summary": {"type": "string"},
+            "mentioned_aspects": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "aspect": {"type": "string", "enum": list(allowed_aspects)},
+                        "stakeholder": {"type": "string"},
+                        "evidence": {"type": "string"},
+                        "confidence": {"type": "number"},
+                    },
+                    "required": ["aspect", "stakeholder", "evidence", "confidence"],
+                },
+            },
+            "unmapped_issues": {"type": "array", "items": issue},
+        },
+        "required": ["overall_summary", "mentioned_aspects", "unmapped_issues"],
+    }
+
+
+def packed_extraction_schema(allowed_aspects: Iterable[str], ids: List[str]) -> Dict[str, Any]:
+    """
+    Schema for a packed multi-review request: {"items": [{"id": ..., <extraction>}]}.
+    """
+    item = extraction_schema(allowed_aspects)
+    item["properties"] = {"id": {"type": "string", "enum": list(ids)}, **item["properties"]}
+    item["required"] = ["id"] + item["required"]
+    return {
+        "type": "object",
+        "properties": {"items": {"type": "array", "items": item}},
+        "required": ["items"],
+    }
+
+
+def split_packed_result(result: Dict[str, Any], ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Split a packed response back into {id: extraction}. Items with an unknown or
+    repeated id, or a malformed shape, are dropped so the caller can fall back to
+    single-review calls for them.
+    """
+    wanted = set(ids)
+    out: Dict[str, Dict[str, Any]] = {}
+    seen: set = set()
 
-    Uses Ollama's `format: "json"` to strongly encourage valid JSON output.
-    Includes a single retry with stricter instructions if parsing fails.
+    items = result.get("items")
+    if not isinstance(items, list):
+        return out
+
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item_id = str(item.get("id") or "").strip().strip("[]")
+        if item_id not in wanted:
+            continue
+        if item_id in seen:
+            # Ambiguous: the model answered twice for one review
+            out.pop(item_id, None)
+            continue
+        seen.add(item_id)
+
+        mentioned = item.get("mentioned_aspects", [])
+        unmapped = item.get("unmapped_issues", [])
+        if not isinstance(mentioned, list) or not isinstance(unmapped, list):
+            continue
+
+        extraction = {k: v for k, v in item.items() if k != "id"}
+        extraction["mentioned_aspects"] = mentioned
+        extraction["unmapped_issues"] = unmapped
+        out[item_id] = extraction
+
+    return out
+
+
+class OllamaMetrics:
+    """
+    Thread-safe counters for an OllamaClient: extractions, HTTP requests,
+    retries, salvaged parses, failures, per-extraction latency and the token
+    counts Ollama reports (prompt_eval_count / eval_count).
     """
-    url = f"{OLLAMA_BASE_URL}/api/generate"
 
-    def _do_call(p: str) -> str:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.extractions = 0
+        self.requests = 0
+        self.retries = 0
+        self.salvaged = 0
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.latency = LatencyStats()
+
+    def record(self, latency_ms: float, requests_made: int, salvaged: bool, failed: bool) -> None:
+        with self._lock:
+            self.extractions += 1
+            self.requests += requests_made
+            self.retries += max(0, requests_made - 1)
+            self.salvaged += int(salvaged)
+            self.failures += int(failed)
+            self.latency.add(latency_ms / 1000)
+
+    def record_tokens(self, prompt_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.extractions
+            return {
+                "extractions": n,
+                "requests": self.requests,
+                "retries": self.retries,
+                "retry_rate": round(self.retries / n, 4) if n else 0.0,
+                "salvaged": self.salvaged,
+                "failures": self.failures,
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "avg_latency_ms": round(1000 * self.latency.total / n, 1) if n else 0.0,
+                "p95_latency_ms": round(1000 * self.latency.percentile(0.95), 1),
+            }
+
+
+class OllamaClient:
+    """
+    Reusable Ollama /api/generate client.
+
+    - one keep-alive requests.Session with a connection pool sized for the
+      analyzer's concurrency (safe to share across worker threads)
+    - `schema` (see extraction_schema) is sent as Ollama's structured-output
+      `format`; without it we fall back to `format: "json"`
+    - responses are parsed with parse_model_json (cleanup + salvage of truncated
+      output); only when that fails is the prompt re-sent with stricter wording
+    """
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_BASE_URL,
+        timeout: int = 120,
+        pool_size: int = 8,
+        bad_output_dir: Path = BAD_OUTPUT_DIR,
+    ):
+        self.url = f"{base_url.rstrip('/')}/api/generate"
+        self.timeout = timeout
+        self.bad_output_dir = bad_output_dir
+        self.metrics = OllamaMetrics()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def generate(self, model: str, prompt: str, fmt: Union[str, Dict[str, Any]] = "json") -> str:
         payload = {
             "model": model,
-            "prompt": p,
+            "prompt": prompt,
             "stream": False,
-            "format": "json",  # IMPORTANT: enforce JSON output
+            "format": fmt,
         }
-        r = requests.post(url, json=payload, timeout=timeout)
+        r = self.session.post(self.url, json=payload, timeout=self.timeout)
         r.raise_for_status()
-        data = r.json()
-
         # Ollama generate returns JSON with a "response" field containing the text output
-        raw = data.get("response", "")
-        return raw
-
-    # First attempt
-    raw = _do_call(prompt)
-    text = _cleanup_common_json_issues(_extract_json_object(_strip_code_fences(raw)))
-
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        # Retry once with stricter instructions appended
-        strict_prompt = (
-            prompt
-            + "\n\nSTRICT OUTPUT REQUIREMENT:\n"
-              "- Return ONLY valid JSON.\n"
-              "- No markdown, no code fences, no commentary.\n"
-              "- Escape quotes inside strings properly.\n"
-        )
-        raw2 = _do_call(strict_prompt)
-        text2 = _cleanup_common_json_issues(_extract_json_object(_strip_code_fences(raw2)))
+        try:
+            body = r.json()
+        except ValueError as e:
+            # requests.JSONDecodeError is a ValueError, which reads as a content failure
+            raise OllamaTransportError(f"Ollama returned a non-JSON body: {r.text[:200]!r}") from e
+        self.metrics.record_tokens(int(body.get("prompt_eval_count") or 0), int(body.get("eval_count") or 0))
+        return body.get("response", "")
 
+    def extract_json(
+        self,
+        model: str,
+        prompt: str,
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Returns a dict parsed from the model's JSON output.
+        Raises RuntimeError when the output is unusable even after one retry.
+        """
+        fmt: Union[str, Dict[str, Any]] = schema if schema is not None else "json"
+        t0 = time.perf_counter()
+        requests_made = 0
+        salvaged = False
+        failed = True
         try:
-            return json.loads(text2)
-        except json.JSONDecodeError as e:
-            # Save the bad payload for debugging (so you can see what the model produced)
-            try:
-                with open("ollama_bad_output.txt", "w", encoding="utf-8") as f:
-                    f.write("=== RAW OUTPUT ===\n")
-                    f.write(raw2)
-                    f.write("\n\n=== EXTRACTED JSON CANDIDATE ===\n")
-                    f.write(text2)
-            except Exception:
-                pass
+            raw = ""
+            for attempt_prompt in (prompt, prompt + STRICT_SUFFIX):
+                raw = self.generate(model, attempt_prompt, fmt)
+                requests_made += 1
+                try:
+                    result, salvaged = _parse_model_json(raw)
+                except ValueError:
+                    continue
+                failed = False
+                return result
 
+            path = self._save_bad_output(raw)
             raise RuntimeError(
                 "Ollama did not return valid JSON even after retry. "
-                "Saved output to ollama_bad_output.txt for inspection."
-            ) from e
+                f"Saved output to {path} for inspection."
+            )
+        finally:
+            self.metrics.record((time.perf_counter() - t0) * 1000, requests_made, salvaged, failed)
+
+    def extract_packed(
+        self,
+        model: str,
+        prompt: str,
+        ids: List[str],
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        One request for several reviews (see VerticalContext.render_packed).
+        Returns {id: extraction} for the items that came back valid; missing ids
+        are left for the caller to re-run one by one.
+        """
+        return split_packed_result(self.extract_json(model, prompt, schema=schema), ids)
+
+    def _save_bad_output(self, raw: str) -> str:
+        # Save the bad payload for debugging (so you can see what the model produced)
+        path = self.bad_output_dir / f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.txt"
+        try:
+            self.bad_output_dir.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("=== RAW OUTPUT ===\n")
+                f.write(raw)
+        except Exception:
+            pass
+        return str(path)
+
+
+_default_client: Optional[OllamaClient] = None
+_default_client_lock = threading.Lock()
+
+
+def default_client() -> OllamaClient:
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = OllamaClient()
+        return _default_client
+
+
+def call_ollama_json(
+    model: str,
+    prompt: str,
+    timeout: int = 120,
+    schema: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Calls Ollama and returns a dict parsed from JSON.
+
+    Thin wrapper over a shared OllamaClient (pooled session, salvage parser,
+    single retry with stricter instructions if parsing still fails).
+    """
+    client = default_client()
+    client.timeout = timeout
+    return client.extract_json(model, prompt, schema=schema)
 
 
 def render_prompt(template_path, context: Dict[str, Any]) -> str:
@@ -0,0 +1,122 @@
+import bisect
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+# Upper bounds (ms) of the stage histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+# Samples kept per LatencyStats for percentiles (reservoir); memory and the sort in
+# summary() stay bounded however long the run is
+SAMPLE_SIZE = 2048
+
+
+class LatencyStats:
+    """
+    Bounded summary of a latency series (seconds): count, sum, max, histogram
+    bucket counts and a uniform reservoir sample for p50/p95. Not thread-safe;
+    callers hold their own lock.
+    """
+
+    def __init__(self, sample_size: int = SAMPLE_SIZE, seed: int = 0):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.sample_size = sample_size
+        self._sample: List[float] = []
+        self._rng = random.Random(seed)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, seconds * 1000)] += 1
+        if len(self._sample) < self.sample_size:
+            self._sample.append(seconds)
+        else:
+            # Algorithm R: every value so far stays in the sample with equal probability
+            i = self._rng.randrange(self.count)
+            if i < self.sample_size:
+                self._sample[i] = seconds
+
+    def percentile(self, q: float) -> float:
+        if not self._sample:
+            return 0.0
+        ordered = sorted(self._sample)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class RunMetrics:
+    """
+    Per-run timing for the analyzer, safe to update from the extraction threads.
+
+    - stage(name): wall time of one occurrence of a pipeline stage
+    - observe_review(seconds): end-to-end latency of one review inside its chunk
+      (picked up -> enriched row built)
+    - count(name, n): plain counters (chars rendered, guardrail rejections, ...)
+
+    summary() is JSON-ready; it is what gets persisted in pipeline_runs.metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, LatencyStats] = {}
+        self._reviews = LatencyStats()
+        self._counters: Dict[str, int] = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            if name not in self._stages:
+                self._stages[name] = LatencyStats()
+            self._stages[name].add(seconds)
+
+    def observe_review(self, seconds: float) -> None:
+        with self._lock:
+            self._reviews.add(seconds)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                name: {
+                    "count": st.count,
+                    "total_s": round(st.total, 4),
+                    "avg_ms": round(1000 * st.total / st.count, 2) if st.count else 0.0,
+                    "p50_ms": round(1000 * st.percentile(0.50), 2),
+                    "p95_ms": round(1000 * st.percentile(0.95), 2),
+                    "max_ms": round(1000 * st.max, 2),
+                    "histogram": list(st.buckets),
+                }
+                for name, st in self._stages.items()
+            }
+            reviews = {
+                "count": self._reviews.count,
+                "p50_ms": round(1000 * self._reviews.percentile(0.50), 2),
+                "p95_ms": round(1000 * self._reviews.percentile(0.95), 2),
+                "max_ms": round(1000 * self._reviews.max, 2),
+            }
+            counters = dict(sorted(self._counters.items()))
+
+        return {
+            "elapsed_s": round(time.perf_counter() - self.started, 3),
+            "stages": stages,
+            "review_latency": reviews,
+            "counters": counters,
+            "histogram_buckets_ms": list(HISTOGRAM_BUCKETS_MS),
+        }
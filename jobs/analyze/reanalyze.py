@@ -0,0 +1,353 @@
+"""
+Re-analysis planner for prompt / model upgrades.
+
+Selects exactly the reviews_enriched rows whose model_version or prompt_version
+differs from the target, optionally limited to verticals and a created_at range,
+and re-runs them through analyze_chunk in (created_at, raw_id) keyset order.
+
+The position is persisted in reanalysis_cursors after every chunk (in the same
+transaction as the results), so a plan can be stopped and resumed at any time;
+rerunning the same command continues it. Two processes on the same plan
+serialize on the cursor row instead of redoing work.
+
+Usage:
+  python -m jobs.analyze.reanalyze --model mistral:7b-instruct --prompt-version v2 --dry-run
+  python -m jobs.analyze.reanalyze --prompt-version v2 --vertical food --since 2025-01-01 --concurrency 4
+"""
+import argparse
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, or_, select, tuple_
+
+from apps.api.app.db import SessionLocal, engine
+from apps.api.app.models import Base, ReanalysisCursor, ReviewEnriched, ReviewRaw
+from jobs.analyze.analyzer import (
+    _RAW_ITEM_COLUMNS,
+    THREAD_NAME_PREFIX,
+    RawItem,
+    analyze_chunk,
+    default_worker_id,
+    load_vertical_config,
+    start_run,
+    update_run,
+)
+from jobs.analyze.context import build_vertical_contexts
+from jobs.analyze.extraction_cache import ExtractionCache
+from jobs.analyze.extraction_ollama import OLLAMA_BASE_URL, OllamaClient
+from jobs.analyze.metrics import RunMetrics
+from jobs.analyze.routing import ROUTING_MODES, Router
+from jobs.analyze.sentiment_hf import BACKENDS as SENTIMENT_BACKENDS, SentimentClassifier
+
+
+def plan_filters(
+    verticals: Optional[List[str]] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> Dict[str, Any]:
+    return {
+        "verticals": sorted(verticals) if verticals else None,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+    }
+
+
+def plan_id_for(model: str, prompt_version: str, filters: Dict[str, Any]) -> str:
+    """
+    Deterministic id: the same target + filters always resume the same plan.
+    """
+    blob = json.dumps({"model": model, "prompt_version": prompt_version, **filters}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def _day_start(d: str) -> datetime:
+    day = date.fromisoformat(d)
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+def _stale_stmt(model: str, prompt_version: str, filters: Dict[str, Any], cursor: Optional[ReanalysisCursor]):
+    """
+    Enriched rows not on the target version (joined to their raw), after the cursor.
+    """
+    stmt = (
+        select(*_RAW_ITEM_COLUMNS, ReviewEnriched.created_at.label("key_created_at"))
+        .join(ReviewRaw, ReviewRaw.id == ReviewEnriched.raw_id)
+        .where(
+            or_(
+                ReviewEnriched.model_version.is_distinct_from(model),
+                ReviewEnriched.prompt_version.is_distinct_from(prompt_version),
+            )
+        )
+    )
+    if filters.get("verticals"):
+        stmt = stmt.where(ReviewEnriched.vertical.in_(filters["verticals"]))
+    if filters.get("since"):
+        stmt = stmt.where(ReviewEnriched.created_at >= _day_start(filters["since"]))
+    if filters.get("until"):
+        # until is inclusive of the whole (UTC) day
+        stmt = stmt.where(ReviewEnriched.created_at < _day_start(filters["until"]) + timedelta(days=1))
+    if cursor is not None and cursor.last_created_at is not None:
+        stmt = stmt.where(
+            tuple_(ReviewEnriched.created_at, ReviewEnriched.raw_id)
+            > tuple_(cursor.last_created_at, cursor.last_raw_id)
+        )
+    return stmt
+
+
+def count_remaining(db, model: str, prompt_version: str, filters: Dict[str, Any], cursor=None) -> int:
+    sub = _stale_stmt(model, prompt_version, filters, cursor).subquery()
+    return int(db.execute(select(func.count()).select_from(sub)).scalar() or 0)
+
+
+def next_chunk(db, model: str, prompt_version: str, filters: Dict[str, Any], cursor, limit: int):
+    """
+    Next `limit` stale rows in keyset order, as (RawItem, enriched created_at) pairs.
+    """
+    stmt = (
+        _stale_stmt(model, prompt_version, filters, cursor)
+        .order_by(ReviewEnriched.created_at, ReviewEnriched.raw_id)
+        .limit(limit)
+    )
+    return [(RawItem(*row[:-1]), row[-1]) for row in db.execute(stmt).all()]
+
+
+def load_or_create_cursor(
+    model: str,
+    prompt_version: str,
+    filters: Dict[str, Any],
+    reset: bool = False,
+) -> ReanalysisCursor:
+    plan_id = plan_id_for(model, prompt_version, filters)
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as db:
+        cursor = db.get(ReanalysisCursor, plan_id)
+        if cursor is None or reset:
+            planned = count_remaining(db, model, prompt_version, filters)
+            if cursor is None:
+                cursor = ReanalysisCursor(plan_id=plan_id, model_version=model, prompt_version=prompt_version)
+                db.add(cursor)
+            cursor.filters = filters
+            cursor.status = "running"
+            cursor.last_created_at = None
+            cursor.last_raw_id = None
+            cursor.planned = planned
+            cursor.processed = 0
+            cursor.failed = 0
+            cursor.started_at = now
+            cursor.updated_at = now
+            cursor.finished_at = None
+            db.commit()
+        db.refresh(cursor)
+        db.expunge(cursor)
+    return cursor
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}h{m:02d}m" if h else f"{m}m{s:02d}s"
+
+
+def main(
+    model: str = "mistral:7b-instruct",
+    prompt_version: str = "v1",
+    verticals: Optional[List[str]] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    batch_size: int = 50,
+    concurrency: int = 1,
+    sentiment_batch: int = 32,
+    write_batch: int = 500,
+    use_cache: bool = True,
+    max_chunks: Optional[int] = None,
+    reset: bool = False,
+    dry_run: bool = False,
+    sentiment_backend: str = "torch",
+    sentiment_threads: Optional[int] = None,
+    use_schema: bool = True,
+    pack_size: int = 1,
+    pack_max_chars: int = 100,
+    routing: str = "off",
+    ollama_base_url: Optional[str] = None,
+    sentiment: Optional[SentimentClassifier] = None,
+) -> Dict[str, Any]:
+    """
+    Run (or resume) the re-analysis plan for target model + prompt_version.
+
+    - Each chunk: lock the cursor row, take the next `batch_size` stale rows after
+      it, analyze_chunk them, advance the cursor, commit.
+    - Rows that fail extraction are counted on the cursor (`failed`), not
+      dead-lettered: they are enriched already, so they are not backlog. The cursor
+      moves past them; they keep their old version, so a later `reset` run retries them.
+    - dry_run: only report how many rows the plan covers.
+    - reset: start the plan over from the beginning.
+    Progress and ETA are printed after every chunk and kept in reanalysis_cursors.
+    """
+    Base.metadata.create_all(bind=engine)
+    for index in ReviewEnriched.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    filters = plan_filters(verticals, since, until)
+    cursor = load_or_create_cursor(model, prompt_version, filters, reset=reset)
+    with SessionLocal() as db:
+        remaining = count_remaining(db, model, prompt_version, filters, cursor)
+
+    print(
+        f"Plan={cursor.plan_id} Model={model} PromptVersion={prompt_version} Filters={json.dumps(filters)} "
+        f"Planned={cursor.planned} Processed={cursor.processed} Remaining={remaining}"
+    )
+    if dry_run or remaining == 0:
+        return {"plan_id": cursor.plan_id, "planned": cursor.planned, "processed": cursor.processed, "remaining": remaining}
+
+    cfg = load_vertical_config()
+    contexts = build_vertical_contexts(cfg)
+    if sentiment is None:
+        sentiment = SentimentClassifier(backend=sentiment_backend, num_threads=sentiment_threads)
+    client = OllamaClient(base_url=ollama_base_url or OLLAMA_BASE_URL, pool_size=max(1, concurrency))
+    router = Router(contexts, cfg, mode=routing)
+    cache = ExtractionCache(enabled=use_cache)
+    metrics = RunMetrics()
+    worker_id = default_worker_id()
+
+    totals = {"analyzed": 0, "inserted": 0, "updated": 0, "failed": 0, "packed_calls": 0}
+    chunks = 0
+    run_id = start_run(
+        worker_id,
+        model,
+        prompt_version,
+        params={"plan_id": cursor.plan_id, "batch_size": batch_size, "concurrency": concurrency, **filters},
+        kind="reanalyze",
+    )
+
+    def _run_metrics() -> Dict[str, Any]:
+        return {**metrics.summary(), "llm": client.metrics.snapshot(), "cache": cache.stats()}
+
+    t_start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix=THREAD_NAME_PREFIX) as pool:
+            while True:
+                with SessionLocal() as db:
+                    # Row lock = one process per plan at a time; a second one waits, then
+                    # continues after the first one's cursor
+                    cur = db.execute(
+                        select(ReanalysisCursor).where(ReanalysisCursor.plan_id == cursor.plan_id).with_for_update()
+                    ).scalar_one()
+
+                    with metrics.stage("select_raws"):
+                        picked = next_chunk(db, model, prompt_version, filters, cur, batch_size)
+                    if not picked:
+                        cur.status = "done"
+                        cur.updated_at = cur.finished_at = datetime.now(timezone.utc)
+                        db.commit()
+                        break
+
+                    raws = [r for r, _ in picked]
+                    stats = analyze_chunk(
+                        db,
+                        raws,
+                        pool=pool,
+                        client=client,
+                        contexts=contexts,
+                        sentiment=sentiment,
+                        cache=cache,
+                        model=model,
+                        prompt_version=prompt_version,
+                        force=False,
+                        sentiment_batch=sentiment_batch,
+                        write_batch=write_batch,
+                        use_schema=use_schema,
+                        pack_size=pack_size,
+                        pack_max_chars=pack_max_chars,
+                        router=router,
+                        metrics=metrics,
+                        dead_letter=False,
+                    )
+
+                    last_raw, last_created_at = picked[-1]
+                    cur.last_created_at = last_created_at
+                    cur.last_raw_id = last_raw.id
+                    cur.processed += len(raws)
+                    cur.failed += stats["failed"]
+                    cur.updated_at = datetime.now(timezone.utc)
+                    db.commit()
+                    processed, planned = cur.processed, cur.planned
+
+                chunks += 1
+                for k in totals:
+                    totals[k] += stats[k]
+                remaining = max(0, remaining - len(raws))
+                elapsed = time.perf_counter() - t_start
+                rate = totals["analyzed"] / elapsed if elapsed > 0 else 0.0
+                eta = remaining / rate if rate > 0 else None
+                pct = 100.0 * processed / planned if planned else 100.0
+                print(
+                    f"Chunk={chunks} Processed={processed}/{planned} ({pct:.1f}%) Remaining={remaining} "
+                    f"Failed={stats['failed']} Rate={rate:.2f}/s ETA={format_eta(eta)}"
+                )
+                update_run(run_id, {**totals, "chunks": chunks}, _run_metrics())
+
+                if max_chunks is not None and chunks >= max_chunks:
+                    break
+    except BaseException as e:
+        update_run(run_id, {**totals, "chunks": chunks}, _run_metrics(), status="failed", error=repr(e))
+        raise
+
+    update_run(run_id, {**totals, "chunks": chunks}, _run_metrics(), status="succeeded")
+    print(
+        f"Plan={cursor.plan_id} Run={run_id} Analyzed={totals['analyzed']} Updated={totals['updated']} "
+        f"Failed={totals['failed']} Chunks={chunks} Remaining={remaining}"
+    )
+    return {"plan_id": cursor.plan_id, "run_id": str(run_id), **totals, "chunks": chunks, "remaining": remaining}
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--model", default="mistral:7b-instruct", help="Target model_version")
+    p.add_argument("--prompt-version", default="v1", help="Target prompt_version")
+    p.add_argument("--vertical", action="append", default=None, help="Limit to a vertical (repeatable)")
+    p.add_argument("--since", type=date.fromisoformat, default=None, help="Reviews created on/after YYYY-MM-DD")
+    p.add_argument("--until", type=date.fromisoformat, default=None, help="Reviews created on/before YYYY-MM-DD")
+    p.add_argument("--batch", type=int, default=50)
+    p.add_argument("--concurrency", type=int, default=1)
+    p.add_argument("--sentiment-batch", type=int, default=32)
+    p.add_argument("--write-batch", type=int, default=500)
+    p.add_argument("--no-cache", action="store_true")
+    p.add_argument("--max-chunks", type=int, default=None, help="Stop after N chunks (resume later)")
+    p.add_argument("--reset", action="store_true", help="Restart the plan from the beginning")
+    p.add_argument("--dry-run", action="store_true", help="Only report the plan size")
+    p.add_argument("--sentiment-backend", choices=list(SENTIMENT_BACKENDS), default="torch")
+    p.add_argument("--sentiment-threads", type=int, default=None)
+    p.add_argument("--no-schema", action="store_true")
+    p.add_argument("--pack-size", type=int, default=1)
+    p.add_argument("--pack-max-chars", type=int, default=100)
+    p.add_argument("--routing", choices=list(ROUTING_MODES), default="off")
+    args = p.parse_args()
+
+    main(
+        model=args.model,
+        prompt_version=args.prompt_version,
+        verticals=args.vertical,
+        since=args.since,
+        until=args.until,
+        batch_size=args.batch,
+        concurrency=args.concurrency,
+        sentiment_batch=args.sentiment_batch,
+        write_batch=args.write_batch,
+        use_cache=not args.no_cache,
+        max_chunks=args.max_chunks,
+        reset=args.reset,
+        dry_run=args.dry_run,
+        sentiment_backend=args.sentiment_backend,
+        sentiment_threads=args.sentiment_threads,
+        use_schema=not args.no_schema,
+        pack_size=args.pack_size,
+        pack_max_chars=args.pack_max_chars,
+        routing=args.routing,
+    )
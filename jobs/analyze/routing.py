@@ -0,0 +1,128 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from jobs.analyze.context import VerticalContext
+
+TIER_TRIVIAL = "trivial"  # no LLM; empty extraction ("ok", "👍", "very good")
+TIER_LEXICON = "lexicon"  # no LLM; aspects derived from the keyword lexicon
+TIER_LLM = "llm"          # full Ollama extraction
+TIERS = (TIER_TRIVIAL, TIER_LEXICON, TIER_LLM)
+
+ROUTING_MODES = ("off", "trivial", "lexicon")
+
+_WORD = re.compile(r"\w", re.UNICODE)
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    tier: str
+    reason: str
+    extraction: Optional[Dict[str, Any]] = None
+
+    def record(self) -> Dict[str, str]:
+        return {"tier": self.tier, "reason": self.reason}
+
+
+def _phrases_for(aspect: str, keywords: Dict[str, List[str]]) -> List[str]:
+    phrases = [aspect.replace("_", " ").lower()]
+    phrases.extend(str(k).lower() for k in keywords.get(aspect, []) or [])
+    return phrases
+
+
+class Router:
+    """
+    Cheap pre-classification in front of the LLM.
+
+    - trivial: no word characters at all (emoji / punctuation only), or a text of
+      at most `trivial_max_chars` with no lexicon hit and no low star rating
+    - lexicon (mode="lexicon" only): text of at most `lexicon_max_chars` that hits
+      the aspect lexicon; the whole (short) text becomes the evidence quote
+    - llm: everything else, including short low-rated texts ("never again", 1 star)
+
+    The lexicon is built once per vertical from the allowed aspect names plus the
+    optional `aspect_keywords` section of verticals.yml.
+    """
+
+    def __init__(
+        self,
+        contexts: Dict[str, VerticalContext],
+        cfg: Dict[str, Any],
+        mode: str = "trivial",
+        trivial_max_chars: int = 12,
+        lexicon_max_chars: int = 60,
+        low_rating: int = 2,
+    ):
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode {mode!r}; expected one of {ROUTING_MODES}")
+        self.mode = mode
+        self.trivial_max_chars = trivial_max_chars
+        self.lexicon_max_chars = lexicon_max_chars
+        self.low_rating = low_rating
+
+        keywords = cfg.get("aspect_keywords") or {}
+        self._lexicons: Dict[str, List[Tuple[Pattern[str], str]]] = {}
+        for key, ctx in contexts.items():
+            entries: List[Tuple[Pattern[str], str]] = []
+            for aspect in ctx.allowed_aspects:
+                for phrase in _phrases_for(aspect, keywords):
+                    entries.append((re.compile(r"\b" + re.escape(phrase) + r"\b", re.IGNORECASE), aspect))
+            self._lexicons[key] = entries
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def lexicon_hits(self, vertical_key: str, text: str) -> List[str]:
+        hits: List[str] = []
+        for pattern, aspect in self._lexicons.get(vertical_key, []):
+            if aspect not in hits and pattern.search(text):
+                hits.append(aspect)
+        return hits
+
+    def route(self, ctx: VerticalContext, text: str, rating: Optional[int]) -> RouteDecision:
+        text = (text or "").strip()
+
+        if not _WORD.search(text):
+            return RouteDecision(TIER_TRIVIAL, "no_words", _empty_extraction())
+
+        hits = self.lexicon_hits(ctx.vertical_key, text) if len(text) <= self.lexicon_max_chars else []
+        low_rated = rating is not None and rating <= self.low_rating
+
+        if len(text) <= self.trivial_max_chars and not hits and not low_rated:
+            return RouteDecision(TIER_TRIVIAL, "short_no_aspect", _empty_extraction())
+
+        if self.mode == "lexicon" and hits:
+            return RouteDecision(TIER_LEXICON, "lexicon_match", _lexicon_extraction(ctx, text, hits))
+
+        return RouteDecision(TIER_LLM, "needs_llm")
+
+
+def _empty_extraction() -> Dict[str, Any]:
+    return {"overall_summary": "", "mentioned_aspects": [], "unmapped_issues": []}
+
+
+def _lexicon_extraction(ctx: VerticalContext, text: str, aspects: List[str]) -> Dict[str, Any]:
+    return {
+        "overall_summary": "",
+        "mentioned_aspects": [
+            {
+                "aspect": a,
+                "stakeholder": ctx.aspect_to_stakeholder.get(a, "product"),
+                "evidence": text,
+                "confidence": 0.5,
+            }
+            for a in aspects
+        ],
+        "unmapped_issues": [],
+    }
+
+
+def format_tier_report(counts: Dict[str, int]) -> str:
+    total = sum(counts.values())
+    parts = []
+    for tier in TIERS:
+        n = counts.get(tier, 0)
+        pct = (100.0 * n / total) if total else 0.0
+        parts.append(f"{tier}:{n}({pct:.0f}%)")
+    return " ".join(parts)
@@ -1,7 +1,15 @@
-from typing import List, Dict, Any
+import inspect
+import os
+from pathlib import Path
+from typing import List, Dict, Any, Optional
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+# Exported ONNX graphs are cached here, one folder per model name
+ONNX_CACHE_DIR = Path(os.environ.get("SENTIMENT_ONNX_CACHE", Path.home() / ".cache" / "cr_aiops" / "onnx"))
+
 
 class SentimentClassifier:
     """
@@ -9,14 +17,40 @@ class SentimentClassifier:
       - 5-class star models: 1-2 -> Negative, 3 -> Neutral, 4-5 -> Positive
       - 3-class sentiment models: NEG/NEU/POS (label-name based)
     Returns: {"label": Positive|Neutral|Negative, "stars": int|None, "confidence": float}
+
+    Backends:
+      - torch:      full-precision PyTorch (mps when available, else cpu)
+      - torch-int8: dynamic int8 quantization of the Linear layers, cpu only
+      - onnx:       ONNX Runtime on cpu; the model is exported once to ONNX_CACHE_DIR
+                    (needs `pip install onnx onnxruntime`)
+    `num_threads` pins intra-op threads for the cpu backends.
     """
 
-    def __init__(self, model_name: str = "tabularisai/multilingual-sentiment-analysis"):
-        self.device = "mps" if torch.backends.mps.is_available() else "cpu"
+    def __init__(
+        self,
+        model_name: str = "tabularisai/multilingual-sentiment-analysis",
+        backend: str = "torch",
+        num_threads: Optional[int] = None,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown sentiment backend {backend!r}; expected one of {BACKENDS}")
+
+        self.backend = backend
+        self.num_threads = num_threads
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.device = "mps" if backend == "torch" and torch.backends.mps.is_available() else "cpu"
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModelForSequenceClassification.from_pretrained(model_name).to(self.device)
         self.model.eval()
 
+        self._ort_session = None
+        if backend == "torch-int8":
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif backend == "onnx":
+            self._ort_session = self._load_onnx_session(model_name)
+
         self.model_name = model_name
         self.num_labels = int(getattr(self.model.config, "num_labels", 0) or 0)
         self.id2label = {}
@@ -55,6 +89,74 @@ class SentimentClassifier:
         # last resort
         return "Neutral"
 
+    def _load_onnx_session(self, model_name: str):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("backend='onnx' needs onnxruntime: pip install onnx onnxruntime") from e
+
+        onnx_path = ONNX_CACHE_DIR / model_name.replace("/", "__") / "model.onnx"
+        if not onnx_path.exists():
+            onnx_path.parent.mkdir(parents=True, exist_ok=True)
+            sample = self.tokenizer(["export sample"], return_tensors="pt")
+            input_names = list(sample.keys())
+            dynamic_axes = {name: {0: "batch", 1: "seq"} for name in input_names}
+            dynamic_axes["logits"] = {0: "batch"}
+            # Write to a temp name first so a crashed export never leaves a half file behind
+            tmp_path = onnx_path.with_suffix(".onnx.tmp")
+            export_kwargs: Dict[str, Any] = {}
+            if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+                # Newer torch defaults to the dynamo exporter (extra onnxscript dependency)
+                export_kwargs["dynamo"] = False
+            torch.onnx.export(
+                self.model,
+                (dict(sample),),
+                str(tmp_path),
+                input_names=input_names,
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+                **export_kwargs,
+            )
+            tmp_path.replace(onnx_path)
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.num_threads:
+            opts.intra_op_num_threads = self.num_threads
+            opts.inter_op_num_threads = 1
+        return ort.InferenceSession(str(onnx_path), sess_options=opts, providers=["CPUExecutionProvider"])
+
+    def _forward_probs(self, enc) -> torch.Tensor:
+        """
+        enc: tokenizer output with "pt" tensors. Returns softmax probabilities on cpu/device.
+        """
+        if self._ort_session is not None:
+            wanted = {i.name for i in self._ort_session.get_inputs()}
+            feeds = {k: v.cpu().numpy() for k, v in enc.items() if k in wanted}
+            logits = self._ort_session.run(["logits"], feeds)[0]
+            return torch.softmax(torch.from_numpy(logits), dim=-1)
+
+        enc = enc.to(self.device)
+        with torch.no_grad():
+            logits = self.model(**enc).logits
+            return torch.softmax(logits, dim=-1)
+
+    def _to_result(self, p) -> Dict[str, Any]:
+        idx = int(torch.argmax(p).item())
+        confidence = float(p[idx].item())
+
+        # Decide mapping strategy
+        stars = None
+        if self.num_labels == 5:
+            stars = idx + 1
+            label = self._stars_to_label(stars)
+        else:
+            label_name = self.id2label.get(idx, f"label_{idx}")
+            label = self._labelname_to_label(label_name)
+
+        return {"label": label, "stars": stars, "confidence": confidence}
+
     def predict_labels(self, texts: List[str]) -> List[Dict[str, Any]]:
         if not texts:
             return []
@@ -65,27 +167,57 @@ class SentimentClassifier:
             truncation=True,
             max_length=256,
             return_tensors="pt",
-        ).to(self.device)
+        )
+        probs = self._forward_probs(enc)
 
-        with torch.no_grad():
-            logits = self.model(**enc).logits
-            probs = torch.softmax(logits, dim=-1)
-
-        results: List[Dict[str, Any]] = []
-        for i in range(len(texts)):
-            p = probs[i]
-            idx = int(torch.argmax(p).item())
-            confidence = float(p[idx].item())
-
-            # Decide mapping strategy
-            stars = None
-            if self.num_labels == 5:
-                stars = idx + 1
-                label = self._stars_to_label(stars)
-            else:
-                label_name = self.id2label.get(idx, f"label_{idx}")
-                label = self._labelname_to_label(label_name)
-
-            results.append({"label": label, "stars": stars, "confidence": confidence})
-
-        return results
+        return [self._to_result(probs[i]) for i in range(len(texts))]
+
+    def predict_labels_bucketed(
+        self,
+        texts: List[str],
+        max_batch_tokens: int = 8192,
+        max_length: int = 256,
+    ) -> List[Dict[str, Any]]:
+        """
+        Same output contract as predict_labels, tuned for large mixed batches.
+
+        Texts are tokenized once without padding, de-duplicated, sorted by length
+        and packed into buckets whose padded size (rows * longest row) stays under
+        `max_batch_tokens`. Short texts then share big forward passes instead of
+        being padded to the longest text in the batch. Results come back in input order.
+        """
+        if not texts:
+            return []
+
+        unique: Dict[str, int] = {}
+        for t in texts:
+            unique.setdefault(t, len(unique))
+        uniq_texts = list(unique)
+
+        enc = self.tokenizer(uniq_texts, truncation=True, max_length=max_length)
+        input_ids = enc["input_ids"]
+        order = sorted(range(len(uniq_texts)), key=lambda i: len(input_ids[i]))
+
+        buckets: List[List[int]] = []
+        bucket: List[int] = []
+        for i in order:
+            # sorted ascending, so the new item is the longest in the bucket
+            if bucket and (len(bucket) + 1) * len(input_ids[i]) > max_batch_tokens:
+                buckets.append(bucket)
+                bucket = []
+            bucket.append(i)
+        if bucket:
+            buckets.append(bucket)
+
+        uniq_results: List[Optional[Dict[str, Any]]] = [None] * len(uniq_texts)
+        for b in buckets:
+            batch = self.tokenizer.pad(
+                {k: [enc[k][i] for i in b] for k in enc.keys()},
+                padding=True,
+                return_tensors="pt",
+            )
+            probs = self._forward_probs(batch)
+            for row, i in enumerate(b):
+                uniq_results[i] = self._to_result(probs[row])
+
+        return [uniq_results[unique[t]] for t in texts]
@@ -0,0 +1,226 @@
+"""
+End-to-end analyzer benchmark against a fake Ollama server (no GPU / LLM needed).
+
+Seeds a synthetic reviews_raw corpus under its own source, runs analyzer.main
+over it with FakeOllamaServer standing in for Ollama, and reports throughput,
+per-review latency and per-stage timings as JSON. Rerun it before and after a
+change (same flags, same seed) and compare the reports.
+
+Needs DATABASE_URL like the analyzer. Bench rows (source "bench_synthetic") and
+their cache entries (model "bench-fake") are removed before and after the run.
+
+Usage:
+  python -m jobs.bench.analyzer_e2e --reviews 500 --concurrency 4 --max-parallel 4
+  python -m jobs.bench.analyzer_e2e --pack-size 4 --routing lexicon --output bench.json
+"""
+import argparse
+import json
+import random
+import subprocess
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, select
+
+from apps.api.app.db import SessionLocal, engine
+from apps.api.app.models import (
+    AnalysisFailure,
+    AnalysisLease,
+    Base,
+    ExtractionCacheEntry,
+    PipelineRun,
+    ReviewEnriched,
+    ReviewRaw,
+    ReviewRawSignature,
+)
+from jobs.analyze import analyzer
+from jobs.analyze.routing import ROUTING_MODES
+from jobs.bench.fake_ollama import FakeOllamaServer
+
+BENCH_SOURCE = "bench_synthetic"
+BENCH_MODEL = "bench-fake"
+
+_OPENERS = ["", "Honestly, ", "Third order this week. ", "Update: ", "Ok so "]
+_VERDICTS = ["was great", "was terrible", "could be better", "is fine", "was really slow", "was perfect"]
+_CLOSERS = ["", " Will order again.", " Never again.", " 5 stars.", " Please fix this.", " Thanks!"]
+_SHORT = ["good", "bad", "ok", "👍", "love it", "worst app", "fast delivery", "late again"]
+
+
+class FakeSentiment:
+    """
+    Stand-in for SentimentClassifier with a fixed cost per text, so the benchmark
+    measures the pipeline around the model rather than the model itself.
+    """
+
+    def __init__(self, ms_per_text: float = 2.0):
+        self.ms_per_text = ms_per_text
+
+    def predict_labels(self, texts: List[str]) -> List[Dict[str, Any]]:
+        time.sleep(self.ms_per_text * len(texts) / 1000)
+        out = []
+        for t in texts:
+            stars = 1 + len(t) % 5
+            # Same labels as SentimentClassifier, which enrich_batch compares against
+            label = "Negative" if stars <= 2 else "Neutral" if stars == 3 else "Positive"
+            out.append({"label": label, "stars": stars, "confidence": 0.9})
+        return out
+
+    def predict_labels_bucketed(self, texts: List[str], **_: Any) -> List[Dict[str, Any]]:
+        return self.predict_labels(texts)
+
+
+def synthetic_reviews(cfg: Dict[str, Any], n: int, duplicate_rate: float, short_rate: float, seed: int):
+    """
+    Yields (vertical, text, rating). Texts name real aspects of the vertical so the
+    fake server (and lexicon routing) have something to find.
+    """
+    rng = random.Random(seed)
+    verticals = sorted(cfg["verticals"])
+    produced: List[tuple] = []
+    for _ in range(n):
+        if produced and rng.random() < duplicate_rate:
+            vertical, text, rating = rng.choice(produced)
+        elif rng.random() < short_rate:
+            vertical, text, rating = rng.choice(verticals), rng.choice(_SHORT), rng.randint(1, 5)
+        else:
+            vertical = rng.choice(verticals)
+            aspects = list(cfg["verticals"][vertical]["aspects"])
+            parts = []
+            for aspect in rng.sample(aspects, k=min(len(aspects), rng.randint(1, 3))):
+                parts.append(f"the {aspect.replace('_', ' ')} {rng.choice(_VERDICTS)}")
+            text = rng.choice(_OPENERS) + ", and ".join(parts).capitalize() + "." + rng.choice(_CLOSERS)
+            rating = rng.randint(1, 5)
+        produced.append((vertical, text, rating))
+        yield vertical, text, rating
+
+
+def cleanup(db) -> None:
+    bench_ids = select(ReviewRaw.id).where(ReviewRaw.source == BENCH_SOURCE)
+    for model in (ReviewEnriched, AnalysisFailure, AnalysisLease, ReviewRawSignature):
+        db.execute(delete(model).where(model.raw_id.in_(bench_ids)))
+    db.execute(delete(ReviewRaw).where(ReviewRaw.source == BENCH_SOURCE))
+    db.execute(delete(ExtractionCacheEntry).where(ExtractionCacheEntry.model_version == BENCH_MODEL))
+    # Bench runs would otherwise show up in /ops/runs and skew the scheduler's throughput_stats
+    db.execute(delete(PipelineRun).where(PipelineRun.model_version == BENCH_MODEL))
+
+
+def seed_corpus(db, n: int, duplicate_rate: float, short_rate: float, seed: int) -> int:
+    cfg = analyzer.load_vertical_config()
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "source": BENCH_SOURCE,
+            "source_review_id": f"bench-{i}",
+            "vertical": vertical,
+            "created_at": now - timedelta(minutes=i),
+            "ingested_at": now,
+            "rating": rating,
+            "language": "en",
+            "original_text": text,
+            "raw_payload": None,
+        }
+        for i, (vertical, text, rating) in enumerate(synthetic_reviews(cfg, n, duplicate_rate, short_rate, seed))
+    ]
+    for i in range(0, len(rows), 1000):
+        db.execute(ReviewRaw.__table__.insert(), rows[i : i + 1000])
+    return len(rows)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> Dict[str, Any]:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        cleanup(db)
+        seeded = seed_corpus(db, args.reviews, args.duplicate_rate, args.short_rate, args.seed)
+        db.commit()
+
+    sentiment = None if args.real_sentiment else FakeSentiment(args.sentiment_ms)
+    server = FakeOllamaServer(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        per_char_ms=args.per_char_ms,
+        max_parallel=args.max_parallel,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    try:
+        with server:
+            t0 = time.perf_counter()
+            summary = analyzer.main(
+                model=BENCH_MODEL,
+                batch_size=args.batch,
+                prompt_version="bench",
+                concurrency=args.concurrency,
+                sentiment_batch=args.sentiment_batch,
+                use_cache=not args.no_cache,
+                write_batch=args.write_batch,
+                until_empty=True,
+                sentiment_backend=args.sentiment_backend,
+                pack_size=args.pack_size,
+                pack_max_chars=args.pack_max_chars,
+                routing=args.routing,
+                source=BENCH_SOURCE,
+                ollama_base_url=server.base_url,
+                sentiment=sentiment,
+            )
+            wall_s = time.perf_counter() - t0
+            server_stats = server.stats()
+    finally:
+        if not args.keep_data:
+            with SessionLocal() as db:
+                cleanup(db)
+                db.commit()
+
+    return {
+        "commit": git_commit(),
+        "params": vars(args),
+        "seeded": seeded,
+        "wall_s": round(wall_s, 3),
+        "reviews_per_s": round(summary["analyzed"] / wall_s, 2) if wall_s else 0.0,
+        "analyzer": summary,
+        "server": server_stats,
+    }
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--reviews", type=int, default=300)
+    p.add_argument("--duplicate-rate", type=float, default=0.15)
+    p.add_argument("--short-rate", type=float, default=0.2)
+    p.add_argument("--seed", type=int, default=0)
+    # Fake server
+    p.add_argument("--latency-ms", type=float, default=300.0)
+    p.add_argument("--jitter-ms", type=float, default=50.0)
+    p.add_argument("--per-char-ms", type=float, default=0.0)
+    p.add_argument("--max-parallel", type=int, default=1)
+    p.add_argument("--malformed-rate", type=float, default=0.02)
+    # Analyzer
+    p.add_argument("--batch", type=int, default=50)
+    p.add_argument("--concurrency", type=int, default=1)
+    p.add_argument("--sentiment-batch", type=int, default=32)
+    p.add_argument("--write-batch", type=int, default=500)
+    p.add_argument("--no-cache", action="store_true")
+    p.add_argument("--pack-size", type=int, default=1)
+    p.add_argument("--pack-max-chars", type=int, default=100)
+    p.add_argument("--routing", choices=list(ROUTING_MODES), default="off")
+    p.add_argument("--real-sentiment", action="store_true", help="Load the real SentimentClassifier")
+    p.add_argument("--sentiment-backend", default="torch")
+    p.add_argument("--sentiment-ms", type=float, default=2.0, help="FakeSentiment cost per text")
+    p.add_argument("--keep-data", action="store_true", help="Leave the bench rows in the database")
+    p.add_argument("--output", default=None, help="Also write the JSON report to this file")
+    args = p.parse_args()
+
+    report = json.dumps(run(args), indent=2, default=str)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
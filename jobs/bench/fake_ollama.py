@@ -0,0 +1,211 @@
+"""
+Fake Ollama /api/generate server for offline analyzer benchmarks.
+
+Answers the extraction prompts (single and packed) with a plausible extraction
+built from the prompt itself, after a configurable latency. A semaphore caps the
+requests served at once, like OLLAMA_NUM_PARALLEL, so client concurrency above
+it queues the way it would against a real server. A share of responses can be
+made malformed to exercise the retry / salvage paths.
+
+Usage:
+  python -m jobs.bench.fake_ollama --port 11435 --latency-ms 400 --max-parallel 2
+  OLLAMA_BASE_URL=http://localhost:11435 python -m jobs.analyze.analyzer ...
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+_ALLOWED_RE = re.compile(r"Allowed aspects \(ONLY choose from this list\):\n(\[.*?\])\n")
+_SINGLE_RE = re.compile(r'Review text:\n"""\n(.*?)\n"""', re.S)
+_PACKED_RE = re.compile(r'\[(r\d+)\]\n"""\n(.*?)\n"""', re.S)
+
+
+def fake_extraction(text: str, allowed: List[str]) -> Dict[str, Any]:
+    """
+    Mentions every allowed aspect whose name (or a word of it) occurs in the text.
+    """
+    low = text.lower()
+    mentioned = []
+    for aspect in allowed:
+        words = [w for w in aspect.lower().split("_") if len(w) > 3]
+        hit = next((w for w in words if w in low), None)
+        if hit is None:
+            continue
+        start = low.index(hit)
+        mentioned.append(
+            {
+                "aspect": aspect,
+                "stakeholder": "product",
+                "evidence": text[start : start + 40],
+                "confidence": 0.8,
+            }
+        )
+    return {
+        "overall_summary": " ".join(text.split()[:12]),
+        "mentioned_aspects": mentioned,
+        "unmapped_issues": [],
+    }
+
+
+def answer_prompt(prompt: str) -> Dict[str, Any]:
+    m = _ALLOWED_RE.search(prompt)
+    allowed = json.loads(m.group(1)) if m else []
+
+    packed = _PACKED_RE.findall(prompt)
+    if packed:
+        return {"items": [{"id": rid, **fake_extraction(text, allowed)} for rid, text in packed]}
+
+    m = _SINGLE_RE.search(prompt)
+    return fake_extraction(m.group(1) if m else "", allowed)
+
+
+class FakeOllamaServer:
+    """
+    Threaded HTTP server speaking enough of /api/generate for OllamaClient.
+
+    - latency_ms / jitter_ms: per-request service time (uniform jitter)
+    - per_char_ms: extra service time per prompt character (long prompts cost more)
+    - max_parallel: requests served at once; the rest wait for a slot
+    - malformed_rate: share of responses that are truncated or not JSON at all
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 300.0,
+        jitter_ms: float = 50.0,
+        per_char_ms: float = 0.0,
+        max_parallel: int = 1,
+        malformed_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.per_char_ms = per_char_ms
+        self.malformed_rate = malformed_rate
+        self._slots = threading.Semaphore(max(1, max_parallel))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "malformed": 0, "peak_in_flight": 0}
+        self._in_flight = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                response = server._respond(payload)
+                body = json.dumps(
+                    {
+                        "model": payload.get("model"),
+                        "response": response,
+                        "done": True,
+                        # Rough token counts (~4 chars per token) so token metrics move
+                        "prompt_eval_count": len(payload.get("prompt", "")) // 4,
+                        "eval_count": len(response) // 4,
+                    }
+                )
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _respond(self, payload: Dict[str, Any]) -> str:
+        prompt = payload.get("prompt", "")
+        with self._lock:
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            malformed = self._rng.random() < self.malformed_rate
+            garbage = self._rng.random() < 0.5
+
+        with self._slots:
+            with self._lock:
+                self._in_flight += 1
+                self._stats["requests"] += 1
+                self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._in_flight)
+            try:
+                time.sleep(max(0.0, delay + self.per_char_ms * len(prompt)) / 1000)
+                text = json.dumps(answer_prompt(prompt), ensure_ascii=False)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+        if not malformed:
+            return text
+        with self._lock:
+            self._stats["malformed"] += 1
+        # Garbage fails parsing (client retries); a cut-off object is usually salvaged
+        return "Sorry, I cannot help with that." if garbage else text[: max(1, len(text) * 2 // 3)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=11435)
+    p.add_argument("--latency-ms", type=float, default=300.0)
+    p.add_argument("--jitter-ms", type=float, default=50.0)
+    p.add_argument("--per-char-ms", type=float, default=0.0)
+    p.add_argument("--max-parallel", type=int, default=1)
+    p.add_argument("--malformed-rate", type=float, default=0.0)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    server = FakeOllamaServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        per_char_ms=args.per_char_ms,
+        max_parallel=args.max_parallel,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+    print(f"Fake Ollama listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats()))
@@ -0,0 +1,115 @@
+"""
+Microbenchmark: per-review Python overhead of the analyzer outside the model calls.
+
+Compares the legacy per-review path (rebuild allowed aspects + stakeholder map,
+re-read and recompile extraction.jinja) with the precompiled VerticalContext path.
+Both paths also run the aspect guardrail and cache-key hashing, so the numbers are
+what the analyzer loop pays per review besides Ollama, sentiment and the DB.
+
+Usage:
+  python -m jobs.bench.prompt_overhead --reviews 2000
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from jobs.analyze.analyzer import apply_guardrail, load_vertical_config
+from jobs.analyze.context import DEFAULT_TEMPLATE_PATH, build_aspect_to_stakeholder, build_vertical_contexts
+from jobs.analyze.extraction_cache import cache_key
+from jobs.analyze.extraction_ollama import render_prompt
+
+TEXTS = [
+    "good",
+    "very bad service",
+    "late delivery, the food was cold when it arrived",
+    "Driver was rude and the order was missing two items. Support never replied to my refund request.",
+    "App keeps crashing at checkout. Please fix it, I have been a loyal customer for years but this is getting annoying.",
+]
+
+
+def _fake_extraction(aspects: List[str]) -> Dict[str, Any]:
+    return {
+        "overall_summary": "fixture",
+        "mentioned_aspects": [
+            {"aspect": aspects[0], "stakeholder": "Operations", "evidence": "late delivery", "confidence": 0.9},
+            {"aspect": "Not_An_Aspect", "stakeholder": "Product", "evidence": "crashing", "confidence": 0.4},
+        ],
+        "unmapped_issues": [],
+    }
+
+
+def bench_legacy(cfg: Dict[str, Any], verticals: List[str], n: int) -> float:
+    template_path = DEFAULT_TEMPLATE_PATH
+    t0 = time.perf_counter()
+    for i in range(n):
+        vertical_key = verticals[i % len(verticals)]
+        text = TEXTS[i % len(TEXTS)]
+
+        allowed = list(cfg.get("global_aspects", []))
+        allowed.extend(cfg["verticals"].get(vertical_key, {}).get("aspects", []))
+        allowed = sorted(set(allowed))
+        aspect_to_team = build_aspect_to_stakeholder(cfg, vertical_key)
+        render_prompt(
+            template_path,
+            {
+                "vertical_key": vertical_key,
+                "allowed_aspects": allowed,
+                "aspect_to_stakeholder": aspect_to_team,
+                "text": text,
+            },
+        )
+        cache_key(text, vertical_key, "bench", "v1", allowed)
+        apply_guardrail(_fake_extraction(allowed), frozenset(allowed))
+    return time.perf_counter() - t0
+
+
+def bench_context(cfg: Dict[str, Any], verticals: List[str], n: int) -> float:
+    t0 = time.perf_counter()
+    contexts = build_vertical_contexts(cfg)
+    for i in range(n):
+        ctx = contexts[verticals[i % len(verticals)]]
+        text = TEXTS[i % len(TEXTS)]
+
+        ctx.render(text)
+        cache_key(text, ctx.vertical_key, "bench", "v1", ctx.allowed_aspects)
+        apply_guardrail(_fake_extraction(list(ctx.allowed_aspects)), ctx.allowed_set)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--reviews", type=int, default=2000)
+    p.add_argument("--repeat", type=int, default=3, help="Best-of-N timing")
+    p.add_argument("--json", action="store_true", help="Print machine-readable result")
+    args = p.parse_args()
+
+    cfg = load_vertical_config()
+    verticals = sorted(cfg["verticals"])
+
+    # Warm-up (imports, first template compile)
+    bench_legacy(cfg, verticals, 10)
+    bench_context(cfg, verticals, 10)
+
+    legacy = min(bench_legacy(cfg, verticals, args.reviews) for _ in range(args.repeat))
+    ctx = min(bench_context(cfg, verticals, args.reviews) for _ in range(args.repeat))
+
+    result = {
+        "reviews": args.reviews,
+        "legacy_us_per_review": round(legacy / args.reviews * 1e6, 1),
+        "context_us_per_review": round(ctx / args.reviews * 1e6, 1),
+        "speedup": round(legacy / ctx, 2) if ctx else None,
+    }
+
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    print(f"Reviews={result['reviews']}")
+    print(f"Legacy   {result['legacy_us_per_review']:>10.1f} us/review")
+    print(f"Context  {result['context_us_per_review']:>10.1f} us/review")
+    print(f"Speedup  {result['speedup']}x")
+
+
+if __name__ == "__main__":
+    main()
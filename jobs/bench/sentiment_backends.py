@@ -0,0 +1,102 @@
+"""
+Benchmark + agreement report for SentimentClassifier backends.
+
+Every backend runs the same fixture set through predict_labels_bucketed and is
+compared against the fp32 `torch` backend: label agreement, star agreement and
+mean absolute confidence difference. Use it to pick the fastest backend that
+still agrees with fp32 closely enough.
+
+Usage:
+  python -m jobs.bench.sentiment_backends --threads 4
+  python -m jobs.bench.sentiment_backends --backends torch onnx --json
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from jobs.analyze.sentiment_hf import BACKENDS, SentimentClassifier
+
+FIXTURE = Path(__file__).parent / "fixtures" / "sentiment_reviews.txt"
+
+
+def load_fixture(path: Path) -> List[str]:
+    return [line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def run_backend(model_name: str, backend: str, texts: List[str], threads: int, repeat: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    clf = SentimentClassifier(model_name=model_name, backend=backend, num_threads=threads)
+    load_s = time.perf_counter() - t0
+
+    # Warm-up pass (first call pays allocator / graph init)
+    preds = clf.predict_labels_bucketed(texts)
+
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        preds = clf.predict_labels_bucketed(texts)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 3),
+        "infer_s": round(best, 4),
+        "texts_per_s": round(len(texts) / best, 1) if best else None,
+        "preds": preds,
+    }
+
+
+def agreement(ref: List[Dict[str, Any]], got: List[Dict[str, Any]]) -> Dict[str, Any]:
+    n = len(ref)
+    labels = sum(1 for a, b in zip(ref, got) if a["label"] == b["label"])
+    stars = sum(1 for a, b in zip(ref, got) if a["stars"] == b["stars"])
+    conf = sum(abs(a["confidence"] - b["confidence"]) for a, b in zip(ref, got)) / n
+    return {
+        "label_agreement": round(labels / n, 4),
+        "stars_agreement": round(stars / n, 4),
+        "mean_abs_confidence_diff": round(conf, 4),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--model", default="tabularisai/multilingual-sentiment-analysis")
+    p.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    p.add_argument("--fixture", type=Path, default=FIXTURE)
+    p.add_argument("--threads", type=int, default=None)
+    p.add_argument("--repeat", type=int, default=5, help="Best-of-N timing")
+    p.add_argument("--json", action="store_true", help="Print machine-readable result")
+    args = p.parse_args()
+
+    texts = load_fixture(args.fixture)
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+
+    runs = [run_backend(args.model, b, texts, args.threads, args.repeat) for b in backends]
+    ref = runs[0]["preds"]
+
+    report = []
+    for run in runs:
+        row = {k: v for k, v in run.items() if k != "preds"}
+        row.update(agreement(ref, run["preds"]))
+        row["speedup_vs_fp32"] = round(runs[0]["infer_s"] / run["infer_s"], 2) if run["infer_s"] else None
+        report.append(row)
+
+    if args.json:
+        print(json.dumps({"texts": len(texts), "threads": args.threads, "backends": report}))
+        return
+
+    print(f"Texts={len(texts)} Threads={args.threads}")
+    print(f"{'backend':<12}{'load_s':>8}{'infer_s':>9}{'texts/s':>9}{'speedup':>9}{'labels':>8}{'stars':>8}{'dconf':>8}")
+    for r in report:
+        print(
+            f"{r['backend']:<12}{r['load_s']:>8}{r['infer_s']:>9}{r['texts_per_s']:>9}"
+            f"{r['speedup_vs_fp32']:>9}{r['label_agreement']:>8}{r['stars_agreement']:>8}"
+            f"{r['mean_abs_confidence_diff']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Move old raw payloads out of Postgres into compressed files on local disk.
+
+Payloads of reviews ingested more than N days ago, both inline
+(reviews_raw.raw_payload) and compressed (reviews_raw_payloads), are appended
+to a gzip JSONL file, one line per review:
+
+  {"raw_id", "source", "source_review_id", "ingested_at", "payload"}
+
+Every batch is written as its own gzip member and fsync'ed before the rows are
+cleared in the database, so a crash can only duplicate archive lines, never lose
+a payload. The review rows themselves stay; only the payload goes.
+
+Usage:
+  python -m jobs.ingest.archive_payloads --older-than-days 90 --dry-run
+  python -m jobs.ingest.archive_payloads --older-than-days 90 --vacuum
+"""
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, null, select, text, tuple_, update
+
+from apps.api.app.db import SessionLocal, engine
+from apps.api.app.models import Base, ReviewRaw, ReviewRawPayload
+from jobs.ingest.payloads import decompress_payload
+
+ARCHIVE_DIR = Path(os.getenv("PAYLOAD_ARCHIVE_DIR", "payload_archive"))
+
+
+def _append_member(path: Path, records: List[Dict[str, Any]]) -> None:
+    data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+    with open(path, "ab") as f:
+        f.write(gzip.compress(data.encode("utf-8")))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _inline_filter(cutoff: datetime):
+    # JSON null (written for payload-less rows) counts as no payload too
+    return and_(ReviewRaw.ingested_at < cutoff, func.jsonb_typeof(ReviewRaw.raw_payload) != "null")
+
+
+def count_archivable(db, cutoff: datetime) -> Dict[str, int]:
+    inline = db.execute(select(func.count()).select_from(ReviewRaw).where(_inline_filter(cutoff))).scalar()
+    side = db.execute(
+        select(func.count())
+        .select_from(ReviewRawPayload)
+        .join(ReviewRaw, ReviewRaw.id == ReviewRawPayload.raw_id)
+        .where(ReviewRaw.ingested_at < cutoff)
+    ).scalar()
+    return {"inline": int(inline or 0), "compressed": int(side or 0)}
+
+
+def archive_inline(db, cutoff: datetime, path: Path, batch_size: int = 5000) -> int:
+    """
+    Archive + clear reviews_raw.raw_payload, walking (ingested_at, id) keyset order.
+    """
+    archived = 0
+    last: Optional[tuple] = None
+    while True:
+        stmt = select(
+            ReviewRaw.id, ReviewRaw.source, ReviewRaw.source_review_id, ReviewRaw.ingested_at, ReviewRaw.raw_payload
+        ).where(_inline_filter(cutoff))
+        if last is not None:
+            stmt = stmt.where(tuple_(ReviewRaw.ingested_at, ReviewRaw.id) > tuple_(*last))
+        rows = db.execute(stmt.order_by(ReviewRaw.ingested_at, ReviewRaw.id).limit(batch_size)).all()
+        if not rows:
+            return archived
+
+        _append_member(
+            path,
+            [
+                {
+                    "raw_id": str(r.id),
+                    "source": r.source,
+                    "source_review_id": r.source_review_id,
+                    "ingested_at": r.ingested_at.isoformat(),
+                    "payload": r.raw_payload,
+                }
+                for r in rows
+            ],
+        )
+        db.execute(update(ReviewRaw).where(ReviewRaw.id.in_([r.id for r in rows])).values(raw_payload=null()))
+        db.commit()
+        archived += len(rows)
+        last = (rows[-1].ingested_at, rows[-1].id)
+
+
+def archive_compressed(db, cutoff: datetime, path: Path, batch_size: int = 5000) -> int:
+    """
+    Archive + delete reviews_raw_payloads rows of old reviews.
+    """
+    archived = 0
+    while True:
+        rows = db.execute(
+            select(
+                ReviewRawPayload.raw_id,
+                ReviewRawPayload.codec,
+                ReviewRawPayload.payload,
+                ReviewRaw.source,
+                ReviewRaw.source_review_id,
+                ReviewRaw.ingested_at,
+            )
+            .join(ReviewRaw, ReviewRaw.id == ReviewRawPayload.raw_id)
+            .where(ReviewRaw.ingested_at < cutoff)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return archived
+
+        _append_member(
+            path,
+            [
+                {
+                    "raw_id": str(r.raw_id),
+                    "source": r.source,
+                    "source_review_id": r.source_review_id,
+                    "ingested_at": r.ingested_at.isoformat(),
+                    "payload": decompress_payload(r.payload, r.codec),
+                }
+                for r in rows
+            ],
+        )
+        db.execute(delete(ReviewRawPayload).where(ReviewRawPayload.raw_id.in_([r.raw_id for r in rows])))
+        db.commit()
+        archived += len(rows)
+
+
+def vacuum() -> None:
+    # VACUUM cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM (ANALYZE) reviews_raw"))
+        conn.execute(text("VACUUM (ANALYZE) reviews_raw_payloads"))
+
+
+def main(
+    older_than_days: int = 90,
+    batch_size: int = 5000,
+    archive_dir: Path = ARCHIVE_DIR,
+    dry_run: bool = False,
+    run_vacuum: bool = False,
+) -> Dict[str, Any]:
+    Base.metadata.create_all(bind=engine)
+    for index in ReviewRaw.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=older_than_days)
+
+    with SessionLocal() as db:
+        pending = count_archivable(db, cutoff)
+        print(f"Cutoff={cutoff.isoformat()} ArchivableInline={pending['inline']} ArchivableCompressed={pending['compressed']}")
+        if dry_run or not any(pending.values()):
+            return {"cutoff": cutoff.isoformat(), **pending, "archived": 0, "path": None}
+
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        path = archive_dir / f"raw_payloads_{now.strftime('%Y%m%dT%H%M%SZ')}.jsonl.gz"
+        inline = archive_inline(db, cutoff, path, batch_size)
+        side = archive_compressed(db, cutoff, path, batch_size)
+
+    size_mb = path.stat().st_size / 1e6 if path.exists() else 0.0
+    print(f"ArchivedInline={inline} ArchivedCompressed={side} File={path} FileMB={size_mb:.1f}")
+
+    if run_vacuum:
+        vacuum()
+        print("Vacuumed reviews_raw, reviews_raw_payloads")
+
+    return {"cutoff": cutoff.isoformat(), "archived": inline + side, "path": str(path)}
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--older-than-days", type=int, default=90, help="Archive payloads of reviews ingested before this")
+    p.add_argument("--batch", type=int, default=5000, help="Rows per archive batch (one gzip member + commit)")
+    p.add_argument("--archive-dir", type=Path, default=ARCHIVE_DIR)
+    p.add_argument("--dry-run", action="store_true", help="Only count what would be archived")
+    p.add_argument("--vacuum", action="store_true", help="VACUUM (ANALYZE) the payload tables afterwards")
+    args = p.parse_args()
+
+    main(
+        older_than_days=args.older_than_days,
+        batch_size=args.batch,
+        archive_dir=args.archive_dir,
+        dry_run=args.dry_run,
+        run_vacuum=args.vacuum,
+    )
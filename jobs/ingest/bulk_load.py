@@ -0,0 +1,144 @@
+"""
+Parallel bulk loader for historical backfills.
+
+Reads row batches from the "file" source (jobs.ingest.registry) on the main
+thread and writes them with multi-row inserts from a pool of workers, each with
+its own session and one commit per batch. At most 2 x workers batches are in
+flight, so memory stays bounded however large the input is.
+
+Usage:
+  python -m jobs.ingest.bulk_load --path exports/tickets.jsonl.gz --source-name support_export \\
+      --vertical food --map original_text=body --map created_at=opened_at --workers 4
+  python -m jobs.ingest.bulk_load --path old_store_dump.csv --source-name store_dump_2022
+"""
+import argparse
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set
+
+import yaml
+
+from apps.api.app.db import SessionLocal, engine
+from apps.api.app.models import Base
+from jobs.ingest.payloads import DEFAULT_PAYLOAD_MODE, PAYLOAD_MODES
+from jobs.ingest.registry import get_source
+from jobs.ingest.store import insert_raw_many
+from jobs.ingest.targets import VERTICALS_PATH
+
+
+def _write_batch(rows: List[Dict[str, Any]], payload_mode: str) -> int:
+    with SessionLocal() as db:
+        inserted = insert_raw_many(db, rows, payload_mode=payload_mode)
+        db.commit()
+    return inserted
+
+
+def bulk_load(
+    batches: Iterable[List[Dict[str, Any]]],
+    workers: int = 4,
+    progress_every: int = 20,
+    payload_mode: str = DEFAULT_PAYLOAD_MODE,
+) -> Dict[str, Any]:
+    """
+    Write row batches (from any registered source) concurrently.
+    Returns batch/row/inserted counts and rows/s.
+    """
+    totals = {"batches": 0, "rows": 0, "inserted": 0}
+    pending: Set[Future] = set()
+    max_in_flight = max(1, workers) * 2
+    t0 = time.perf_counter()
+
+    def _collect(done: Iterable[Future]) -> None:
+        for fut in done:
+            totals["inserted"] += fut.result()
+            totals["batches"] += 1
+            if progress_every and totals["batches"] % progress_every == 0:
+                elapsed = time.perf_counter() - t0
+                print(
+                    f"Batches={totals['batches']} Rows={totals['rows']} Inserted={totals['inserted']} "
+                    f"RowsPerS={totals['rows'] / elapsed:.0f}"
+                )
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="bulk-load") as pool:
+        try:
+            for rows in batches:
+                if not rows:
+                    continue
+                totals["rows"] += len(rows)
+                pending.add(pool.submit(_write_batch, rows, payload_mode))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    _collect(done)
+            done, pending = wait(pending)
+            _collect(done)
+        except BaseException:
+            for fut in pending:
+                fut.cancel()
+            raise
+
+    elapsed = time.perf_counter() - t0
+    totals["elapsed_s"] = round(elapsed, 2)
+    totals["rows_per_s"] = round(totals["rows"] / elapsed, 1) if elapsed > 0 else 0.0
+    return totals
+
+
+def _parse_mapping(specs: List[str]) -> Dict[str, str]:
+    mapping = {}
+    for spec in specs:
+        field, sep, column = spec.partition("=")
+        if not sep or not field or not column:
+            raise ValueError(f"--map must look like field=column, got {spec!r}")
+        mapping[field] = column
+    return mapping
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--path", required=True, help="JSONL / CSV file, optionally .gz")
+    p.add_argument("--format", choices=["jsonl", "csv"], default=None, help="Default: from the file extension")
+    p.add_argument("--source-name", default="file_import", help="Value stored in reviews_raw.source")
+    p.add_argument("--vertical", default=None, help="Vertical for every row (default: a 'vertical' column)")
+    p.add_argument("--lang", default=None, help="Language when the file has none")
+    p.add_argument(
+        "--map",
+        action="append",
+        default=[],
+        help="ReviewRaw field=file column, e.g. original_text=body (repeatable)",
+    )
+    p.add_argument(
+        "--payload-mode",
+        choices=list(PAYLOAD_MODES),
+        default=DEFAULT_PAYLOAD_MODE,
+        help="How to keep the source record (see jobs/ingest/payloads.py)",
+    )
+    p.add_argument("--batch", type=int, default=5000, help="Rows per write batch")
+    p.add_argument("--workers", type=int, default=4, help="Concurrent writers")
+    args = p.parse_args()
+
+    cfg = yaml.safe_load(Path(VERTICALS_PATH).read_text(encoding="utf-8"))
+    counters: Dict[str, int] = {}
+    batches = get_source("file")(
+        path=args.path,
+        source=args.source_name,
+        vertical=args.vertical,
+        mapping=_parse_mapping(args.map),
+        fmt=args.format,
+        lang=args.lang,
+        allowed_verticals=frozenset(cfg["verticals"]),
+        keep_payload=args.payload_mode != "none",
+        batch_size=args.batch,
+        counters=counters,
+    )
+
+    Base.metadata.create_all(bind=engine)
+    totals = bulk_load(batches, workers=args.workers, payload_mode=args.payload_mode)
+
+    invalid = {k: v for k, v in sorted(counters.items()) if k.startswith("invalid")}
+    print(
+        f"Read={counters.get('read', 0)} Valid={counters.get('valid', 0)} InsertedNew={totals['inserted']} "
+        f"AlreadyPresent={totals['rows'] - totals['inserted']} Invalid={sum(invalid.values())} "
+        f"Batches={totals['batches']} ElapsedS={totals['elapsed_s']} RowsPerS={totals['rows_per_s']}"
+    )
+    for k, v in invalid.items():
+        print(f"  {k}={v}")
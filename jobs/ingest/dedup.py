@@ -0,0 +1,227 @@
+"""
+Near-duplicate detection for raw reviews.
+
+Every new review gets a 64-bit SimHash of its normalized text, stored in
+reviews_raw_signatures next to reviews_raw, and is linked to a canonical
+cluster representative: the closest earlier representative of the same vertical
+within MAX_DISTANCE differing bits, or itself.
+
+The hash is split into four 16-bit bands. Two hashes at most 3 bits apart always
+agree on at least one band, and up to MAX_DISTANCE they usually do (a one-word
+edit of a typical review lands 2-10 bits away), so candidates are the
+representatives sharing a band (partial indexes on (vertical, bandN)) and the
+Hamming distance is checked in Postgres. A missed pair only costs an LLM call.
+A batch costs one lookup round-trip and each review a handful of index probes,
+independent of how large the corpus gets.
+
+Short reviews ("good", "bad app") only cluster with identical ones: a few bits
+apart there is a different review, not a copy-paste.
+
+Usage (signatures for rows ingested before this existed):
+  python -m jobs.ingest.dedup --backfill
+"""
+import argparse
+import hashlib
+import re
+import uuid
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from apps.api.app.db import SessionLocal, engine
+from apps.api.app.models import Base, ReviewRaw, ReviewRawSignature
+from jobs.analyze.extraction_cache import normalize_text
+
+BANDS = 4
+BAND_BITS = 16
+# Up to 3 differing bits share a band for sure (pigeonhole), 4-6 most of the time;
+# unrelated reviews sit around 32
+MAX_DISTANCE = 6
+# Below this many words only exact (distance 0) matches count
+MIN_NEAR_TOKENS = 6
+
+_TOKEN = re.compile(r"\w+")
+
+_LOOKUP_SQL = text(
+    """
+    SELECT q.idx, m.raw_id
+    FROM unnest(
+        CAST(:idx AS int[]), CAST(:vertical AS text[]), CAST(:simhash AS bigint[]),
+        CAST(:b0 AS int[]), CAST(:b1 AS int[]), CAST(:b2 AS int[]), CAST(:b3 AS int[]),
+        CAST(:max_distance AS int[])
+    ) AS q(idx, vertical, simhash, b0, b1, b2, b3, max_distance)
+    CROSS JOIN LATERAL (
+        SELECT s.raw_id
+        FROM reviews_raw_signatures s
+        WHERE s.raw_id = s.canonical_raw_id
+          AND s.vertical = q.vertical
+          AND (s.band0 = q.b0 OR s.band1 = q.b1 OR s.band2 = q.b2 OR s.band3 = q.b3)
+          AND bit_count(CAST(s.simhash # q.simhash AS bit(64))) <= q.max_distance
+        ORDER BY bit_count(CAST(s.simhash # q.simhash AS bit(64)))
+        LIMIT 1
+    ) m
+    """
+)
+
+
+class Signature(NamedTuple):
+    simhash: int  # unsigned 64-bit
+    max_distance: int
+
+    @property
+    def signed(self) -> int:
+        # BIGINT is signed; keep the same bit pattern
+        return self.simhash - (1 << 64) if self.simhash >= (1 << 63) else self.simhash
+
+    @property
+    def bands(self) -> List[int]:
+        mask = (1 << BAND_BITS) - 1
+        return [(self.simhash >> (BAND_BITS * i)) & mask for i in range(BANDS)]
+
+
+def _features(normalized: str) -> List[str]:
+    tokens = _TOKEN.findall(normalized)
+    if len(tokens) >= 3:
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    # Very short / emoji-only text: character trigrams still tell "👍" from "👎"
+    if len(normalized) <= 3:
+        return [normalized] if normalized else []
+    return [normalized[i : i + 3] for i in range(len(normalized) - 2)]
+
+
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text_: str) -> int:
+    weights = [0] * 64
+    for feature, count in Counter(_features(normalize_text(text_))).items():
+        h = _hash64(feature)
+        for bit in range(64):
+            weights[bit] += count if (h >> bit) & 1 else -count
+    out = 0
+    for bit, w in enumerate(weights):
+        if w > 0:
+            out |= 1 << bit
+    return out
+
+
+def signature(text_: str) -> Signature:
+    near = len(_TOKEN.findall(normalize_text(text_))) >= MIN_NEAR_TOKENS
+    return Signature(simhash(text_), MAX_DISTANCE if near else 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _lookup(db, items: List[Tuple[str, Signature]]) -> Dict[int, uuid.UUID]:
+    """
+    Closest stored representative per item index (only items that have one).
+    """
+    if not items:
+        return {}
+    params: Dict[str, list] = {"idx": [], "vertical": [], "simhash": [], "max_distance": []}
+    for i in range(BANDS):
+        params[f"b{i}"] = []
+    for idx, (vertical, sig) in enumerate(items):
+        params["idx"].append(idx)
+        params["vertical"].append(vertical)
+        params["simhash"].append(sig.signed)
+        params["max_distance"].append(sig.max_distance)
+        for i, band in enumerate(sig.bands):
+            params[f"b{i}"].append(band)
+    return {row.idx: row.raw_id for row in db.execute(_LOOKUP_SQL, params)}
+
+
+def assign_signatures(db, items: List[Tuple[uuid.UUID, str, str]]) -> int:
+    """
+    Sign (raw_id, vertical, text) items and link each to its canonical representative,
+    looking at stored representatives first and then at earlier items of the batch.
+    Writes reviews_raw_signatures in the caller's transaction; returns how many
+    items were near-duplicates.
+
+    Concurrent writers may each make a representative of the same cluster; that only
+    costs a missed reuse, never a wrong link.
+    """
+    if not items:
+        return 0
+    sigs = [signature(text_) for _, _, text_ in items]
+    stored = _lookup(db, [(vertical, sig) for (_, vertical, _), sig in zip(items, sigs)])
+
+    # (vertical, band index, band value) -> batch representatives in that bucket
+    local: Dict[Tuple[str, int, int], List[Tuple[int, uuid.UUID]]] = {}
+    rows = []
+    duplicates = 0
+    for idx, ((raw_id, vertical, _), sig) in enumerate(zip(items, sigs)):
+        canonical: Optional[uuid.UUID] = stored.get(idx)
+        if canonical is None:
+            best = sig.max_distance + 1
+            for i, band in enumerate(sig.bands):
+                for other_hash, other_id in local.get((vertical, i, band), ()):
+                    d = hamming(sig.simhash, other_hash)
+                    if d < best:
+                        best, canonical = d, other_id
+
+        if canonical is None:
+            canonical = raw_id
+            for i, band in enumerate(sig.bands):
+                local.setdefault((vertical, i, band), []).append((sig.simhash, raw_id))
+        else:
+            duplicates += 1
+
+        bands = sig.bands
+        rows.append(
+            {
+                "raw_id": raw_id,
+                "vertical": vertical,
+                "simhash": sig.signed,
+                "band0": bands[0],
+                "band1": bands[1],
+                "band2": bands[2],
+                "band3": bands[3],
+                "canonical_raw_id": canonical,
+            }
+        )
+
+    db.execute(insert(ReviewRawSignature).values(rows).on_conflict_do_nothing(index_elements=["raw_id"]))
+    return duplicates
+
+
+def backfill(batch_size: int = 2000) -> Dict[str, int]:
+    """
+    Sign raws that have no signature yet, oldest first, one commit per batch.
+    """
+    totals = {"signed": 0, "duplicates": 0}
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(ReviewRaw.id, ReviewRaw.vertical, ReviewRaw.original_text)
+                .outerjoin(ReviewRawSignature, ReviewRawSignature.raw_id == ReviewRaw.id)
+                .where(ReviewRawSignature.raw_id.is_(None))
+                .order_by(ReviewRaw.created_at, ReviewRaw.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return totals
+            totals["duplicates"] += assign_signatures(db, [(r.id, r.vertical, r.original_text) for r in rows])
+            db.commit()
+        totals["signed"] += len(rows)
+        print(f"Signed={totals['signed']} Duplicates={totals['duplicates']}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--backfill", action="store_true", help="Sign every raw review that has no signature yet")
+    p.add_argument("--batch", type=int, default=2000, help="Reviews per lookup + commit")
+    args = p.parse_args()
+
+    if not args.backfill:
+        p.error("nothing to do; pass --backfill")
+
+    Base.metadata.create_all(bind=engine)
+    totals = backfill(batch_size=args.batch)
+    ratio = totals["duplicates"] / totals["signed"] if totals["signed"] else 0.0
+    print(f"Signed={totals['signed']} Duplicates={totals['duplicates']} DedupRatio={ratio:.3f}")
@@ -0,0 +1,63 @@
+import json
+import os
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+# How reviews_raw.raw_payload is stored at ingest:
+# - full: the whole source record (old behaviour)
+# - whitelist: only PAYLOAD_WHITELIST keys (text, rating and date already have columns)
+# - compressed: the whole record, zlib-compressed in reviews_raw_payloads
+# - none: no payload
+PAYLOAD_MODES = ("full", "whitelist", "compressed", "none")
+DEFAULT_PAYLOAD_MODE = os.getenv("INGEST_PAYLOAD_MODE", "full")
+
+PAYLOAD_WHITELIST = (
+    "reviewId",
+    "thumbsUpCount",
+    "reviewCreatedVersion",
+    "appVersion",
+    "replyContent",
+    "repliedAt",
+)
+
+CODEC = "zlib"
+
+
+def compress_payload(payload: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decompress_payload(blob: bytes, codec: str = CODEC) -> Dict[str, Any]:
+    if codec != CODEC:
+        raise ValueError(f"unknown payload codec {codec!r}")
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def apply_payload_mode(
+    rows: List[Dict[str, Any]],
+    mode: str,
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[Tuple[str, str], bytes]]]:
+    """
+    Rewrite the raw_payload of normalized rows for `mode`.
+    For "compressed" the payloads are moved out of the rows and returned as
+    {(source, source_review_id): blob} for reviews_raw_payloads; otherwise None.
+    """
+    if mode not in PAYLOAD_MODES:
+        raise ValueError(f"unknown payload mode {mode!r}; expected one of {PAYLOAD_MODES}")
+    if mode == "full":
+        return rows, None
+
+    blobs: Optional[Dict[Tuple[str, str], bytes]] = {} if mode == "compressed" else None
+    out = []
+    for row in rows:
+        payload = row.get("raw_payload")
+        if mode == "whitelist" and payload:
+            payload = {k: payload[k] for k in PAYLOAD_WHITELIST if payload.get(k) is not None}
+        elif mode == "compressed":
+            if payload:
+                blobs[(row["source"], row["source_review_id"])] = compress_payload(payload)
+            payload = None
+        elif mode == "none":
+            payload = None
+        out.append({**row, "raw_payload": payload or None})
+    return out, blobs
@@ -0,0 +1,42 @@
+"""
+Registry of ingest source adapters.
+
+A source adapter is a generator function yielding batches (pages) of
+normalized ReviewRaw rows; it takes its own keyword options plus an optional
+`counters` dict it fills with "read" / "valid" / "invalid*" counts. Loaders
+(see jobs.ingest.bulk_load) only deal with row batches, so new sources plug in
+with register_source() and nothing else changes.
+
+Built-in adapters are imported lazily, so loading files does not need the
+Google Play scraper installed (and vice versa).
+"""
+import importlib
+from typing import Any, Callable, Dict, Iterator, List
+
+SourceFn = Callable[..., Iterator[List[Dict[str, Any]]]]
+
+_BUILTIN: Dict[str, str] = {
+    "google_play": "jobs.ingest.sources.google_play:iter_normalized_pages",
+    "file": "jobs.ingest.sources.file:iter_normalized_batches",
+}
+
+_REGISTRY: Dict[str, SourceFn] = {}
+
+
+def register_source(name: str, fn: SourceFn) -> None:
+    _REGISTRY[name] = fn
+
+
+def available_sources() -> List[str]:
+    return sorted(set(_BUILTIN) | set(_REGISTRY))
+
+
+def get_source(name: str) -> SourceFn:
+    if name in _REGISTRY:
+        return _REGISTRY[name]
+    if name not in _BUILTIN:
+        raise ValueError(f"unknown source {name!r}; available: {available_sources()}")
+    module_name, attr = _BUILTIN[name].split(":")
+    fn = getattr(importlib.import_module(module_name), attr)
+    _REGISTRY[name] = fn
+    return fn
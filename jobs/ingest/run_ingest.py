@@ -1,67 +1,242 @@
 import argparse
 import os
-from typing import Any, Dict
-
-from sqlalchemy.dialects.postgresql import insert
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
 
 from apps.api.app.db import SessionLocal, engine
-from apps.api.app.models import Base, ReviewRaw
-from jobs.ingest.sources.google_play import fetch_google_play_reviews
+from apps.api.app.models import Base
+from jobs.ingest.sources.google_play import (
+    dump_continuation_token,
+    iter_google_play_review_pages,
+    load_continuation_token,
+)
 from jobs.ingest.normalize import normalize_google_play_review
-
-
-def upsert_raw(db, row: Dict[str, Any]) -> bool:
+from jobs.ingest.payloads import DEFAULT_PAYLOAD_MODE, PAYLOAD_MODES
+from jobs.ingest.store import insert_raw_many
+from jobs.ingest.targets import IngestTarget, RateLimiter, load_targets, new_counters, parse_target
+from jobs.ingest.watermarks import advance_watermark, is_known, load_watermark
+
+SOURCE = "google_play"
+# Name prefix of the target fetch threads (the pipeline worker routes their output to the job log)
+THREAD_NAME_PREFIX = "ingest"
+
+
+def ingest_target(
+    target: IngestTarget,
+    count: int,
+    pages: int,
+    limiter: Optional[RateLimiter] = None,
+    retries: int = 4,
+    backfill: bool = False,
+    payload_mode: str = DEFAULT_PAYLOAD_MODE,
+    on_inserted: Optional[Callable[[List[uuid.UUID]], None]] = None,
+) -> Dict[str, Any]:
     """
-    Returns True if inserted, False if already existed.
-    Uses ON CONFLICT DO NOTHING on (source, source_review_id).
+    Stream one target page by page: each page is normalized, written with one
+    multi-row insert (insert_raw_many) and committed together with the target's
+    watermark (ingest_watermarks), so memory stays at one page and rows land while
+    later pages are still being fetched. Returns its counters; errors are
+    recorded, not raised, so one failing target does not stop the others.
+
+    - Incremental (default): newest first; reviews the watermark already covers
+      are not written, and paging stops at the first page with nothing new.
+    - backfill: resume from the stored continuation token and keep paging into
+      older reviews; the token is saved after every page. The backfill is marked
+      done once a page comes back without a next token; a failed page raises and
+      leaves the stored token as it was.
+    - payload_mode: how raw_payload is stored (see jobs/ingest/payloads.py)
+    - on_inserted: called with the ids of each page's new rows once committed; it
+      may block, which holds back fetching the next page (jobs/stream_pipeline.py)
     """
-    stmt = (
-        insert(ReviewRaw)
-        .values(**row)
-        .on_conflict_do_nothing(index_elements=["source", "source_review_id"])
-    )
-    res = db.execute(stmt)
-    return res.rowcount == 1
+    counters = new_counters()
+    lock = threading.Lock()
+
+    def _on_retry(attempt: int, err: BaseException, delay: float) -> None:
+        with lock:
+            counters["retries"] += 1
+        print(f"Target={target.label} retry={attempt} in {delay:.1f}s: {err}")
+
+    t0 = time.perf_counter()
+    try:
+        with SessionLocal() as db:
+            wm = load_watermark(db, SOURCE, target)
+            start_token = None
+            if backfill:
+                if wm.backfill_done_at is not None:
+                    print(f"Target={target.label} backfill already complete ({wm.backfill_done_at.isoformat()})")
+                    counters["elapsed_s"] = 0.0
+                    return counters
+                start_token = load_continuation_token(wm.backfill_token, target.lang, target.country)
+            # What was ingested before this run; pages of this run don't move it
+            start_latest = wm.latest_created_at
+            recent = set(wm.recent_ids or [])
+
+            for page, token in iter_google_play_review_pages(
+                app_id=target.app_id,
+                lang=target.lang,
+                country=target.country,
+                count=count,
+                max_pages=pages,
+                throttle=limiter.acquire if limiter is not None else None,
+                retries=retries,
+                on_retry=_on_retry,
+                continuation_token=start_token,
+            ):
+                counters["pages"] += 1
+                counters["fetched"] += len(page)
+
+                rows = []
+                for raw in page:
+                    norm = normalize_google_play_review(raw, target.vertical, target.lang, target.country)
+                    if not norm["source_review_id"] or not norm["original_text"]:
+                        counters["skipped_invalid"] += 1
+                        continue
+                    rows.append(norm)
+
+                new_rows = rows if backfill else [r for r in rows if not is_known(r, start_latest, recent)]
+                counters["known"] += len(rows) - len(new_rows)
+                page_ids: List[uuid.UUID] = []
+                counters["inserted"] += insert_raw_many(
+                    db, new_rows, payload_mode=payload_mode, inserted_ids=page_ids
+                )
+
+                now = datetime.now(timezone.utc)
+                if backfill:
+                    next_token = dump_continuation_token(token)
+                    wm.backfill_token = next_token
+                    if next_token is None:
+                        # The fetch succeeded (failures raise) without a next page: no older reviews
+                        wm.backfill_done_at = now
+                else:
+                    advance_watermark(wm, rows)
+                wm.updated_at = now
+                db.commit()
+
+                if on_inserted is not None and page_ids:
+                    on_inserted(page_ids)
+
+                if not backfill and rows and not new_rows:
+                    # Everything on this page was already ingested; older pages are too
+                    break
+    except Exception as e:
+        counters["error"] = repr(e)
+
+    counters["elapsed_s"] = round(time.perf_counter() - t0, 2)
+    return counters
+
+
+def ingest_targets(
+    targets: List[IngestTarget],
+    count: int,
+    pages: int,
+    workers: int = 4,
+    rate: float = 2.0,
+    retries: int = 4,
+    backfill: bool = False,
+    payload_mode: str = DEFAULT_PAYLOAD_MODE,
+    on_inserted: Optional[Callable[[List[uuid.UUID]], None]] = None,
+) -> Dict[IngestTarget, Dict[str, Any]]:
+    """
+    Ingest several targets concurrently. All page requests share one RateLimiter
+    (`rate` requests/s across every thread); each target backs off on its own.
+    `on_inserted` is passed to every ingest_target.
+    """
+    limiter = RateLimiter(rate, burst=max(1, workers))
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets))), thread_name_prefix=THREAD_NAME_PREFIX) as pool:
+        futures = {
+            t: pool.submit(ingest_target, t, count, pages, limiter, retries, backfill, payload_mode, on_inserted)
+            for t in targets
+        }
+        return {t: f.result() for t, f in futures.items()}
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    CLI entry point; `argv` lets the pipeline worker run it in-process.
+    Returns the run totals and exits with 1 if every target failed.
+    """
     parser = argparse.ArgumentParser()
-    parser.add_argument("--vertical", required=True, help="e.g., groceries, food, laundry")
+    parser.add_argument("--vertical", default=None, help="e.g., groceries, food, laundry")
     parser.add_argument("--app-id", default=os.getenv("DEFAULT_APP_ID", "com.oryx.snoonu"))
     parser.add_argument("--country", default=os.getenv("DEFAULT_COUNTRY", "qa"))
     parser.add_argument("--lang", default=os.getenv("DEFAULT_LANG", "en"))
     parser.add_argument("--count", type=int, default=200, help="per page")
     parser.add_argument("--pages", type=int, default=2, help="max pages to fetch")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--from-config",
+        action="store_true",
+        help="Ingest the ingest_targets of verticals.yml (only --vertical's, if given)",
+    )
+    parser.add_argument(
+        "--target",
+        action="append",
+        default=[],
+        help="Extra target app_id:country:lang:vertical (repeatable)",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Targets fetched concurrently")
+    parser.add_argument("--rate", type=float, default=2.0, help="Max page requests per second across all targets (0 = no limit)")
+    parser.add_argument("--retries", type=int, default=4, help="Per-page retries with exponential backoff")
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Page into older reviews from the stored continuation token instead of stopping at known ones",
+    )
+    parser.add_argument(
+        "--payload-mode",
+        choices=list(PAYLOAD_MODES),
+        default=DEFAULT_PAYLOAD_MODE,
+        help="How to keep the source record: full, whitelist (extra fields only), compressed (side table), none",
+    )
+    args = parser.parse_args(argv)
+
+    targets: List[IngestTarget] = [parse_target(s) for s in args.target]
+    if args.from_config:
+        targets += load_targets(vertical=args.vertical)
+    elif args.vertical:
+        targets.append(IngestTarget(args.vertical, args.app_id, args.country, args.lang))
+    if not targets:
+        parser.error("nothing to ingest: pass --vertical, --target or --from-config")
+    targets = list(dict.fromkeys(targets))
 
     # Ensure tables exist (safe to call repeatedly)
     Base.metadata.create_all(bind=engine)
 
-    raw_reviews = fetch_google_play_reviews(
-        app_id=args.app_id,
-        lang=args.lang,
-        country=args.country,
+    results = ingest_targets(
+        targets,
         count=args.count,
-        max_pages=args.pages,
+        pages=args.pages,
+        workers=args.workers,
+        rate=args.rate,
+        retries=args.retries,
+        backfill=args.backfill,
+        payload_mode=args.payload_mode,
     )
 
-    inserted = 0
-    skipped = 0
-
-    with SessionLocal() as db:
-        for raw in raw_reviews:
-            norm = normalize_google_play_review(raw, args.vertical, args.lang, args.country)
-
-            if not norm["source_review_id"] or not norm["original_text"]:
-                skipped += 1
-                continue
-
-            if upsert_raw(db, norm):
-                inserted += 1
-
-        db.commit()
-
-    print(f"Fetched={len(raw_reviews)} InsertedNew={inserted} SkippedInvalid={skipped}")
+    totals = {"fetched": 0, "inserted": 0, "skipped_invalid": 0, "known": 0}
+    failed = 0
+    for target, c in results.items():
+        for k in totals:
+            totals[k] += c[k]
+        failed += int(c["error"] is not None)
+        print(
+            f"Target={target.label} Pages={c['pages']} Fetched={c['fetched']} InsertedNew={c['inserted']} "
+            f"AlreadyKnown={c['known']} SkippedInvalid={c['skipped_invalid']} Retries={c['retries']} "
+            f"ElapsedS={c['elapsed_s']}"
+            + (f" Error={c['error']}" if c["error"] else "")
+        )
+
+    print(
+        f"Fetched={totals['fetched']} InsertedNew={totals['inserted']} AlreadyKnown={totals['known']} "
+        f"SkippedInvalid={totals['skipped_invalid']} "
+        f"Targets={len(targets)} FailedTargets={failed}"
+    )
+    if failed == len(targets):
+        raise SystemExit(1)
+    return {**totals, "targets": len(targets), "failed_targets": failed}
 
 
 if __name__ == "__main__":
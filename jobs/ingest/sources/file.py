@@ -0,0 +1,190 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from jobs.ingest.normalize import _to_aware_utc, json_safe
+
+# ReviewRaw field -> candidate column names, first present one wins
+DEFAULT_MAPPING: Dict[str, List[str]] = {
+    "source_review_id": ["source_review_id", "review_id", "reviewId", "id"],
+    "original_text": ["original_text", "text", "content", "body", "review"],
+    "created_at": ["created_at", "at", "date", "timestamp"],
+    "rating": ["rating", "score", "stars"],
+    "language": ["language", "lang"],
+    "vertical": ["vertical"],
+}
+
+
+def detect_format(path: Path) -> str:
+    suffixes = [s.lower() for s in path.suffixes if s.lower() != ".gz"]
+    ext = suffixes[-1] if suffixes else ""
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if ext in (".csv", ".tsv"):
+        return "csv"
+    raise ValueError(f"cannot tell the format of {path.name}; pass fmt=jsonl|csv")
+
+
+def _open_text(path: Path) -> io.TextIOBase:
+    with open(path, "rb") as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    if gzipped:
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def iter_records(path: Path, fmt: Optional[str] = None) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Stream records from a JSONL or CSV file (plain or gzip), one line at a time.
+    Unparseable JSONL lines are yielded as None so the caller can count them.
+    """
+    fmt = fmt or detect_format(path)
+    with _open_text(path) as f:
+        if fmt == "csv":
+            delimiter = "\t" if ".tsv" in [s.lower() for s in path.suffixes] else ","
+            yield from csv.DictReader(f, delimiter=delimiter)
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            yield rec if isinstance(rec, dict) else None
+
+
+def resolve_mapping(overrides: Optional[Dict[str, str]] = None) -> Dict[str, List[str]]:
+    mapping = {field: list(cols) for field, cols in DEFAULT_MAPPING.items()}
+    for field, col in (overrides or {}).items():
+        if field not in mapping:
+            raise ValueError(f"unknown ReviewRaw field {field!r}; mappable: {sorted(mapping)}")
+        mapping[field] = [col]
+    return mapping
+
+
+def _pick(rec: Dict[str, Any], columns: List[str]) -> Any:
+    for col in columns:
+        value = rec.get(col)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _parse_created_at(value: Any) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.strip().isdigit()):
+        ts = float(value)
+        # Millisecond epochs are common in exports
+        if ts > 1e11:
+            ts /= 1000
+        try:
+            return datetime.fromtimestamp(ts, tz=timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            # NaN or outside what datetime/the platform can represent
+            return None
+    try:
+        return _to_aware_utc(datetime.fromisoformat(str(value).strip().replace("Z", "+00:00")))
+    except ValueError:
+        return None
+
+
+def normalize_file_record(
+    rec: Optional[Dict[str, Any]],
+    mapping: Dict[str, List[str]],
+    source: str,
+    vertical: Optional[str],
+    allowed_verticals: Optional[frozenset] = None,
+    lang: Optional[str] = None,
+    keep_payload: bool = True,
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Map one file record onto ReviewRaw fields.
+    Returns (row, None) or (None, reason) for invalid records.
+    """
+    if rec is None:
+        return None, "unparseable"
+
+    review_id = _pick(rec, mapping["source_review_id"])
+    if review_id is None:
+        return None, "missing_id"
+
+    text = str(_pick(rec, mapping["original_text"]) or "").strip()
+    if not text:
+        return None, "missing_text"
+
+    created_at = _parse_created_at(_pick(rec, mapping["created_at"]))
+    if created_at is None:
+        return None, "bad_created_at"
+
+    row_vertical = vertical or _pick(rec, mapping["vertical"])
+    if not row_vertical:
+        return None, "missing_vertical"
+    if allowed_verticals is not None and row_vertical not in allowed_verticals:
+        return None, "unknown_vertical"
+
+    rating = _pick(rec, mapping["rating"])
+    if rating is not None:
+        try:
+            rating = int(float(rating))
+        except (TypeError, ValueError):
+            return None, "bad_rating"
+
+    language = _pick(rec, mapping["language"]) or lang
+
+    return {
+        "source": source,
+        "source_review_id": str(review_id)[:256],
+        "vertical": str(row_vertical),
+        "created_at": created_at,
+        "ingested_at": datetime.now(timezone.utc),
+        "rating": rating,
+        "language": str(language)[:16] if language else None,
+        "original_text": text,
+        "raw_payload": json_safe(rec) if keep_payload else None,
+    }, None
+
+
+def iter_normalized_batches(
+    path: str,
+    source: str = "file_import",
+    vertical: Optional[str] = None,
+    mapping: Optional[Dict[str, str]] = None,
+    fmt: Optional[str] = None,
+    lang: Optional[str] = None,
+    allowed_verticals: Optional[frozenset] = None,
+    keep_payload: bool = True,
+    batch_size: int = 5000,
+    counters: Optional[Dict[str, int]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Registry entry point: stream a JSONL/CSV(.gz) export as batches of ReviewRaw rows.
+
+    Only one batch is held at a time. `counters` (if given) gets "read", "valid"
+    and "invalid_<reason>" counts.
+    """
+    resolved = resolve_mapping(mapping)
+    counters = counters if counters is not None else {}
+    batch: List[Dict[str, Any]] = []
+    for rec in iter_records(Path(path), fmt):
+        counters["read"] = counters.get("read", 0) + 1
+        row, reason = normalize_file_record(
+            rec, resolved, source, vertical, allowed_verticals, lang=lang, keep_payload=keep_payload
+        )
+        if row is None:
+            key = f"invalid_{reason}"
+            counters[key] = counters.get(key, 0) + 1
+            continue
+        counters["valid"] = counters.get("valid", 0) + 1
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
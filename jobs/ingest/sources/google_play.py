@@ -1,36 +1,136 @@
-from typing import Any, Dict, List, Optional, Tuple
-from google_play_scraper import Sort, reviews
+import json
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from google_play_scraper import Sort
+from google_play_scraper.constants.element import ElementSpecs
+from google_play_scraper.constants.request import Formats
+# Not exported by the package. reviews() swallows every fetch error (it returns
+# what it has with no token), so pages are fetched with its internals instead
+from google_play_scraper.features.reviews import MAX_COUNT_EACH_FETCH, _ContinuationToken, _fetch_review_items
 
+from jobs.ingest.normalize import normalize_google_play_review
+from jobs.ingest.targets import call_with_backoff
 
-def fetch_google_play_reviews(
+
+def dump_continuation_token(token: Any) -> Optional[str]:
+    """
+    Serialize a continuation token for storage; None once paging is exhausted.
+    """
+    if token is None or getattr(token, "token", None) is None:
+        return None
+    return json.dumps({"token": token.token, "count": token.count})
+
+
+def load_continuation_token(stored: Optional[str], lang: str, country: str) -> Any:
+    if not stored:
+        return None
+    data = json.loads(stored)
+    return _ContinuationToken(data["token"], lang, country, Sort.NEWEST.value, data["count"], None, None)
+
+
+def fetch_review_page(
+    app_id: str, lang: str, country: str, count: int, continuation_token: Any = None
+) -> Tuple[List[Dict[str, Any]], Any]:
+    """
+    One page of newest reviews and the token for the next one (None past the last page).
+    Unlike google_play_scraper.reviews(), HTTP / parse errors (429s included) raise.
+    """
+    count = min(count, MAX_COUNT_EACH_FETCH)
+    token = continuation_token.token if continuation_token is not None else None
+    items, token = _fetch_review_items(
+        Formats.Reviews.build(lang=lang, country=country), app_id, Sort.NEWEST.value, count, None, None, token
+    )
+    if isinstance(token, list):
+        # What the scraper gets past the last page
+        token = None
+    rows = [{k: spec.extract_content(item) for k, spec in ElementSpecs.Review.items()} for item in items]
+    return rows, _ContinuationToken(token, lang, country, Sort.NEWEST.value, count, None, None)
+
+
+def iter_google_play_review_pages(
     app_id: str,
     lang: str,
     country: str,
     count: int = 200,
     max_pages: int = 3,
-) -> List[Dict[str, Any]]:
+    throttle: Optional[Callable[[], None]] = None,
+    retries: int = 0,
+    on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+    continuation_token: Any = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], Any]]:
     """
-    Fetch up to (count * max_pages) newest reviews.
-    google_play_scraper returns (result, continuation_token).
+    Yield (page, continuation_token) for up to `max_pages` pages, newest first.
+    Stop iterating early to stop fetching. Pass a stored token (see
+    load_continuation_token) to resume paging where an earlier run stopped.
+
+    - throttle: called before every page request (e.g. a shared RateLimiter.acquire)
+    - retries: per-page retries with exponential backoff (see call_with_backoff);
+      failed requests raise (fetch_review_page), so a rate-limited page is retried
+      instead of looking like the end of the reviews
     """
-    all_rows: List[Dict[str, Any]] = []
-    token: Optional[Dict[str, Any]] = None
+    token = continuation_token
+
+    def _page() -> Tuple[List[Dict[str, Any]], Any]:
+        if throttle is not None:
+            throttle()
+        return fetch_review_page(app_id, lang, country, count, token)
 
     for _ in range(max_pages):
-        result, token = reviews(
-            app_id,
-            lang=lang,
-            country=country,
-            sort=Sort.NEWEST,
-            count=count,
-            continuation_token=token,
-        )
+        result, token = call_with_backoff(_page, retries=retries, on_retry=on_retry)
         if not result:
             break
 
-        all_rows.extend(result)
+        yield result, token
 
-        if not token:
+        if dump_continuation_token(token) is None:
             break
 
+
+def fetch_google_play_reviews(
+    app_id: str,
+    lang: str,
+    country: str,
+    count: int = 200,
+    max_pages: int = 3,
+    throttle: Optional[Callable[[], None]] = None,
+    retries: int = 0,
+    on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fetch up to (count * max_pages) newest reviews into one list.
+    google_play_scraper returns (result, continuation_token).
+    Prefer iter_google_play_review_pages for large fetches (one page in memory).
+    """
+    all_rows: List[Dict[str, Any]] = []
+    for page, _ in iter_google_play_review_pages(
+        app_id, lang, country, count, max_pages, throttle=throttle, retries=retries, on_retry=on_retry
+    ):
+        all_rows.extend(page)
     return all_rows
+
+
+def iter_normalized_pages(
+    app_id: str,
+    country: str,
+    lang: str,
+    vertical: str,
+    count: int = 200,
+    max_pages: int = 3,
+    counters: Optional[Dict[str, int]] = None,
+    **fetch_kwargs: Any,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Registry entry point: newest reviews as pages of ReviewRaw rows.
+    Rows without an id or text are dropped and counted as "invalid".
+    """
+    counters = counters if counters is not None else {}
+    for page, _ in iter_google_play_review_pages(app_id, lang, country, count, max_pages, **fetch_kwargs):
+        rows = []
+        for raw in page:
+            norm = normalize_google_play_review(raw, vertical, lang, country)
+            if not norm["source_review_id"] or not norm["original_text"]:
+                counters["invalid"] = counters.get("invalid", 0) + 1
+                continue
+            rows.append(norm)
+        counters["read"] = counters.get("read", 0) + len(page)
+        counters["valid"] = counters.get("valid", 0) + len(rows)
+        yield rows
@@ -0,0 +1,79 @@
+import uuid
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+
+from apps.api.app.models import ReviewRaw, ReviewRawPayload
+from jobs.ingest.dedup import assign_signatures
+from jobs.ingest.payloads import CODEC, DEFAULT_PAYLOAD_MODE, apply_payload_mode
+
+
+def upsert_raw(db, row: Dict[str, Any]) -> bool:
+    """
+    Returns True if inserted, False if already existed.
+    Uses ON CONFLICT DO NOTHING on (source, source_review_id).
+    """
+    stmt = (
+        insert(ReviewRaw)
+        .values(**row)
+        .on_conflict_do_nothing(index_elements=["source", "source_review_id"])
+    )
+    res = db.execute(stmt)
+    return res.rowcount == 1
+
+
+# reviews_raw has 10 columns; stays well under Postgres' 65535 bind parameters
+INSERT_BATCH = 1000
+
+
+def insert_raw_many(
+    db,
+    rows: List[Dict[str, Any]],
+    payload_mode: str = DEFAULT_PAYLOAD_MODE,
+    dedup: bool = True,
+    inserted_ids: Optional[List[uuid.UUID]] = None,
+) -> int:
+    """
+    Multi-row INSERT ... ON CONFLICT (source, source_review_id) DO NOTHING RETURNING id.
+    Returns how many rows were actually inserted (one round-trip per INSERT_BATCH rows).
+
+    raw_payload is stored per `payload_mode` (see jobs/ingest/payloads.py); in
+    "compressed" mode the payloads of the inserted rows go to reviews_raw_payloads.
+    With `dedup`, inserted rows are signed and linked to their near-duplicate
+    cluster (see jobs/ingest/dedup.py). The ids of inserted rows are appended to
+    `inserted_ids` when given.
+    """
+    # Repeated keys in one statement would just be skipped, but don't ship them
+    unique = list({(r["source"], r["source_review_id"]): r for r in rows}.values())
+    unique, blobs = apply_payload_mode(unique, payload_mode)
+    inserted = 0
+    for i in range(0, len(unique), INSERT_BATCH):
+        stmt = (
+            insert(ReviewRaw)
+            .values(unique[i : i + INSERT_BATCH])
+            .on_conflict_do_nothing(index_elements=["source", "source_review_id"])
+            .returning(ReviewRaw.id, ReviewRaw.source, ReviewRaw.source_review_id)
+        )
+        new = db.execute(stmt).all()
+        inserted += len(new)
+        if inserted_ids is not None:
+            inserted_ids.extend(raw_id for raw_id, _, _ in new)
+
+        payload_rows = [
+            {"raw_id": raw_id, "codec": CODEC, "payload": blobs[(source, srid)]}
+            for raw_id, source, srid in new
+            if blobs and (source, srid) in blobs
+        ]
+        if payload_rows:
+            db.execute(insert(ReviewRawPayload).values(payload_rows).on_conflict_do_nothing())
+
+        if dedup and new:
+            by_key = {(r["source"], r["source_review_id"]): r for r in unique[i : i + INSERT_BATCH]}
+            assign_signatures(
+                db,
+                [
+                    (raw_id, by_key[(source, srid)]["vertical"], by_key[(source, srid)]["original_text"])
+                    for raw_id, source, srid in new
+                ],
+            )
+    return inserted
@@ -0,0 +1,125 @@
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, TypeVar
+
+import yaml
+
+VERTICALS_PATH = Path("packages/shared/verticals.yml")
+
+T = TypeVar("T")
+
+
+class IngestTarget(NamedTuple):
+    """
+    One (app, locale) stream of store reviews, labelled with a vertical.
+    """
+    vertical: str
+    app_id: str
+    country: str
+    lang: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.app_id}/{self.country}/{self.lang}->{self.vertical}"
+
+
+def load_targets(path: Path = VERTICALS_PATH, vertical: Optional[str] = None) -> List[IngestTarget]:
+    """
+    Targets from the `ingest_targets` section of verticals.yml, optionally for one vertical.
+    """
+    cfg = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+    targets = [
+        IngestTarget(
+            vertical=t["vertical"],
+            app_id=t["app_id"],
+            country=t.get("country", "qa"),
+            lang=t.get("lang", "en"),
+        )
+        for t in cfg.get("ingest_targets") or []
+    ]
+    if vertical:
+        targets = [t for t in targets if t.vertical == vertical]
+    return targets
+
+
+def default_target(vertical: str) -> IngestTarget:
+    """
+    The single-app target `run_ingest --vertical X` uses (DEFAULT_APP_ID / _COUNTRY / _LANG).
+    """
+    return IngestTarget(
+        vertical,
+        os.getenv("DEFAULT_APP_ID", "com.oryx.snoonu"),
+        os.getenv("DEFAULT_COUNTRY", "qa"),
+        os.getenv("DEFAULT_LANG", "en"),
+    )
+
+
+def parse_target(spec: str) -> IngestTarget:
+    """
+    CLI form: app_id:country:lang:vertical
+    """
+    parts = spec.split(":")
+    if len(parts) != 4 or not all(parts):
+        raise ValueError(f"target must look like app_id:country:lang:vertical, got {spec!r}")
+    app_id, country, lang, vertical = parts
+    return IngestTarget(vertical=vertical, app_id=app_id, country=country, lang=lang)
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all ingest threads: at most `rate` acquisitions per
+    second on average, with bursts of up to `burst`. rate <= 0 disables it.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_s = (1 - self._tokens) / self.rate
+            time.sleep(wait_s)
+
+
+def call_with_backoff(
+    fn: Callable[[], T],
+    retries: int = 4,
+    base_delay: float = 2.0,
+    max_delay: float = 60.0,
+    on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+) -> T:
+    """
+    Call fn, retrying failures with exponential backoff and full jitter.
+    The last error is re-raised once `retries` retries are used up.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            attempt += 1
+            if on_retry is not None:
+                on_retry(attempt, e, delay)
+            time.sleep(delay)
+
+
+def new_counters() -> Dict[str, Any]:
+    return {"fetched": 0, "inserted": 0, "skipped_invalid": 0, "known": 0, "pages": 0, "retries": 0, "error": None}
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from apps.api.app.models import IngestWatermark
+from jobs.ingest.targets import IngestTarget
+
+# Newest source_review_ids remembered per stream (covers reviews sharing the
+# watermark's timestamp and a few pages of overlap)
+RECENT_IDS_KEEP = 1000
+
+
+def load_watermark(db, source: str, target: IngestTarget) -> IngestWatermark:
+    """
+    The stream's watermark, added to `db` (new and empty on the first run).
+    """
+    key = (source, target.app_id, target.country, target.lang)
+    wm = db.get(IngestWatermark, key)
+    if wm is None:
+        wm = IngestWatermark(
+            source=source,
+            app_id=target.app_id,
+            country=target.country,
+            lang=target.lang,
+            latest_created_at=None,
+            recent_ids=[],
+            updated_at=datetime.now(timezone.utc),
+        )
+        db.add(wm)
+    return wm
+
+
+def is_known(row: Dict[str, Any], latest_created_at: Optional[datetime], recent: set) -> bool:
+    """
+    A normalized row is already ingested if its id is among the recent ids, or it
+    is strictly older than the newest review seen so far.
+
+    Pass the watermark as it was before the run: advance_watermark moves it to the
+    newest review of the current run, which would mark the older reviews on the
+    following pages as known.
+    """
+    if row["source_review_id"] in recent:
+        return True
+    return latest_created_at is not None and row["created_at"] < latest_created_at
+
+
+def advance_watermark(wm: IngestWatermark, rows: List[Dict[str, Any]]) -> None:
+    """
+    Fold a page of normalized rows into latest_created_at / recent_ids.
+    """
+    if not rows:
+        return
+    newest = max(r["created_at"] for r in rows)
+    if wm.latest_created_at is None or newest > wm.latest_created_at:
+        wm.latest_created_at = newest
+
+    page_ids = [r["source_review_id"] for r in sorted(rows, key=lambda r: r["created_at"], reverse=True)]
+    merged = list(dict.fromkeys(page_ids + list(wm.recent_ids or [])))
+    # Reassign (not mutate) so the JSONB column is flagged dirty
+    wm.recent_ids = merged[:RECENT_IDS_KEEP]
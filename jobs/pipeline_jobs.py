@@ -0,0 +1,249 @@
+"""
+Durable pipeline job queue on the pipeline_jobs table.
+
+States: queued -> running -> succeeded | failed | cancelled (queued jobs can go
+straight to cancelled).
+
+- enqueue_job: identical queued requests (same kind + params) collapse into one
+  job, enforced by a partial unique index, so it holds across API processes
+- claim_job: oldest queued job whose vertical has fewer than
+  `max_running_per_vertical` running jobs. Claims are serialized with a
+  transaction-level advisory lock, so two workers can't both take the last slot
+  of a vertical.
+- running jobs heartbeat; a job without one for `stale_after_s` is failed as
+  "worker lost" (and frees its slot) by the next claim
+- cancel_job: queued jobs are cancelled at once; running ones get
+  cancel_requested_at, which the worker sees on its next heartbeat
+- job output lives in pipeline_job_logs (append_log), addressed by byte offset,
+  so any API instance can serve it (read_log, tail_log)
+"""
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from apps.api.app.models import PipelineJob, PipelineJobLog
+
+JOB_STATES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+MAX_RUNNING_PER_VERTICAL = int(os.getenv("PIPELINE_MAX_RUNNING_PER_VERTICAL", "1"))
+# Run a pipeline worker inside each API process (jobs/worker.py); off by default,
+# every uvicorn worker would load its own sentiment model
+EMBEDDED_WORKER = os.getenv("PIPELINE_EMBEDDED_WORKER", "0") == "1"
+STALE_AFTER_S = int(os.getenv("PIPELINE_STALE_AFTER_S", "300"))
+
+# pg_advisory_xact_lock key for claims (any constant unique to this queue)
+_CLAIM_LOCK_KEY = 0x70697065  # "pipe"
+
+
+def job_dedup_key(kind: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps([kind, params], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def enqueue_job(db, kind: str, params: Dict[str, Any]) -> Tuple[uuid.UUID, bool]:
+    """
+    Queue a job (committed). Returns (job id, created); created is False when an
+    identical job was already queued and its id is returned instead.
+    """
+    key = job_dedup_key(kind, params)
+    for _ in range(3):
+        stmt = (
+            insert(PipelineJob)
+            .values(
+                id=uuid.uuid4(),
+                kind=kind,
+                vertical=params.get("vertical") or "*",
+                params=params,
+                dedup_key=key,
+                state="queued",
+                created_at=datetime.now(timezone.utc),
+            )
+            .on_conflict_do_nothing(index_elements=["dedup_key"], index_where=text("state = 'queued'"))
+            .returning(PipelineJob.id)
+        )
+        job_id = db.execute(stmt).scalar()
+        if job_id is not None:
+            db.commit()
+            return job_id, True
+
+        existing = db.execute(
+            select(PipelineJob.id).where(PipelineJob.dedup_key == key, PipelineJob.state == "queued")
+        ).scalar()
+        db.commit()
+        if existing is not None:
+            return existing, False
+        # The twin got claimed between our insert and select; try again
+    raise RuntimeError("could not enqueue pipeline job (dedup race)")
+
+
+def claim_job(
+    db,
+    worker_id: str,
+    max_running_per_vertical: int = MAX_RUNNING_PER_VERTICAL,
+    stale_after_s: int = STALE_AFTER_S,
+) -> Optional[PipelineJob]:
+    """
+    Claim the next runnable job for `worker_id` and commit; None if there is none.
+    """
+    now = datetime.now(timezone.utc)
+    db.execute(select(func.pg_advisory_xact_lock(_CLAIM_LOCK_KEY)))
+
+    db.execute(
+        update(PipelineJob)
+        .where(
+            PipelineJob.state == "running",
+            PipelineJob.heartbeat_at < now - timedelta(seconds=stale_after_s),
+        )
+        .values(state="failed", finished_at=now, return_code=1, error="worker lost (no heartbeat)")
+    )
+
+    running = dict(
+        db.execute(
+            select(PipelineJob.vertical, func.count())
+            .where(PipelineJob.state == "running")
+            .group_by(PipelineJob.vertical)
+        ).all()
+    )
+    candidates = db.execute(
+        select(PipelineJob)
+        .where(PipelineJob.state == "queued")
+        .order_by(PipelineJob.created_at)
+        .limit(100)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    job = next((j for j in candidates if running.get(j.vertical, 0) < max_running_per_vertical), None)
+    if job is not None:
+        job.state = "running"
+        job.worker_id = worker_id
+        job.started_at = now
+        job.heartbeat_at = now
+    db.commit()
+    return job
+
+
+def heartbeat(db, job_id: uuid.UUID) -> bool:
+    """
+    Refresh a running job's heartbeat; returns True if cancellation was requested.
+    """
+    cancel_requested_at = db.execute(
+        update(PipelineJob)
+        .where(PipelineJob.id == job_id, PipelineJob.state == "running")
+        .values(heartbeat_at=datetime.now(timezone.utc))
+        .returning(PipelineJob.cancel_requested_at)
+    ).scalar()
+    db.commit()
+    return cancel_requested_at is not None
+
+
+def finish_job(db, job_id: uuid.UUID, state: str, error: Optional[str] = None) -> None:
+    if state not in FINISHED_STATES:
+        raise ValueError(f"not a final state: {state!r}")
+    db.execute(
+        update(PipelineJob)
+        .where(PipelineJob.id == job_id, PipelineJob.state == "running")
+        .values(
+            state=state,
+            finished_at=datetime.now(timezone.utc),
+            return_code=0 if state == "succeeded" else 1,
+            error=error[:4000] if error else None,
+        )
+    )
+    db.commit()
+
+
+def cancel_job(db, job_id: uuid.UUID) -> Optional[PipelineJob]:
+    """
+    Cancel a queued job or ask a running one to stop (committed).
+    Returns the job, or None if it doesn't exist.
+    """
+    now = datetime.now(timezone.utc)
+    job = db.execute(select(PipelineJob).where(PipelineJob.id == job_id).with_for_update()).scalar()
+    if job is None:
+        return None
+    if job.state == "queued":
+        job.state = "cancelled"
+        job.finished_at = now
+        job.cancel_requested_at = now
+    elif job.state == "running" and job.cancel_requested_at is None:
+        job.cancel_requested_at = now
+    db.commit()
+    return job
+
+
+def append_log(db, job_id: uuid.UUID, start_offset: int, data: str) -> int:
+    """
+    Append `data` at byte `start_offset` of the job's log (committed); returns the end offset.
+    """
+    end_offset = start_offset + len(data.encode("utf-8"))
+    db.add(PipelineJobLog(job_id=job_id, start_offset=start_offset, end_offset=end_offset, data=data))
+    db.commit()
+    return end_offset
+
+
+def _complete_utf8(chunk: bytes) -> bytes:
+    """
+    Drop a multi-byte character cut off at the end of `chunk`; it is sent next time.
+    """
+    for back in range(1, min(4, len(chunk)) + 1):
+        byte = chunk[-back]
+        if byte & 0xC0 == 0x80:  # continuation byte, keep looking for the lead
+            continue
+        if byte & 0x80:  # lead byte: 110xxxxx -> 2, 1110xxxx -> 3, 11110xxx -> 4
+            needed = 2 if byte & 0xE0 == 0xC0 else 3 if byte & 0xF0 == 0xE0 else 4
+            if back < needed:
+                return chunk[:-back]
+        break
+    return chunk
+
+
+def read_log(db, job_id: uuid.UUID, offset: Optional[int], max_bytes: int) -> Tuple[bytes, int, int]:
+    """
+    (new bytes, next offset, size). Without an offset, starts `max_bytes` before the end.
+    """
+    size = int(
+        db.execute(select(func.max(PipelineJobLog.end_offset)).where(PipelineJobLog.job_id == job_id)).scalar() or 0
+    )
+    start = max(0, size - max_bytes) if offset is None else min(offset, size)
+    rows = db.execute(
+        select(PipelineJobLog.start_offset, PipelineJobLog.data)
+        .where(PipelineJobLog.job_id == job_id, PipelineJobLog.end_offset > start)
+        .order_by(PipelineJobLog.start_offset)
+        .limit(1000)
+    ).all()
+
+    buf = bytearray()
+    for start_offset, data in rows:
+        buf += data.encode("utf-8")[max(0, start - start_offset):]
+        if len(buf) >= max_bytes:
+            break
+    chunk = _complete_utf8(bytes(buf[:max_bytes]))
+    return chunk, start + len(chunk), size
+
+
+def tail_log(db, job_id: uuid.UUID, n: int = 200) -> str:
+    """
+    Last `n` lines of the job's log, reading chunks backwards from the end.
+    """
+    rows = db.execute(
+        select(PipelineJobLog.data)
+        .where(PipelineJobLog.job_id == job_id)
+        .order_by(PipelineJobLog.start_offset.desc())
+        .execution_options(yield_per=100)
+    ).scalars()
+    parts: List[str] = []
+    newlines = 0
+    for data in rows:
+        parts.append(data)
+        newlines += data.count("\n")
+        if newlines > n:
+            break
+    lines = "".join(reversed(parts)).splitlines()
+    return "\n".join(lines[-n:])
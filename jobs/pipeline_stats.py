@@ -0,0 +1,186 @@
+"""
+Backlog and throughput numbers shared by /ops/stats and the scheduler (jobs/scheduler.py).
+
+- backlog_stats: totals, backlog, dead-lettered, leases, the backlog the analyzer
+  can pick up now, freshness, per-vertical breakdown and near-duplicates
+- throughput_stats: analyzed reviews per busy second over recent analyzer runs
+  (pipeline_runs) and the latest LLM latency next to its recent median
+"""
+from datetime import datetime, timedelta, timezone
+from statistics import median
+from typing import Any, Dict
+
+from sqlalchemy import case, func, select
+
+from apps.api.app.models import (
+    AnalysisFailure,
+    AnalysisLease,
+    PipelineRun,
+    ReviewEnriched,
+    ReviewRaw,
+    ReviewRawSignature,
+)
+
+
+def backlog_stats(db) -> Dict[str, Any]:
+    raw_total = int(db.query(func.count(ReviewRaw.id)).scalar() or 0)
+    enriched_total = int(db.query(func.count(ReviewEnriched.id)).scalar() or 0)
+
+    # backlog: raw rows that don't have an enriched row yet
+    backlog = (
+        db.query(func.count(ReviewRaw.id))
+        .outerjoin(ReviewEnriched, ReviewEnriched.raw_id == ReviewRaw.id)
+        .filter(ReviewEnriched.raw_id.is_(None))
+        .scalar()
+    )
+    backlog_total = int(backlog or 0)
+
+    # Only failures still waiting for a first enrichment are backlog
+    dead_lettered_total = int(
+        db.query(func.count(AnalysisFailure.raw_id))
+        .outerjoin(ReviewEnriched, ReviewEnriched.raw_id == AnalysisFailure.raw_id)
+        .filter(ReviewEnriched.raw_id.is_(None))
+        .scalar()
+        or 0
+    )
+    leased_total = int(
+        db.query(func.count(AnalysisLease.raw_id))
+        .filter(AnalysisLease.leased_until > func.now())
+        .scalar()
+        or 0
+    )
+
+    # What the analyzer can pick up now: not enriched, not dead-lettered, not leased
+    analyzable_total = int(
+        db.query(func.count(ReviewRaw.id))
+        .outerjoin(ReviewEnriched, ReviewEnriched.raw_id == ReviewRaw.id)
+        .outerjoin(AnalysisFailure, AnalysisFailure.raw_id == ReviewRaw.id)
+        .outerjoin(
+            AnalysisLease,
+            (AnalysisLease.raw_id == ReviewRaw.id) & (AnalysisLease.leased_until > func.now()),
+        )
+        .filter(
+            ReviewEnriched.raw_id.is_(None),
+            AnalysisFailure.raw_id.is_(None),
+            AnalysisLease.raw_id.is_(None),
+        )
+        .scalar()
+        or 0
+    )
+
+    last_ingested_at = db.query(func.max(ReviewRaw.ingested_at)).scalar()
+    last_analyzed_at = db.query(func.max(ReviewEnriched.analyzed_at)).scalar()
+
+    # oldest review still waiting for the analyzer (dead-lettered ones aren't waiting)
+    oldest_unanalyzed_at = (
+        db.query(func.min(ReviewRaw.ingested_at))
+        .outerjoin(ReviewEnriched, ReviewEnriched.raw_id == ReviewRaw.id)
+        .outerjoin(AnalysisFailure, AnalysisFailure.raw_id == ReviewRaw.id)
+        .filter(ReviewEnriched.raw_id.is_(None), AnalysisFailure.raw_id.is_(None))
+        .scalar()
+    )
+
+    # per-vertical breakdown
+    raw_by_vertical = db.query(ReviewRaw.vertical, func.count(ReviewRaw.id)).group_by(ReviewRaw.vertical).all()
+    enriched_by_vertical = db.query(ReviewEnriched.vertical, func.count(ReviewEnriched.id)).group_by(ReviewEnriched.vertical).all()
+
+    raw_map = {r[0]: int(r[1]) for r in raw_by_vertical if r[0]}
+    enriched_map = {r[0]: int(r[1]) for r in enriched_by_vertical if r[0]}
+
+    # backlog by vertical
+    backlog_by_vertical = (
+        db.query(ReviewRaw.vertical, func.count(ReviewRaw.id))
+        .outerjoin(ReviewEnriched, ReviewEnriched.raw_id == ReviewRaw.id)
+        .filter(ReviewEnriched.raw_id.is_(None))
+        .group_by(ReviewRaw.vertical)
+        .all()
+    )
+    backlog_map = {r[0]: int(r[1]) for r in backlog_by_vertical if r[0]}
+
+    signatures_by_vertical = db.execute(
+        select(
+            ReviewRawSignature.vertical,
+            func.count(),
+            func.sum(case((ReviewRawSignature.canonical_raw_id != ReviewRawSignature.raw_id, 1), else_=0)),
+        ).group_by(ReviewRawSignature.vertical)
+    ).all()
+    signed_map = {r[0]: int(r[1]) for r in signatures_by_vertical}
+    duplicates_map = {r[0]: int(r[2] or 0) for r in signatures_by_vertical}
+    dedup_ratio_map = {v: round(duplicates_map[v] / n, 4) for v, n in signed_map.items() if n}
+
+    return {
+        "totals": {
+            "raw": raw_total,
+            "enriched": enriched_total,
+            "unenriched_backlog": backlog_total,
+            "dead_lettered": dead_lettered_total,
+            "leased": leased_total,
+            "analyzable_backlog": analyzable_total,
+            "duplicates": sum(duplicates_map.values()),
+        },
+        "freshness": {
+            "last_ingested_at": last_ingested_at.isoformat() if last_ingested_at else None,
+            "last_analyzed_at": last_analyzed_at.isoformat() if last_analyzed_at else None,
+            "oldest_unanalyzed_ingested_at": oldest_unanalyzed_at.isoformat() if oldest_unanalyzed_at else None,
+        },
+        "by_vertical": {
+            "raw": raw_map,
+            "enriched": enriched_map,
+            "backlog": backlog_map,
+            "duplicates": duplicates_map,
+            "dedup_ratio": dedup_ratio_map,
+        },
+    }
+
+
+def throughput_stats(db, window_hours: float = 24.0, max_runs: int = 20) -> Dict[str, Any]:
+    """
+    Over the last `max_runs` analyzer runs started within `window_hours`:
+    - reviews_per_s: analyzed / busy seconds of finished runs (streaming runs'
+      wait_for_raws time is not busy time); None without history
+    - llm: latency of the most recent run that made LLM calls (running runs
+      included, they are updated after every chunk) and the median over the window
+    """
+    since = datetime.now(timezone.utc) - timedelta(hours=window_hours)
+    runs = db.execute(
+        select(PipelineRun)
+        .where(PipelineRun.kind == "analyze", PipelineRun.started_at >= since, PipelineRun.status != "failed")
+        .order_by(PipelineRun.started_at.desc())
+        .limit(max_runs)
+    ).scalars().all()
+
+    analyzed = 0
+    busy_s = 0.0
+    finished = 0
+    latencies = []
+    latest_llm: Dict[str, Any] = {}
+    for run in runs:
+        metrics = run.metrics or {}
+        llm = metrics.get("llm") or {}
+        if llm.get("extractions"):
+            latencies.append(llm["avg_latency_ms"])
+            latest_llm = latest_llm or llm
+        if run.status != "succeeded":
+            continue
+        n = int((run.totals or {}).get("analyzed") or 0)
+        waited = ((metrics.get("stages") or {}).get("wait_for_raws") or {}).get("total_s", 0.0)
+        busy = float(metrics.get("elapsed_s") or 0.0) - waited
+        if n and busy > 0:
+            finished += 1
+            analyzed += n
+            busy_s += busy
+
+    return {
+        "window_hours": window_hours,
+        "runs": finished,
+        "analyzed": analyzed,
+        "busy_s": round(busy_s, 1),
+        "reviews_per_s": round(analyzed / busy_s, 4) if busy_s else None,
+        "llm": {
+            "avg_latency_ms": latest_llm.get("avg_latency_ms"),
+            "p95_latency_ms": latest_llm.get("p95_latency_ms"),
+            "retry_rate": latest_llm.get("retry_rate"),
+            "median_avg_latency_ms": round(median(latencies), 1) if latencies else None,
+            "runs": len(latencies),
+        },
+    }
@@ -1,22 +1,24 @@
 from datetime import datetime, timezone
-import subprocess
-import sys
+import uuid
+
+from jobs.worker import PipelineWorker, WorkerJob
 
-def run(cmd: list[str]) -> None:
-    print("\n$ " + " ".join(cmd))
-    p = subprocess.run(cmd)
-    if p.returncode != 0:
-        raise SystemExit(p.returncode)
 
 def main():
     started = datetime.now(timezone.utc)
     print(f"Pipeline start: {started.isoformat()}")
 
-    # 1) ingest (google play)
-    run([sys.executable, "-m", "jobs.ingest.run_ingest", "--vertical", "food", "--pages", "2", "--count", "200"])
-
-    # 2) analyze (ollama)
-    run([sys.executable, "-m", "jobs.analyze.analyzer", "--batch", "50"])
+    # ingest (google play) + analyze (ollama) in this process; see jobs/worker.py
+    worker = PipelineWorker()
+    error = worker.run_job(
+        WorkerJob(
+            id=uuid.uuid4().hex,
+            kind="pipeline",
+            params={"vertical": "food", "pages": 2, "count": 200, "batch": 50},
+        )
+    )
+    if error:
+        raise SystemExit(1)
 
     finished = datetime.now(timezone.utc)
     print(f"Pipeline finished: {finished.isoformat()}")
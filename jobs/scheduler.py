@@ -0,0 +1,315 @@
+"""
+Backlog-aware scheduler for periodic pipeline runs.
+
+Every tick it enqueues jobs into pipeline_jobs (jobs/pipeline_jobs.py) for the
+pipeline workers (jobs/worker.py) to run:
+
+- ingest: one job per vertical of the `schedule` section of verticals.yml, once
+  `every_minutes` have passed since that vertical's last ingest/pipeline job
+- analyze: every `analyze_every_minutes`, one job sized from the live backlog and
+  the measured throughput (jobs/pipeline_stats.py, the numbers /ops/stats shows):
+  chunks of about `chunk_target_s` of work, enough of them to fill the interval,
+  or until the backlog is empty once draining it at that rate would let the oldest
+  waiting review miss `freshness_sla_minutes`
+- back-off: no analyze job while an analyze/pipeline job is still queued or
+  running, and while the model server looks saturated (latest LLM latency well
+  above its recent median or above `max_llm_p95_ms`, or many retries) only a
+  one-chunk probe (params["probe"]), at intervals doubling with each probe in a row
+
+Last-run times and the run of consecutive probes come from pipeline_jobs, so
+restarts (or --once from cron) keep both the cadence and the back-off.
+
+Usage:
+  python -m jobs.scheduler
+  python -m jobs.scheduler --once --dry-run
+  python -m jobs.scheduler --every food=15 --every groceries=60 --sla-minutes 30
+"""
+import argparse
+import math
+import time
+import traceback
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import func, select
+
+from apps.api.app.db import SessionLocal, engine
+from apps.api.app.models import Base, PipelineJob
+from jobs.analyze.analyzer import load_vertical_config
+from jobs.pipeline_jobs import enqueue_job
+from jobs.pipeline_stats import backlog_stats, throughput_stats
+
+
+@dataclass
+class VerticalSchedule:
+    vertical: str
+    every_s: float
+    pages: int = 2
+    count: int = 200
+
+
+@dataclass
+class ScheduleConfig:
+    verticals: List[VerticalSchedule] = field(default_factory=list)
+    freshness_sla_s: float = 3600.0
+    analyze_every_s: float = 300.0
+    concurrency: int = 1
+    min_batch: int = 10
+    max_batch: int = 200
+    # Aim for chunks of about this much work (commit / cancel granularity)
+    chunk_target_s: float = 60.0
+    # Until there are finished runs to measure
+    default_reviews_per_s: float = 0.5
+    max_llm_p95_ms: float = 60_000.0
+    latency_factor: float = 2.0
+    max_retry_rate: float = 0.2
+    max_backoff_s: float = 3600.0
+
+
+def load_schedule(cfg: Dict[str, Any]) -> ScheduleConfig:
+    """
+    ScheduleConfig from the `schedule` section of verticals.yml (minutes there, seconds here).
+    """
+    sec = cfg.get("schedule") or {}
+    sc = ScheduleConfig()
+    for key in ("concurrency", "min_batch", "max_batch", "chunk_target_s", "default_reviews_per_s",
+                "max_llm_p95_ms", "latency_factor", "max_retry_rate"):
+        if key in sec:
+            setattr(sc, key, type(getattr(sc, key))(sec[key]))
+    if "freshness_sla_minutes" in sec:
+        sc.freshness_sla_s = 60.0 * float(sec["freshness_sla_minutes"])
+    if "analyze_every_minutes" in sec:
+        sc.analyze_every_s = 60.0 * float(sec["analyze_every_minutes"])
+    if "max_backoff_minutes" in sec:
+        sc.max_backoff_s = 60.0 * float(sec["max_backoff_minutes"])
+    for vertical, v in (sec.get("verticals") or {}).items():
+        v = v or {}
+        sc.verticals.append(
+            VerticalSchedule(
+                vertical=vertical,
+                every_s=60.0 * float(v.get("every_minutes", 60)),
+                pages=int(v.get("pages", 2)),
+                count=int(v.get("count", 200)),
+            )
+        )
+    return sc
+
+
+class AnalyzePlan(NamedTuple):
+    batch: int
+    max_chunks: Optional[int]  # None: until the backlog is empty
+    reason: str
+
+
+def plan_analyze(
+    backlog: int,
+    reviews_per_s: Optional[float],
+    oldest_age_s: Optional[float],
+    sc: ScheduleConfig,
+) -> Optional[AnalyzePlan]:
+    """
+    Chunk size and count for one analyze job; None when there is nothing to do.
+    """
+    if backlog <= 0:
+        return None
+    rate = reviews_per_s or sc.default_reviews_per_s
+    batch = max(sc.min_batch, min(sc.max_batch, round(rate * sc.chunk_target_s)))
+    batch = max(1, min(batch, backlog))
+
+    slack_s = sc.freshness_sla_s - (oldest_age_s or 0.0)
+    if backlog / rate >= slack_s:
+        return AnalyzePlan(batch, None, "sla_at_risk")
+    # Enough to keep the analyzer busy until the next run, not more
+    items = min(backlog, math.ceil(rate * sc.analyze_every_s))
+    return AnalyzePlan(batch, max(1, math.ceil(items / batch)), "steady")
+
+
+def model_saturation(llm: Dict[str, Any], sc: ScheduleConfig) -> Optional[str]:
+    """
+    Why the model server looks saturated (throughput_stats()["llm"]), or None.
+    """
+    p95 = llm.get("p95_latency_ms")
+    if p95 and p95 > sc.max_llm_p95_ms:
+        return f"llm_p95_ms={p95}"
+    avg, typical = llm.get("avg_latency_ms"), llm.get("median_avg_latency_ms")
+    if avg and typical and llm.get("runs", 0) >= 3 and avg > sc.latency_factor * typical:
+        return f"llm_avg_ms={avg} median={typical}"
+    retry_rate = llm.get("retry_rate")
+    if retry_rate and retry_rate > sc.max_retry_rate:
+        return f"llm_retry_rate={retry_rate}"
+    return None
+
+
+def backoff_s(probe_streak: int, sc: ScheduleConfig) -> float:
+    """
+    Wait before the next analyze job after `probe_streak` probes in a row (0: none).
+    """
+    if probe_streak <= 0:
+        return 0.0
+    return min(sc.max_backoff_s, sc.analyze_every_s * 2.0 ** min(probe_streak, 32))
+
+
+def _age_s(now: datetime, then: Optional[datetime]) -> Optional[float]:
+    if then is None:
+        return None
+    if then.tzinfo is None:
+        then = then.replace(tzinfo=timezone.utc)
+    return (now - then).total_seconds()
+
+
+class Scheduler:
+    def __init__(self, sc: ScheduleConfig, dry_run: bool = False):
+        self.sc = sc
+        self.dry_run = dry_run
+
+    def _enqueue(self, db, kind: str, params: Dict[str, Any]) -> str:
+        if self.dry_run:
+            return "dry-run"
+        job_id, created = enqueue_job(db, kind, params)
+        return f"{job_id}" if created else f"{job_id} (already queued)"
+
+    def tick(self) -> None:
+        now = datetime.now(timezone.utc)
+        with SessionLocal() as db:
+            last_ingest = dict(
+                db.execute(
+                    select(PipelineJob.vertical, func.max(PipelineJob.created_at))
+                    .where(PipelineJob.kind.in_(("ingest", "pipeline")))
+                    .group_by(PipelineJob.vertical)
+                ).all()
+            )
+            for vs in self.sc.verticals:
+                age = _age_s(now, last_ingest.get(vs.vertical))
+                if age is not None and age < vs.every_s:
+                    continue
+                job = self._enqueue(db, "ingest", {"vertical": vs.vertical, "pages": vs.pages, "count": vs.count})
+                print(f"Schedule Ingest Vertical={vs.vertical} Pages={vs.pages} Count={vs.count} Job={job}")
+
+            self._tick_analyze(db, now)
+
+    def _probe_streak(self, db, limit: int = 32) -> int:
+        """
+        Probes among the most recent analyze jobs, counted back to the first regular one.
+        """
+        recent = db.execute(
+            select(PipelineJob.params)
+            .where(PipelineJob.kind == "analyze")
+            .order_by(PipelineJob.created_at.desc())
+            .limit(limit)
+        ).scalars().all()
+        streak = 0
+        for params in recent:
+            if not (params or {}).get("probe"):
+                break
+            streak += 1
+        return streak
+
+    def _tick_analyze(self, db, now: datetime) -> None:
+        last_analyze = db.execute(
+            select(func.max(PipelineJob.created_at)).where(PipelineJob.kind == "analyze")
+        ).scalar()
+        streak = self._probe_streak(db)
+        age = _age_s(now, last_analyze)
+        if age is not None and age < max(self.sc.analyze_every_s, backoff_s(streak, self.sc)):
+            return
+
+        active = int(
+            db.execute(
+                select(func.count())
+                .select_from(PipelineJob)
+                .where(PipelineJob.kind.in_(("analyze", "pipeline")), PipelineJob.state.in_(("queued", "running")))
+            ).scalar()
+            or 0
+        )
+        if active:
+            print(f"Schedule AnalyzeSkipped Reason=busy ActiveJobs={active}")
+            return
+
+        stats = backlog_stats(db)
+        throughput = throughput_stats(db)
+        # Unenriched, not dead-lettered and not leased by a running analyzer
+        backlog = stats["totals"]["analyzable_backlog"]
+        oldest = stats["freshness"]["oldest_unanalyzed_ingested_at"]
+        oldest_age_s = _age_s(now, datetime.fromisoformat(oldest)) if oldest else None
+        rate = throughput["reviews_per_s"]
+
+        plan = plan_analyze(backlog, rate, oldest_age_s, self.sc)
+        if plan is None:
+            return
+
+        saturated = model_saturation(throughput["llm"], self.sc)
+        if saturated:
+            # Probe with one small chunk; its latency tells the next tick whether to resume
+            streak += 1
+            plan = AnalyzePlan(min(plan.batch, self.sc.min_batch), 1, f"saturated ({saturated})")
+        else:
+            streak = 0
+
+        params: Dict[str, Any] = {
+            "batch": plan.batch,
+            "until_empty": True,
+            "max_chunks": plan.max_chunks,
+            "concurrency": self.sc.concurrency,
+        }
+        if saturated:
+            # Counted by _probe_streak to derive the back-off
+            params["probe"] = True
+        job = self._enqueue(db, "analyze", params)
+        print(
+            f"Schedule Analyze Backlog={backlog} RatePerS={rate} "
+            f"OldestAgeS={round(oldest_age_s) if oldest_age_s is not None else None} "
+            f"SlaS={self.sc.freshness_sla_s:.0f} Batch={plan.batch} MaxChunks={plan.max_chunks} "
+            f"Reason={plan.reason} BackoffS={backoff_s(streak, self.sc):.0f} Job={job}"
+        )
+
+    def serve(self, tick_s: float = 30.0, once: bool = False) -> None:
+        names = ", ".join(f"{v.vertical}/{v.every_s / 60:g}m" for v in self.sc.verticals) or "none"
+        print(
+            f"Scheduler Ingest={names} AnalyzeEveryS={self.sc.analyze_every_s:.0f} "
+            f"SlaS={self.sc.freshness_sla_s:.0f} DryRun={self.dry_run}"
+        )
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                # DB hiccup: try again next tick
+                traceback.print_exc()
+            if once:
+                return
+            time.sleep(tick_s)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument(
+        "--every",
+        action="append",
+        default=[],
+        metavar="VERTICAL=MINUTES",
+        help="Ingest cadence for a vertical (repeatable; overrides/extends verticals.yml)",
+    )
+    p.add_argument("--sla-minutes", type=float, default=None, help="Target max age of a review before it is analyzed")
+    p.add_argument("--analyze-every-minutes", type=float, default=None)
+    p.add_argument("--concurrency", type=int, default=None, help="Max in-flight Ollama requests of analyze jobs")
+    p.add_argument("--tick", type=float, default=30.0, help="Seconds between scheduling passes")
+    p.add_argument("--once", action="store_true", help="One scheduling pass, then exit (cron)")
+    p.add_argument("--dry-run", action="store_true", help="Print decisions without enqueuing")
+    args = p.parse_args()
+
+    sc = load_schedule(load_vertical_config())
+    for spec in args.every:
+        vertical, sep, minutes = spec.partition("=")
+        if not sep or not vertical:
+            p.error(f"--every must look like VERTICAL=MINUTES, got {spec!r}")
+        sc.verticals = [v for v in sc.verticals if v.vertical != vertical]
+        sc.verticals.append(VerticalSchedule(vertical=vertical, every_s=60.0 * float(minutes)))
+    if args.sla_minutes is not None:
+        sc.freshness_sla_s = 60.0 * args.sla_minutes
+    if args.analyze_every_minutes is not None:
+        sc.analyze_every_s = 60.0 * args.analyze_every_minutes
+    if args.concurrency is not None:
+        sc.concurrency = args.concurrency
+
+    Base.metadata.create_all(bind=engine)
+    Scheduler(sc, dry_run=args.dry_run).serve(tick_s=args.tick, once=args.once)
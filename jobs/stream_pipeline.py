@@ -0,0 +1,227 @@
+"""
+Overlapped ingest -> analyze pipeline.
+
+Ingest threads hand the ids of every committed page to a bounded queue and the
+analyzer consumes them in chunks as they arrive, so analysis starts with the
+first page instead of after the last one, and a run takes about as long as the
+slower of the two stages rather than their sum.
+
+Backpressure: when the queue is full, the ingest thread blocks right after
+committing its page, before fetching the next one, so a slow LLM slows down
+fetching instead of growing memory. Only this run's new reviews are analyzed;
+older backlog is left to the regular analyzer.
+
+Usage:
+  python -m jobs.stream_pipeline --vertical food --pages 10 --count 200 --batch 25
+  python -m jobs.stream_pipeline --from-config --concurrency 4
+"""
+import argparse
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from apps.api.app.db import engine
+from apps.api.app.models import Base
+from jobs.analyze import analyzer
+from jobs.analyze.sentiment_hf import SentimentClassifier
+from jobs.ingest.run_ingest import ingest_targets
+from jobs.ingest.targets import IngestTarget, default_target, load_targets
+
+_DONE = object()
+# Name of the producer thread (the pipeline worker routes its output to the job log)
+THREAD_NAME = "stream-ingest"
+
+
+class StreamCancelled(RuntimeError):
+    pass
+
+
+class RawIdQueue:
+    """
+    Bounded hand-off of freshly ingested raw ids from ingest threads to the analyzer.
+
+    - put_many blocks while the queue is full (raises StreamCancelled after cancel())
+    - batches() yields up to batch_size ids, waiting at most `linger_s` after the
+      first one for more, until close() and the queue is drained (or should_stop())
+    """
+
+    def __init__(self, maxsize: int = 200, linger_s: float = 0.5):
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, maxsize))
+        self._cancelled = threading.Event()
+        self.linger_s = linger_s
+        self.blocked_s = 0.0
+        self._blocked_lock = threading.Lock()
+
+    def put_many(self, ids: List[uuid.UUID]) -> None:
+        for raw_id in ids:
+            self._put(raw_id)
+
+    def _put(self, item: Any) -> None:
+        t0 = time.perf_counter()
+        while True:
+            if self._cancelled.is_set():
+                raise StreamCancelled("stream pipeline cancelled")
+            try:
+                self._queue.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        with self._blocked_lock:
+            self.blocked_s += time.perf_counter() - t0
+
+    def close(self) -> None:
+        try:
+            self._put(_DONE)
+        except StreamCancelled:
+            pass
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def batches(
+        self, batch_size: int, should_stop: Optional[Callable[[], bool]] = None
+    ) -> Iterator[List[uuid.UUID]]:
+        while True:
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._cancelled.is_set() or (should_stop is not None and should_stop()):
+                    return
+                continue
+            if item is _DONE:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.linger_s
+            while len(batch) < batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    yield batch
+                    return
+                batch.append(item)
+            yield batch
+
+
+def run_streaming(
+    targets: List[IngestTarget],
+    count: int = 200,
+    pages: int = 2,
+    batch_size: int = 25,
+    queue_size: Optional[int] = None,
+    linger_s: float = 0.5,
+    ingest_workers: int = 4,
+    rate: float = 2.0,
+    sentiment: Optional[SentimentClassifier] = None,
+    cfg: Optional[Dict[str, Any]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    **analyze_kwargs: Any,
+) -> Dict[str, Any]:
+    """
+    Ingest `targets` on a background thread while analyzer.main consumes the new
+    raw ids on this one. `queue_size` (default 4 x batch_size) bounds how far
+    ingest may run ahead of analysis. Extra keyword arguments go to analyzer.main.
+    Once `should_stop()` is True, analysis stops after its current chunk and
+    ingest after its current page.
+    """
+    ids = RawIdQueue(maxsize=queue_size or 4 * batch_size, linger_s=linger_s)
+    ingest: Dict[str, Any] = {}
+
+    def _produce() -> None:
+        try:
+            ingest["results"] = ingest_targets(
+                targets, count=count, pages=pages, workers=ingest_workers, rate=rate, on_inserted=ids.put_many
+            )
+        except BaseException as e:
+            ingest["error"] = repr(e)
+        finally:
+            ingest["elapsed_s"] = round(time.perf_counter() - t0, 2)
+            ids.close()
+
+    t0 = time.perf_counter()
+    producer = threading.Thread(target=_produce, name=THREAD_NAME, daemon=True)
+    producer.start()
+    try:
+        summary = analyzer.main(
+            batch_size=batch_size,
+            sentiment=sentiment,
+            cfg=cfg,
+            raw_id_batches=ids.batches(batch_size, should_stop),
+            should_stop=should_stop,
+            **analyze_kwargs,
+        )
+    finally:
+        # No-op after a full run; otherwise unblocks and stops the ingest thread
+        ids.cancel()
+        producer.join()
+
+    results = ingest.get("results") or {}
+    totals = {"fetched": 0, "inserted": 0, "known": 0}
+    failed = 0
+    for target, c in results.items():
+        for k in totals:
+            totals[k] += c[k]
+        failed += int(c["error"] is not None)
+        if c["error"]:
+            print(f"Target={target.label} Error={c['error']}")
+    stopped = should_stop is not None and should_stop()
+    if not stopped and ("error" in ingest or (results and failed == len(results))):
+        raise RuntimeError(f"Ingest failed: {ingest.get('error') or 'every target failed'}. See log.")
+
+    elapsed = time.perf_counter() - t0
+    print(
+        f"Stream Fetched={totals['fetched']} InsertedNew={totals['inserted']} Analyzed={summary['analyzed']} "
+        f"IngestS={ingest['elapsed_s']} IngestBlockedS={ids.blocked_s:.1f} WallS={elapsed:.1f}"
+    )
+    return {
+        "ingest": {
+            **totals,
+            "failed_targets": failed,
+            "elapsed_s": ingest["elapsed_s"],
+            "blocked_s": round(ids.blocked_s, 2),
+        },
+        "analyze": summary,
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--vertical", default=None, help="e.g. food (the DEFAULT_APP_ID app, like run_ingest)")
+    p.add_argument(
+        "--from-config",
+        action="store_true",
+        help="Ingest the ingest_targets of verticals.yml (only --vertical's, if given)",
+    )
+    p.add_argument("--count", type=int, default=200, help="Reviews per page")
+    p.add_argument("--pages", type=int, default=2, help="Max pages per target")
+    p.add_argument("--batch", type=int, default=25, help="Reviews per analyzer chunk")
+    p.add_argument("--queue-size", type=int, default=None, help="Max ingested-but-unanalyzed ids (default 4 x --batch)")
+    p.add_argument("--linger", type=float, default=0.5, help="Seconds to wait for a fuller chunk")
+    p.add_argument("--ingest-workers", type=int, default=4, help="Targets fetched concurrently")
+    p.add_argument("--rate", type=float, default=2.0, help="Max page requests per second across all targets")
+    p.add_argument("--concurrency", type=int, default=1, help="Max in-flight Ollama extraction requests")
+    p.add_argument("--model", default="mistral:7b-instruct")
+    p.add_argument("--prompt-version", default="v1")
+    args = p.parse_args()
+
+    if not args.from_config and not args.vertical:
+        p.error("pass --vertical or --from-config")
+
+    Base.metadata.create_all(bind=engine)
+    run_streaming(
+        load_targets(vertical=args.vertical) if args.from_config else [default_target(args.vertical)],
+        count=args.count,
+        pages=args.pages,
+        batch_size=args.batch,
+        queue_size=args.queue_size,
+        linger_s=args.linger,
+        ingest_workers=args.ingest_workers,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        model=args.model,
+        prompt_version=args.prompt_version,
+    )
@@ -0,0 +1,464 @@
+"""
+Long-lived pipeline worker.
+
+Loads the sentiment model and verticals.yml once per process and runs pipeline
+jobs claimed from the durable pipeline_jobs queue (jobs/pipeline_jobs.py), so a
+small incremental run starts analyzing right away instead of paying for a fresh
+interpreter, the torch/transformers imports and from_pretrained every time.
+
+Jobs run in-process: ingest through jobs.ingest.run_ingest.main(argv), analysis
+through jobs.analyze.analyzer.main(sentiment=..., cfg=...). A pipeline job with
+params["mode"] == "stream" overlaps the two (jobs/stream_pipeline.py). While a
+job runs, whatever its threads write to stdout/stderr (prints, tracebacks,
+library warnings and logging) goes to the job's log in pipeline_job_logs, which
+every API instance reads; other threads of the process (API requests) keep
+their output. A worker runs one job at a time, so there is never more than one
+log to route to; run more workers for more parallelism.
+
+Run one dedicated worker next to the API:
+  python -m jobs.worker --max-per-vertical 1
+PIPELINE_EMBEDDED_WORKER=1 runs one inside the API process instead (one per
+uvicorn worker, each with its own copy of the sentiment model).
+
+verticals.yml is read when the worker warms up; restart the worker (or the API)
+after changing it.
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+from apps.api.app.db import SessionLocal, engine
+from apps.api.app.models import Base
+from jobs.analyze import analyzer
+from jobs.analyze.sentiment_hf import BACKENDS as SENTIMENT_BACKENDS, SentimentClassifier
+from jobs.ingest import run_ingest
+from jobs.ingest.targets import default_target
+from jobs.pipeline_jobs import MAX_RUNNING_PER_VERTICAL, append_log, claim_job, finish_job, heartbeat
+from jobs.stream_pipeline import THREAD_NAME as STREAM_THREAD_NAME, run_streaming
+
+JOB_KINDS = ("pipeline", "ingest", "analyze")
+
+HEARTBEAT_THREAD = "pipeline-heartbeat"
+
+
+class JobLog:
+    """
+    File-like sink appending a job's output to pipeline_job_logs.
+
+    Writes are buffered and inserted as one chunk every `flush_s` (or once
+    `max_buffer` characters are pending) by a background thread, and on close().
+    A failed insert is retried with the next chunk.
+    """
+
+    def __init__(self, job_id: str, flush_s: float = 1.0, max_buffer: int = 64_000):
+        self.job_id = uuid.UUID(job_id)
+        self.flush_s = flush_s
+        self.max_buffer = max_buffer
+        self.offset = 0
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        self._pending_len = 0
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="pipeline-log", daemon=True)
+        self._thread.start()
+
+    def write(self, s: str) -> int:
+        with self._lock:
+            self._pending.append(s)
+            self._pending_len += len(s)
+            if self._pending_len >= self.max_buffer:
+                self._wake.set()
+        return len(s)
+
+    def flush(self) -> None:
+        # Chunks go out every flush_s; a DB round trip per print would be too much
+        pass
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        with self._lock:
+            # Postgres text can't hold NUL
+            data = "".join(self._pending).replace("\x00", "")
+            self._pending, self._pending_len = [], 0
+        if not data:
+            return
+        try:
+            with SessionLocal() as db:
+                self.offset = append_log(db, self.job_id, self.offset, data)
+        except Exception as e:
+            with self._lock:
+                self._pending.insert(0, data)
+                self._pending_len += len(data)
+            print(f"Job log write failed for job={self.job_id}: {e}", file=sys.__stderr__)
+
+    def close(self) -> None:
+        self._closed.set()
+        self._wake.set()
+        self._thread.join()
+        self._write_pending()
+
+
+# Threads the jobs start, besides the job's own thread; name them in their module
+# and add them here, or their output goes to the worker's stdout/stderr
+JOB_THREAD_PREFIXES = (
+    run_ingest.THREAD_NAME_PREFIX,
+    analyzer.THREAD_NAME_PREFIX,
+    STREAM_THREAD_NAME,
+    HEARTBEAT_THREAD,
+)
+
+
+class _JobOutput:
+    """
+    Where job output goes: the active job's log while a job runs.
+
+    Shared by the stdout and stderr routers. Only writes from the job's thread
+    and the threads it starts (JOB_THREAD_PREFIXES) are captured; API request
+    threads keep writing to the original streams. The target is looked up and
+    written under one lock, so nothing writes to a log after capture() closed it.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._target: Optional[JobLog] = None
+        self._owner: Optional[int] = None
+
+    def _owns_current_thread(self) -> bool:
+        t = threading.current_thread()
+        return t.ident == self._owner or t.name.startswith(JOB_THREAD_PREFIXES)
+
+    def write(self, s: str, fallback: TextIO) -> int:
+        with self._lock:
+            if self._target is not None and self._owns_current_thread():
+                return self._target.write(s)
+        return fallback.write(s)
+
+    def flush(self, fallback: TextIO) -> None:
+        with self._lock:
+            if self._target is not None and self._owns_current_thread():
+                self._target.flush()
+                return
+        fallback.flush()
+
+    @contextmanager
+    def capture(self, target: Optional[JobLog]) -> Iterator[None]:
+        if target is None:
+            yield
+            return
+        with self._lock:
+            self._target = target
+            self._owner = threading.get_ident()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._target = None
+                self._owner = None
+            target.close()
+
+
+class _StreamRouter:
+    """
+    sys.stdout / sys.stderr replacement writing through a _JobOutput.
+    """
+
+    def __init__(self, original: TextIO, output: _JobOutput):
+        self.original = original
+        self.output = output
+
+    def write(self, s: str) -> int:
+        return self.output.write(s, self.original)
+
+    def flush(self) -> None:
+        self.output.flush(self.original)
+
+    def isatty(self) -> bool:
+        return False
+
+    def __getattr__(self, name: str) -> Any:
+        # encoding, fileno, ... of the original stream
+        return getattr(self.original, name)
+
+
+_OUTPUT = _JobOutput()
+_ROUTER_LOCK = threading.Lock()
+
+
+def _install_routers() -> _JobOutput:
+    """
+    Route sys.stdout and sys.stderr (and logging handlers already bound to them,
+    e.g. transformers' or logging.basicConfig's) through the job output; idempotent.
+    """
+    with _ROUTER_LOCK:
+        for name in ("stdout", "stderr"):
+            current = getattr(sys, name)
+            if isinstance(current, _StreamRouter):
+                continue
+            router = _StreamRouter(current, _OUTPUT)
+            setattr(sys, name, router)
+            for logger in [logging.getLogger()] + [
+                lg for lg in logging.Logger.manager.loggerDict.values() if isinstance(lg, logging.Logger)
+            ]:
+                for handler in logger.handlers:
+                    if isinstance(handler, logging.StreamHandler) and handler.stream is current:
+                        handler.setStream(router)
+    return _OUTPUT
+
+
+@dataclass
+class WorkerJob:
+    id: str
+    kind: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    # Store output in pipeline_job_logs (claimed jobs); otherwise it stays on stdout/stderr
+    store_log: bool = False
+    # Set when cancellation was requested; stages stop at their next checkpoint
+    cancel: threading.Event = field(default_factory=threading.Event)
+
+
+class PipelineWorker:
+    """
+    Claim loop + warm models.
+
+    - start(): serve() on a background thread (the API's embedded worker)
+    - wake(): claim now instead of at the next poll (after a local enqueue)
+    - serve(): claim, run, heartbeat and finish pipeline_jobs until stop()
+    - run_job(job): run one job synchronously on the caller's thread (same warm models)
+    """
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        sentiment_backend: str = "torch",
+        sentiment_threads: Optional[int] = None,
+        poll_s: float = 2.0,
+        heartbeat_s: float = 10.0,
+        max_running_per_vertical: int = MAX_RUNNING_PER_VERTICAL,
+    ):
+        self.worker_id = worker_id or analyzer.default_worker_id()
+        self.sentiment_backend = sentiment_backend
+        self.sentiment_threads = sentiment_threads
+        self.poll_s = poll_s
+        self.heartbeat_s = heartbeat_s
+        self.max_running_per_vertical = max_running_per_vertical
+        self.sentiment: Optional[SentimentClassifier] = None
+        self.cfg: Optional[Dict[str, Any]] = None
+
+        self._thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._warm_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def warm(self) -> None:
+        with self._warm_lock:
+            if self.sentiment is not None:
+                return
+            t0 = time.perf_counter()
+            self.cfg = analyzer.load_vertical_config()
+            self.sentiment = SentimentClassifier(backend=self.sentiment_backend, num_threads=self.sentiment_threads)
+            print(
+                f"WorkerWarm Sentiment={self.sentiment.model_name} Backend={self.sentiment_backend} "
+                f"LoadS={time.perf_counter() - t0:.1f}"
+            )
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self.serve, name="pipeline-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def serve(self) -> None:
+        _install_routers()
+        try:
+            self.warm()
+        except Exception:
+            # Jobs retry the warm-up and fail with the error in their own log
+            traceback.print_exc()
+
+        while not self._stopping.is_set():
+            try:
+                job = self.claim_next()
+            except Exception:
+                # DB hiccup: keep the worker alive and try again at the next poll
+                traceback.print_exc()
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_s)
+                self._wake.clear()
+                continue
+            self.execute(job)
+
+    def claim_next(self) -> Optional[WorkerJob]:
+        with SessionLocal() as db:
+            row = claim_job(db, self.worker_id, max_running_per_vertical=self.max_running_per_vertical)
+            if row is None:
+                return None
+            return WorkerJob(id=str(row.id), kind=row.kind, params=dict(row.params or {}), store_log=True)
+
+    def execute(self, job: WorkerJob) -> None:
+        """
+        Run a claimed job with a heartbeat and record its final state.
+        """
+        done = threading.Event()
+
+        def _beat() -> None:
+            while not done.wait(self.heartbeat_s):
+                try:
+                    with SessionLocal() as db:
+                        if heartbeat(db, job.id):
+                            job.cancel.set()
+                except Exception as e:
+                    print(f"Heartbeat failed for job={job.id}: {e}")
+
+        beat = threading.Thread(target=_beat, name=HEARTBEAT_THREAD, daemon=True)
+        beat.start()
+        try:
+            error = self.run_job(job)
+        except BaseException:
+            with SessionLocal() as db:
+                finish_job(db, job.id, "failed", "worker stopped")
+            raise
+        finally:
+            done.set()
+            beat.join()
+
+        state = "cancelled" if job.cancel.is_set() else ("failed" if error else "succeeded")
+        with SessionLocal() as db:
+            finish_job(db, job.id, state, error)
+
+    def run_job(self, job: WorkerJob) -> Optional[str]:
+        """
+        Run one job and return its error (None on success); never raises Exception.
+        """
+        if job.kind not in JOB_KINDS:
+            return f"unknown job kind {job.kind!r}; expected one of {JOB_KINDS}"
+        error: Optional[str] = None
+        with _install_routers().capture(JobLog(job.id) if job.store_log else None):
+            try:
+                self.warm()
+                if job.kind == "pipeline" and job.params.get("mode") == "stream":
+                    self.stream(job.params, job.cancel)
+                else:
+                    if job.kind in ("pipeline", "ingest"):
+                        self.ingest(job.params)
+                    if job.kind in ("pipeline", "analyze") and not job.cancel.is_set():
+                        self.analyze(job.params, job.cancel)
+                if job.cancel.is_set():
+                    print("Cancelled")
+            except Exception as e:
+                error = str(e)
+                traceback.print_exc()
+        return error
+
+    def ingest(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        argv: List[str] = [
+            "--vertical",
+            params["vertical"],
+            "--pages",
+            str(params["pages"]),
+            "--count",
+            str(params["count"]),
+        ]
+        print("\n$ ingest " + " ".join(argv))
+        try:
+            return run_ingest.main(argv)
+        except SystemExit as e:
+            raise RuntimeError(f"Ingest failed (exit code {e.code}). See log.") from None
+
+    def analyze(self, params: Dict[str, Any], cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        print(
+            f"\n$ analyze batch={params['batch']} max_chunks={params.get('max_chunks')} "
+            f"until_empty={params.get('until_empty', False)}"
+        )
+        return analyzer.main(
+            batch_size=params["batch"],
+            until_empty=params.get("until_empty", False),
+            max_chunks=params.get("max_chunks"),
+            concurrency=params.get("concurrency", 1),
+            sentiment=self.sentiment,
+            sentiment_backend=self.sentiment_backend,
+            cfg=self.cfg,
+            should_stop=cancel.is_set if cancel is not None else None,
+        )
+
+    def stream(self, params: Dict[str, Any], cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        print(
+            f"\n$ stream vertical={params['vertical']} pages={params['pages']} "
+            f"count={params['count']} batch={params['batch']}"
+        )
+        return run_streaming(
+            [default_target(params["vertical"])],
+            count=params["count"],
+            pages=params["pages"],
+            batch_size=params["batch"],
+            sentiment=self.sentiment,
+            sentiment_backend=self.sentiment_backend,
+            cfg=self.cfg,
+            should_stop=cancel.is_set if cancel is not None else None,
+        )
+
+
+_WORKER: Optional[PipelineWorker] = None
+_WORKER_LOCK = threading.Lock()
+
+
+def get_worker() -> PipelineWorker:
+    """
+    The process-wide embedded worker (started by the API when PIPELINE_EMBEDDED_WORKER=1).
+    """
+    global _WORKER
+    with _WORKER_LOCK:
+        if _WORKER is None:
+            _WORKER = PipelineWorker()
+        return _WORKER
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--worker-id", default=None, help="Shown on claimed jobs (default: hostname:pid)")
+    p.add_argument("--poll", type=float, default=2.0, help="Seconds between claim attempts when idle")
+    p.add_argument("--heartbeat", type=float, default=10.0, help="Seconds between heartbeats of the running job")
+    p.add_argument(
+        "--max-per-vertical",
+        type=int,
+        default=MAX_RUNNING_PER_VERTICAL,
+        help="Max running jobs per vertical across all workers (PIPELINE_MAX_RUNNING_PER_VERTICAL)",
+    )
+    p.add_argument("--sentiment-backend", choices=list(SENTIMENT_BACKENDS), default="torch")
+    p.add_argument("--sentiment-threads", type=int, default=None)
+    args = p.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    PipelineWorker(
+        worker_id=args.worker_id,
+        sentiment_backend=args.sentiment_backend,
+        sentiment_threads=args.sentiment_threads,
+        poll_s=args.poll,
+        heartbeat_s=args.heartbeat,
+        max_running_per_vertical=args.max_per_vertical,
+    ).serve()